@@ -0,0 +1,295 @@
+import sys
+import os
+import json
+import time
+import argparse
+import subprocess
+import resource
+from concurrent.futures import ThreadPoolExecutor
+
+# Benchmark runner for the evaluation corpus.
+# Run from the root of the repository, e.g.
+#   python experiments/benchmark.py -j 4 -o bench.jsonl
+#   python experiments/benchmark.py -j 4 -o bench_new.jsonl --baseline bench.jsonl
+#
+# Each file is analysed by fresh worker processes, one per frontend, such that timings and peak memory are per file
+# (and the frontends, which all have an `analysis` package, do not clash):
+#   frontend: parse, preprocess, scoped tree and CFGs of src/py (pymc, pyro and beanmachine files)
+#   static:   analyses of src/static through the RPC servers (the servers in .pipe have to be running, as for evaluate_*.py)
+#   ir4ppl:   IR and checkers of src/ir4ppl (pyro and stan files)
+# Up to -j frontend and ir4ppl workers run at the same time. Static workers run one at a time next to them,
+# since the RPC server handles one connection at a time (server_pipe.py) and waiting for the sessions of
+# other static workers would be counted in their phase times. For each file one JSON line is written with
+# the wall time of each phase ("<worker>/<phase>"), the number of RPC requests per method,
+# the peak resident set size of each worker (the RPC servers are not included) and the errors of failed phases.
+# With --baseline, total phase times are compared with a previous run.
+
+PPL_FOLDERS = {
+    "pymc": ["evaluation/pymc"],
+    "pyro": ["evaluation/pyro"],
+    "turing": ["evaluation/turing"],
+    "gen": ["evaluation/gen"],
+    "stan": ["evaluation", "vscode-extension/test_programs"],
+}
+
+def get_ppl(filename: str) -> str:
+    # same detection as ProbabilisticProgram
+    if filename.endswith(".stan"):
+        return "stan"
+    with open(filename, encoding="utf-8") as f:
+        file_content = f.read()
+    for ppl, keyword in [("pyro", "pyro"), ("pymc", "pymc"), ("turing", "Turing"), ("beanmachine", "beanmachine"), ("gen", "Gen")]:
+        if keyword in file_content:
+            return ppl
+    return "unknown"
+
+def get_workers(ppl: str) -> list[str]:
+    match ppl:
+        case "pyro":
+            return ["frontend", "static", "ir4ppl"]
+        case "pymc" | "beanmachine":
+            return ["frontend", "static"]
+        case "turing" | "gen":
+            return ["static"]
+        case "stan":
+            return ["ir4ppl"]
+    return []
+
+def collect_files(ppls: list[str]) -> list[str]:
+    filenames = set()
+    for ppl in ppls:
+        extensions = (".stan",) if ppl == "stan" else (".py", ".jl")
+        for folder in PPL_FOLDERS[ppl]:
+            for root, _, files in os.walk(folder):
+                for file in files:
+                    if file.endswith(extensions):
+                        filenames.add(os.path.join(root, file))
+    return sorted(filenames)
+
+
+class PhaseTimer:
+    def __init__(self) -> None:
+        self.phases: dict[str,float] = dict()
+        self.errors: dict[str,str] = dict()
+
+    def run(self, name: str, f):
+        t0 = time.perf_counter()
+        try:
+            return f()
+        except Exception as e:
+            self.errors[name] = f"{type(e).__name__}: {e}"
+            return None
+        finally:
+            self.phases[name] = time.perf_counter() - t0
+
+def get_peak_rss_mb() -> float:
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return maxrss / 1024**2 if sys.platform == "darwin" else maxrss / 1024
+
+def run_frontend_worker(filename: str, ppl: str, n_unroll_loops: int, timer: PhaseTimer, rpc_calls: dict[str,int]):
+    sys.path.insert(0, "src/py")
+    import ast
+    from ast_utils.preprocess import preprocess_syntaxtree
+    from ast_utils.scoped_tree import get_scoped_tree
+    from ast_utils.utils import get_line_offsets, get_file_content
+    from server import _PPL_DICT, get_entry_functions, K_CFA
+
+    ppl_obj = _PPL_DICT[ppl]
+    file_content = get_file_content(filename)
+    line_offsets = get_line_offsets(filename)
+    syntax_tree = timer.run("parse", lambda: ast.parse(file_content))
+    if syntax_tree is None:
+        return
+    syntax_tree = timer.run("preprocess", lambda: ppl_obj.preprocess_syntax_tree(preprocess_syntaxtree(syntax_tree, file_content, line_offsets, n_unroll_loops)))
+    if syntax_tree is None:
+        return
+    k_cfa = K_CFA if ppl != "beanmachine" else 0
+    scoped_tree = timer.run("scoped_tree", lambda: get_scoped_tree(syntax_tree, k_cfa=k_cfa, entry_functions=get_entry_functions(syntax_tree, ppl_obj)))
+    if scoped_tree is None:
+        return
+    timer.run("cfg", lambda: [scoped_tree.get_cfg(node) for node in [scoped_tree.root_node] + [f.node for f in scoped_tree.all_functions]])
+
+def run_static_worker(filename: str, ppl: str, n_unroll_loops: int, timer: PhaseTimer, rpc_calls: dict[str,int]):
+    sys.path.insert(0, "src/static")
+    from lasapp import ProbabilisticProgram
+    from analysis.model_graph import get_model_graph
+    from analysis.constraint_verification import validate_distribution_arg_constraints
+    from analysis.hmc_assumptions_checker import check_hmc_assumptions
+    from analysis.guide_validation import check_svi, check_proposal
+
+    program = timer.run("build_ast", lambda: ProbabilisticProgram(filename, n_unroll_loops=n_unroll_loops))
+    if program is None:
+        return
+    try:
+        timer.run("model_graph", lambda: get_model_graph(program))
+        timer.run("constraints", lambda: validate_distribution_arg_constraints(program))
+        timer.run("hmc", lambda: check_hmc_assumptions(program))
+        # absolute continuity of guides, z3 solver
+        if ppl == "pyro":
+            timer.run("guide_solver", lambda: check_svi(program))
+        elif ppl == "gen":
+            timer.run("guide_solver", lambda: check_proposal(program))
+    finally:
+        for method, stats in program.client.get_rpc_stats().items():
+            rpc_calls[method] = stats.calls
+        program.close()
+
+def run_ir4ppl_worker(filename: str, ppl: str, n_unroll_loops: int, timer: PhaseTimer, rpc_calls: dict[str,int], stanc: str = "stanc"):
+    sys.path.insert(0, "src/ir4ppl")
+    sys.setrecursionlimit(100_000)
+    from pyro.pyro_cfg import get_IR_for_pyro
+    from stan.stan_cfg import get_IR_for_stan
+    from analysis.model_graph import get_graph
+    from analysis.constraint_verification import verify_constraints
+    from analysis.random_control_flow import check_for_random_control_flow
+    from analysis.funnel_detection import get_funnel_relationships
+    from analysis.absolute_continuity_checker import check_ac_guide
+
+    if ppl == "stan":
+        ir = timer.run("ir", lambda: get_IR_for_stan(filename, stanc=stanc))
+    else:
+        ir = timer.run("ir", lambda: get_IR_for_pyro(filename, n_unroll_loops))
+    if ir is None:
+        return
+    # each checker gets a fresh IR, otherwise it would reuse cached analyses of the checkers before
+    timer.run("model_graph", lambda: get_graph(ir))
+    for name, checker in [("constraints", verify_constraints), ("random_control_flow", check_for_random_control_flow), ("funnel", get_funnel_relationships)]:
+        ir.analyses.invalidate()
+        timer.run(name, lambda: checker(ir))
+    if ppl == "pyro" and ir.get_guide() is not None:
+        ir.analyses.invalidate()
+        timer.run("guide_solver", lambda: check_ac_guide(ir))
+
+def run_worker(kind: str, filename: str, n_unroll_loops: int, stanc: str):
+    timer = PhaseTimer()
+    rpc_calls: dict[str,int] = dict()
+    ppl = get_ppl(filename)
+    t0 = time.perf_counter()
+    match kind:
+        case "frontend":
+            run_frontend_worker(filename, ppl, n_unroll_loops, timer, rpc_calls)
+        case "static":
+            run_static_worker(filename, ppl, n_unroll_loops, timer, rpc_calls)
+        case "ir4ppl":
+            run_ir4ppl_worker(filename, ppl, n_unroll_loops, timer, rpc_calls, stanc)
+    result = {
+        "phases": timer.phases,
+        "errors": timer.errors,
+        "rpc_calls": rpc_calls,
+        "peak_rss_mb": get_peak_rss_mb(),
+        "wall_time": time.perf_counter() - t0
+    }
+    return result
+
+
+def benchmark_file(kind: str, filename: str, args) -> dict:
+    cmd = [sys.executable, __file__, "--worker", kind, filename, "--n_unroll_loops", str(args.n_unroll_loops), "--stanc", args.stanc]
+    try:
+        # workers print to stdout (e.g. the server prints), the result is the last line
+        res = subprocess.run(cmd, capture_output=True, timeout=args.timeout)
+        lines = res.stdout.decode("utf-8").strip().splitlines()
+        if res.returncode != 0 or len(lines) == 0:
+            return {"phases": {}, "errors": {"worker": res.stderr.decode("utf-8").strip().splitlines()[-1:]}, "rpc_calls": {}}
+        return json.loads(lines[-1])
+    except subprocess.TimeoutExpired:
+        return {"phases": {}, "errors": {"worker": f"timeout after {args.timeout}s"}, "rpc_calls": {}}
+
+def benchmark_corpus(filenames: list[str], args) -> list[dict]:
+    jobs = [(filename, kind) for filename in filenames for kind in get_workers(get_ppl(filename))]
+    # the pool threads only wait for worker processes
+    with ThreadPoolExecutor(max_workers=args.j) as pool, ThreadPoolExecutor(max_workers=1) as static_pool:
+        futures = [(static_pool if kind == "static" else pool).submit(benchmark_file, kind, filename, args) for filename, kind in jobs]
+        results = [future.result() for future in futures]
+
+    lines = {filename: {"file": filename, "ppl": get_ppl(filename), "phases": {}, "errors": {}, "rpc_calls": {}, "peak_rss_mb": {}} for filename in filenames}
+    for (filename, kind), result in zip(jobs, results):
+        line = lines[filename]
+        for phase, t in result["phases"].items():
+            line["phases"][f"{kind}/{phase}"] = t
+        for phase, error in result["errors"].items():
+            line["errors"][f"{kind}/{phase}"] = error
+        for method, count in result["rpc_calls"].items():
+            line["rpc_calls"][method] = line["rpc_calls"].get(method, 0) + count
+        if "peak_rss_mb" in result:
+            line["peak_rss_mb"][kind] = result["peak_rss_mb"]
+    return [lines[filename] for filename in filenames]
+
+
+def load_jsonl(filename: str) -> list[dict]:
+    with open(filename) as f:
+        return [json.loads(line) for line in f if line.strip() != ""]
+
+def compare_with_baseline(current: list[dict], baseline: list[dict], tolerance: float, min_diff: float) -> bool:
+    # returns True if there are regressions
+    baseline_by_file = {line["file"]: line for line in baseline}
+    phase_times: dict[str,list[float]] = dict() # phase -> [baseline, current]
+    file_regressions = []
+    for line in current:
+        base = baseline_by_file.get(line["file"])
+        if base is None:
+            continue
+        for phase, t in line["phases"].items():
+            if phase in base["phases"]:
+                times = phase_times.setdefault(phase, [0., 0.])
+                times[0] += base["phases"][phase]
+                times[1] += t
+                if t - base["phases"][phase] > min_diff and t > (1 + tolerance) * base["phases"][phase]:
+                    file_regressions.append((t - base["phases"][phase], line["file"], phase, base["phases"][phase], t))
+
+    has_regression = False
+    print(f"{'phase':35s} {'baseline':>10s} {'current':>10s} {'ratio':>7s}")
+    for phase, (base_t, t) in sorted(phase_times.items()):
+        ratio = t / base_t if base_t > 0 else float("inf")
+        regression = t - base_t > min_diff and t > (1 + tolerance) * base_t
+        has_regression = has_regression or regression
+        print(f"{phase:35s} {base_t:10.3f} {t:10.3f} {ratio:7.2f}" + ("  REGRESSION" if regression else ""))
+
+    base_rpc = sum(sum(line["rpc_calls"].values()) for line in baseline)
+    rpc = sum(sum(line["rpc_calls"].values()) for line in current)
+    print(f"RPC requests: {base_rpc} -> {rpc}")
+    base_rss = max((max(line["peak_rss_mb"].values(), default=0) for line in baseline), default=0)
+    rss = max((max(line["peak_rss_mb"].values(), default=0) for line in current), default=0)
+    print(f"Max. peak RSS of workers: {base_rss:.1f}MB -> {rss:.1f}MB")
+
+    if len(file_regressions) > 0:
+        print("Largest regressions per file:")
+        for diff, filename, phase, base_t, t in sorted(file_regressions, reverse=True)[:10]:
+            print(f"    {filename} {phase}: {base_t:.3f}s -> {t:.3f}s (+{diff:.3f}s)")
+    return has_regression
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the analyses on the evaluation corpus.")
+    parser.add_argument("-ppl", help="comma separated list of pymc, pyro, turing, gen, stan", default="pymc,pyro,turing,gen,stan")
+    parser.add_argument("-j", type=int, default=os.cpu_count() or 1, help="number of frontend and ir4ppl worker processes (static workers run one at a time)")
+    parser.add_argument("-o", default="benchmark.jsonl", help="output file, one JSON line per file")
+    parser.add_argument("--baseline", help="JSONL file of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative slowdown which is reported as regression")
+    parser.add_argument("--min_diff", type=float, default=0.05, help="absolute slowdown in seconds below which nothing is reported")
+    parser.add_argument("--n_unroll_loops", type=int, default=0)
+    parser.add_argument("--stanc", default="stanc")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--worker", nargs=2, metavar=("KIND", "FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        kind, filename = args.worker
+        result = run_worker(kind, filename, args.n_unroll_loops, args.stanc)
+        print()
+        print(json.dumps(result))
+        exit(0)
+
+    filenames = collect_files(args.ppl.split(","))
+    print(f"Benchmarking {len(filenames)} files with {args.j} workers.")
+    t0 = time.time()
+    lines = benchmark_corpus(filenames, args)
+    with open(args.o, "w") as f:
+        for line in lines:
+            f.write(json.dumps(line) + "\n")
+    n_errors = sum(len(line["errors"]) > 0 for line in lines)
+    print(f"Wrote {len(lines)} results to {args.o} ({n_errors} files with errors) in {time.time()-t0:.2f} seconds.")
+
+    if args.baseline is not None:
+        has_regression = compare_with_baseline(lines, load_jsonl(args.baseline), args.tolerance, args.min_diff)
+        exit(1 if has_regression else 0)
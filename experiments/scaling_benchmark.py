@@ -0,0 +1,210 @@
+import sys
+import os
+import json
+import math
+import time
+import argparse
+import tempfile
+import subprocess
+import contextlib
+from dataclasses import replace
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmark import PhaseTimer, get_peak_rss_mb
+from synthetic_programs import ProgramShape, generate_program, FILE_EXTENSIONS
+
+# Scaling benchmark of the core analyses on synthetic programs (see synthetic_programs.py).
+# Run from the root of the repository, e.g.
+#   python experiments/scaling_benchmark.py -ppl pyro -dim if_depth,n_loops -o scaling.jsonl
+#
+# For each PPL and dimension of ProgramShape, programs are generated for the scales of the dimension
+# (all other dimensions keep their default value) and analysed by fresh worker processes:
+#   ir4ppl:   get_RDs, get_BPs, estimate_value_range, get_path_condition and check_ac of src/ir4ppl (pyro and stan programs)
+#   frontend: the endpoints of the static analysis server src/py/server.py, called in process (pyro and pymc programs)
+# Each phase starts without cached analyses, so it also contains the RD and BP queries it depends on.
+# If a worker exceeds the timeout, larger scales of the dimension are skipped.
+#
+# For each PPL, worker and dimension the scaling curve is printed: the time of each phase per scale,
+# and the degree of the last step (slope in log-log scale). A polynomial analysis has a constant degree,
+# a growing degree indicates exponential behaviour.
+
+SCALES = {
+    "n_samples": [1, 2, 4, 8, 16, 32, 64],
+    "if_depth": [0, 1, 2, 4, 8, 16, 32],
+    "n_loops": [0, 1, 2, 4, 8, 16],
+    "n_unroll_loops": [0, 1, 2, 4, 8, 16, 32],
+    "call_depth": [0, 1, 2, 4, 8, 16],
+    "n_same_name": [1, 2, 4, 8, 16, 32],
+}
+
+def get_workers(ppl: str) -> list[str]:
+    match ppl:
+        case "pyro":
+            return ["frontend", "ir4ppl"]
+        case "pymc":
+            return ["frontend"]
+        case "stan":
+            return ["ir4ppl"]
+    return []
+
+def run_ir4ppl_worker(filename: str, ppl: str, n_unroll_loops: int, timer: PhaseTimer, stanc: str):
+    sys.path.insert(0, "src/ir4ppl")
+    sys.setrecursionlimit(100_000)
+    from pyro.pyro_cfg import get_IR_for_pyro
+    from stan.stan_cfg import get_IR_for_stan
+    from ir4ppl.ir import estimate_value_range, get_path_condition
+    from analysis.rd_bp import get_RDs, get_BPs
+    from analysis.symbolics import Symbol
+    from analysis.absolute_continuity_checker import check_ac
+
+    if ppl == "stan":
+        ir = timer.run("ir", lambda: get_IR_for_stan(filename, stanc=stanc))
+    else:
+        ir = timer.run("ir", lambda: get_IR_for_pyro(filename, n_unroll_loops))
+    if ir is None:
+        return
+    sample_nodes = ir.get_sample_nodes()
+
+    # uncached queries
+    timer.run("get_RDs", lambda: [get_RDs(node, variable) for node in sample_nodes for expr in [node.get_address_expr(), node.get_distribution_expr()] for variable in expr.get_free_variables()])
+    timer.run("get_BPs", lambda: [get_BPs(ir.get_cfg_for_node(node)[1], node) for node in sample_nodes])
+
+    ir.analyses.invalidate()
+    timer.run("estimate_value_range", lambda: [estimate_value_range(ir, node, arg, {}) for node in sample_nodes for arg in node.get_distribution().args.values()])
+
+    ir.analyses.invalidate()
+    assumptions = {node: Symbol(node.symbolic_name()) for node in sample_nodes}
+    timer.run("get_path_condition", lambda: [get_path_condition(ir, node, assumptions) for node in sample_nodes])
+
+    ir.analyses.invalidate()
+    model, guide = ir.get_model(), ir.get_guide()
+    model_sample_nodes = [node for node in sample_nodes if model is None or model.contains(node)]
+    # without guide, check the model against itself
+    guide_sample_nodes = [node for node in sample_nodes if guide.contains(node)] if guide is not None else model_sample_nodes
+    timer.run("check_ac", lambda: check_ac(ir, guide_sample_nodes, model_sample_nodes))
+
+def run_frontend_worker(filename: str, ppl: str, n_unroll_loops: int, timer: PhaseTimer):
+    sys.path.insert(0, "src/py")
+    import server
+
+    tree_id = timer.run("build_ast", lambda: server.build_ast(filename, ppl, n_unroll_loops))
+    if tree_id is None:
+        return
+    random_variables = timer.run("get_random_variables", lambda: server.get_random_variables(tree_id))
+    if random_variables is None:
+        return
+    nodes = [rv.node.to_dict() for rv in random_variables]
+    timer.run("get_data_dependencies", lambda: [server.get_data_dependencies(tree_id, node) for node in nodes])
+    timer.run("get_control_dependencies", lambda: [server.get_control_dependencies(tree_id, node) for node in nodes])
+    timer.run("estimate_value_range", lambda: [server.estimate_value_range(tree_id, param.node.to_dict(), []) for rv in random_variables for param in rv.distribution.params])
+    model = server.get_model(tree_id)
+    mask = [(rv.node.to_dict(), {"expr": f"Real({rv.name})"}) for rv in random_variables]
+    timer.run("get_path_conditions", lambda: server.get_path_conditions(tree_id, model.node.to_dict(), nodes, mask))
+
+def run_worker(kind: str, ppl: str, filename: str, n_unroll_loops: int, stanc: str) -> dict:
+    timer = PhaseTimer()
+    # the server prints every request
+    with contextlib.redirect_stdout(sys.stderr):
+        if kind == "ir4ppl":
+            run_ir4ppl_worker(filename, ppl, n_unroll_loops, timer, stanc)
+        else:
+            run_frontend_worker(filename, ppl, n_unroll_loops, timer)
+    return {"phases": timer.phases, "errors": timer.errors, "peak_rss_mb": get_peak_rss_mb()}
+
+
+def benchmark_program(kind: str, ppl: str, filename: str, n_unroll_loops: int, args) -> dict:
+    cmd = [sys.executable, __file__, "--worker", kind, ppl, filename, "--n_unroll_loops", str(n_unroll_loops), "--stanc", args.stanc]
+    try:
+        res = subprocess.run(cmd, capture_output=True, timeout=args.timeout)
+        if res.returncode != 0:
+            return {"phases": {}, "errors": {"worker": res.stderr.decode("utf-8").strip().splitlines()[-1:]}}
+        return json.loads(res.stdout.decode("utf-8"))
+    except subprocess.TimeoutExpired:
+        return {"phases": {}, "errors": {"worker": f"timeout after {args.timeout}s"}, "timeout": True}
+
+def benchmark_dimension(ppl: str, kind: str, dimension: str, scales: list[int], folder: str, args) -> list[dict]:
+    lines = []
+    for scale in scales:
+        shape = replace(ProgramShape(), **{dimension: scale})
+        filename = os.path.join(folder, f"{ppl}_{kind}_{dimension}_{scale}{FILE_EXTENSIONS[ppl]}")
+        with open(filename, "w") as f:
+            f.write(generate_program(ppl, shape))
+        result = benchmark_program(kind, ppl, filename, shape.n_unroll_loops, args)
+        lines.append({"ppl": ppl, "kind": kind, "dimension": dimension, "scale": scale, "shape": shape.to_dict()} | result)
+        if result.get("timeout", False):
+            break # larger scales take even longer
+    return lines
+
+
+def get_degree(scale1: int, t1: float, scale2: int, t2: float) -> float:
+    # slope of the curve in log-log scale, scale 0 is treated as 1
+    scale1, scale2 = max(scale1, 1), max(scale2, 1)
+    if scale1 == scale2 or t1 <= 0 or t2 <= 0:
+        return math.nan
+    return math.log(t2 / t1) / math.log(scale2 / scale1)
+
+def print_scaling_curve(lines: list[dict]):
+    ppl, kind, dimension = lines[0]["ppl"], lines[0]["kind"], lines[0]["dimension"]
+    phases = list(dict.fromkeys(phase for line in lines for phase in line["phases"]))
+    print(f"\n{ppl} {kind} {dimension}")
+    print(f"{'scale':>8s} " + " ".join(f"{phase[:20]:>20s}" for phase in phases))
+    for line in lines:
+        cells = []
+        for phase in phases:
+            if phase in line["phases"] and phase not in line["errors"]:
+                cells.append(f"{line['phases'][phase]:20.4f}")
+            else:
+                cells.append(f"{'error':>20s}")
+        print(f"{line['scale']:8d} " + " ".join(cells) + ("  TIMEOUT" if line.get("timeout", False) else ""))
+    completed = [line for line in lines if not line.get("timeout", False)]
+    if len(completed) >= 2:
+        a, b = completed[-2], completed[-1]
+        degrees = [get_degree(a["scale"], a["phases"][phase], b["scale"], b["phases"][phase])
+                   if all(phase in line["phases"] and phase not in line["errors"] for line in (a, b)) else math.nan for phase in phases]
+        print(f"{'degree':>8s} " + " ".join(f"{degree:20.2f}" for degree in degrees))
+    errors = {phase: error for line in lines for phase, error in line["errors"].items()}
+    for phase, error in errors.items():
+        print(f"    {phase}: {error}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the analyses on synthetic programs of increasing size.")
+    parser.add_argument("-ppl", help="comma separated list of pyro, pymc, stan", default="pyro,pymc,stan")
+    parser.add_argument("-dim", help="comma separated list of dimensions", default=",".join(SCALES.keys()))
+    parser.add_argument("--scales", help="comma separated list of scales (overrides the default scales of all dimensions)")
+    parser.add_argument("-j", type=int, default=os.cpu_count() or 1, help="number of worker processes, one per PPL, worker and dimension")
+    parser.add_argument("-o", default="scaling.jsonl", help="output file, one JSON line per program and worker")
+    parser.add_argument("--folder", help="folder for the generated programs (default: temporary folder)")
+    parser.add_argument("--stanc", default="stanc")
+    parser.add_argument("--timeout", type=float, default=120, help="timeout per program and worker in seconds")
+    parser.add_argument("--worker", nargs=3, metavar=("KIND", "PPL", "FILE"), help=argparse.SUPPRESS)
+    parser.add_argument("--n_unroll_loops", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        kind, ppl, filename = args.worker
+        result = run_worker(kind, ppl, filename, args.n_unroll_loops, args.stanc)
+        print(json.dumps(result))
+        exit(0)
+
+    dimensions = args.dim.split(",")
+    for dimension in dimensions:
+        assert dimension in SCALES, f"Unknown dimension {dimension}"
+    jobs = [(ppl, kind, dimension, [int(s) for s in args.scales.split(",")] if args.scales else SCALES[dimension])
+            for ppl in args.ppl.split(",") for kind in get_workers(ppl) for dimension in dimensions]
+
+    t0 = time.time()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = args.folder if args.folder is not None else tmpdir
+        os.makedirs(folder, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=args.j) as pool:
+            # the pool threads only wait for worker processes
+            results = list(pool.map(lambda job: benchmark_dimension(*job, folder, args), jobs))
+
+    with open(args.o, "w") as f:
+        for lines in results:
+            for line in lines:
+                f.write(json.dumps(line) + "\n")
+    for lines in results:
+        print_scaling_curve(lines)
+    print(f"\nWrote {sum(len(lines) for lines in results)} results to {args.o} in {time.time()-t0:.2f} seconds.")
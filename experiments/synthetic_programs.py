@@ -0,0 +1,211 @@
+import argparse
+from dataclasses import dataclass, fields
+
+# Generator of synthetic Pyro, PyMC and Stan programs for scaling benchmarks (see scaling_benchmark.py).
+# All programs have the same structure, each dimension of ProgramShape scales one part of it:
+#
+#   helper_0(x):              innermost helper samples "h", helper_k calls helper_{k-1}     (call_depth)
+#   model:
+#     x0 ~ Normal(0, 1)
+#     x1 ~ Normal(x0, 1) ...  chain of sample statements                                  (n_samples)
+#     s = x_last
+#     if x0 > 0:              nested if statements which branch on random variables      (if_depth)
+#         b1 ~ Normal(s, 1); s = b1
+#         if b1 > 0: ...
+#     else:
+#         s = s + 1
+#     z ~ Normal(s, 1) ...    sample statements with the same name "z"                    (n_same_name)
+#     for i in range(N):      loops with a sample and an if statement in their body      (n_loops)
+#         l0 ~ Normal(s, 1)   N is not a constant, loops are unrolled n_unroll_loops times (n_unroll_loops)
+#         if l0 > 0: s = s + l0 else: s = s - l0
+#     s = helper_k(s)
+#     y ~ Normal(s, 1) observed
+#
+# Pyro programs also have a guide with the same body (without observation), such that the absolute continuity check has work to do.
+
+@dataclass
+class ProgramShape:
+    n_samples: int = 4
+    if_depth: int = 1
+    n_loops: int = 1
+    n_unroll_loops: int = 1 # not part of the program, parameter of the frontends
+    call_depth: int = 1
+    n_same_name: int = 1
+
+    def to_dict(self) -> dict[str,int]:
+        return {field.name: getattr(self, field.name) for field in fields(self)}
+
+# statements of the generated body, rendered for each PPL
+# ("sample", target, address, mu), ("assign", target, expr), ("if", test, then_stmts, else_stmts),
+# ("for", body_stmts), ("call", target, function, arg), ("observe", mu)
+
+def get_body(shape: ProgramShape, observe: bool = True) -> list[tuple]:
+    assert shape.n_samples >= 1, "Programs need at least one sample statement"
+    body: list[tuple] = [("sample", "x0", "x0", "0")]
+    for i in range(1, shape.n_samples):
+        body.append(("sample", f"x{i}", f"x{i}", f"x{i-1}"))
+    body.append(("assign", "s", f"x{shape.n_samples-1}"))
+
+    # innermost if statement first
+    branch: list[tuple] = []
+    for depth in range(shape.if_depth, 0, -1):
+        test = "x0" if depth == 1 else f"b{depth-1}"
+        then_stmts = [("sample", f"b{depth}", f"b{depth}", "s"), ("assign", "s", f"b{depth}")] + branch
+        branch = [("if", test, then_stmts, [("assign", "s", "s + 1")])]
+    body.extend(branch)
+
+    for i in range(shape.n_same_name):
+        body.append(("sample", "z", "z", "s" if i == 0 else "z"))
+    if shape.n_same_name > 0:
+        body.append(("assign", "s", "z"))
+
+    for i in range(shape.n_loops):
+        body.append(("for", [
+            ("sample", f"l{i}", f"l{i}", "s"),
+            ("if", f"l{i}", [("assign", "s", f"s + l{i}")], [("assign", "s", f"s - l{i}")])
+        ]))
+
+    if shape.call_depth > 0:
+        body.append(("call", "s", f"helper_{shape.call_depth-1}", "s"))
+    if observe:
+        body.append(("observe", "s"))
+    return body
+
+def get_sample_targets(stmts: list[tuple]) -> list[str]:
+    targets: list[str] = []
+    for stmt in stmts:
+        match stmt:
+            case ("sample", target, _, _):
+                targets.append(target)
+            case ("if", _, then_stmts, else_stmts):
+                targets.extend(get_sample_targets(then_stmts) + get_sample_targets(else_stmts))
+            case ("for", body_stmts):
+                targets.extend(get_sample_targets(body_stmts))
+    return list(dict.fromkeys(targets))
+
+
+class PythonRenderer:
+    # Pyro and PyMC
+    def __init__(self, ppl: str) -> None:
+        assert ppl in ("pyro", "pymc")
+        self.ppl = ppl
+
+    def sample(self, target: str, address: str, mu: str) -> str:
+        if self.ppl == "pyro":
+            return f'{target} = pyro.sample("{address}", dist.Normal({mu}, 1.))'
+        return f'{target} = pm.Normal("{address}", mu={mu}, sigma=1.)'
+
+    def observe(self, mu: str) -> str:
+        if self.ppl == "pyro":
+            return f'pyro.sample("y", dist.Normal({mu}, 1.), obs=0.)'
+        return f'pm.Normal("y", mu={mu}, sigma=1., observed=0.)'
+
+    def render_stmts(self, stmts: list[tuple], indent: str) -> list[str]:
+        lines: list[str] = []
+        for stmt in stmts:
+            match stmt:
+                case ("sample", target, address, mu):
+                    lines.append(indent + self.sample(target, address, mu))
+                case ("assign", target, expr):
+                    lines.append(f"{indent}{target} = {expr}")
+                case ("if", test, then_stmts, else_stmts):
+                    lines.append(f"{indent}if {test} > 0:")
+                    lines.extend(self.render_stmts(then_stmts, indent + "    "))
+                    lines.append(f"{indent}else:")
+                    lines.extend(self.render_stmts(else_stmts, indent + "    "))
+                case ("for", body_stmts):
+                    lines.append(f"{indent}for i in range(N):")
+                    lines.extend(self.render_stmts(body_stmts, indent + "    "))
+                case ("call", target, function, arg):
+                    lines.append(f"{indent}{target} = {function}({arg})")
+                case ("observe", mu):
+                    lines.append(indent + self.observe(mu))
+        return lines
+
+    def render(self, shape: ProgramShape) -> str:
+        if self.ppl == "pyro":
+            lines = ["import pyro", "import pyro.distributions as dist"]
+        else:
+            lines = ["import pymc as pm"]
+        lines += ["", "N = 10", ""]
+        for depth in range(shape.call_depth):
+            lines.append(f"def helper_{depth}(x):")
+            if depth == 0:
+                lines.append("    " + self.sample("h", "h", "x"))
+                lines.append("    return h")
+            else:
+                lines.append(f"    return helper_{depth-1}(x) + 1.")
+            lines.append("")
+        if self.ppl == "pyro":
+            lines.append("def model():")
+            lines.extend(self.render_stmts(get_body(shape), "    "))
+            lines += ["", "def guide():"]
+            lines.extend(self.render_stmts(get_body(shape, observe=False), "    "))
+        else:
+            lines.append("with pm.Model() as model:")
+            lines.extend(self.render_stmts(get_body(shape), "    "))
+        return "\n".join(lines) + "\n"
+
+
+class StanRenderer:
+    def render_stmts(self, stmts: list[tuple], indent: str) -> list[str]:
+        lines: list[str] = []
+        for stmt in stmts:
+            match stmt:
+                case ("sample", target, _, mu):
+                    lines.append(f"{indent}{target} ~ normal({mu}, 1);")
+                case ("assign", target, expr):
+                    lines.append(f"{indent}{target} = {expr};")
+                case ("if", test, then_stmts, else_stmts):
+                    lines.append(f"{indent}if ({test} > 0) {{")
+                    lines.extend(self.render_stmts(then_stmts, indent + "  "))
+                    lines.append(f"{indent}}} else {{")
+                    lines.extend(self.render_stmts(else_stmts, indent + "  "))
+                    lines.append(f"{indent}}}")
+                case ("for", body_stmts):
+                    lines.append(f"{indent}for (i in 1:N) {{")
+                    lines.extend(self.render_stmts(body_stmts, indent + "  "))
+                    lines.append(f"{indent}}}")
+                case ("call", target, function, arg):
+                    lines.append(f"{indent}{target} = {function}_lp({arg});")
+                case ("observe", mu):
+                    lines.append(f"{indent}y ~ normal({mu}, 1);")
+        return lines
+
+    def render(self, shape: ProgramShape) -> str:
+        body = get_body(shape)
+        # Stan functions cannot declare parameters, the innermost helper scores its argument instead of sampling "h"
+        lines = ["functions {"]
+        for depth in range(shape.call_depth):
+            lines.append(f"  real helper_{depth}_lp(real x) {{")
+            if depth == 0:
+                lines.append("    x ~ normal(0, 1);")
+                lines.append("    return x;")
+            else:
+                lines.append(f"    return helper_{depth-1}_lp(x) + 1;")
+            lines.append("  }")
+        lines += ["}", "data {", "  int<lower=0> N;", "  real y;", "}", "parameters {"]
+        lines += [f"  real {target};" for target in get_sample_targets(body)]
+        lines += ["}", "model {", "  real s;"]
+        lines.extend(self.render_stmts(body, "  "))
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+
+FILE_EXTENSIONS = {"pyro": ".py", "pymc": ".py", "stan": ".stan"}
+
+def generate_program(ppl: str, shape: ProgramShape) -> str:
+    if ppl == "stan":
+        return StanRenderer().render(shape)
+    return PythonRenderer(ppl).render(shape)
+
+
+if __name__ == "__main__":
+    # python experiments/synthetic_programs.py pyro --if_depth 3 --n_loops 2
+    parser = argparse.ArgumentParser()
+    parser.add_argument("ppl", choices=list(FILE_EXTENSIONS.keys()))
+    for field in fields(ProgramShape):
+        parser.add_argument(f"--{field.name}", type=int, default=field.default)
+    args = parser.parse_args()
+    shape = ProgramShape(**{field.name: getattr(args, field.name) for field in fields(ProgramShape)})
+    print(generate_program(args.ppl, shape), end="")
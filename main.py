@@ -8,22 +8,31 @@ from analysis.constraint_verification import *
 from analysis.hmc_assumptions_checker import *
 from analysis.guide_validation import *
 from analysis.utils import *
+from profiling import PhaseProfiler
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument("filename", help="path to probabilistic program")
-    parser.add_argument("-a", help="graph | hmc | constraint | guide-proposal | guide-svi", default="graph")
+    parser.add_argument("-a", help="graph | hmc | constraint | guide-proposal | guide-svi, or comma separated list (analyses share query results)", default="graph")
     parser.add_argument("--v", help="if set, source code of file will be printed", action='store_true')
     parser.add_argument("--view", help="Only applicable for -a graph. If set, model graph will be plotted and displayed. Otherwise, only saved to disk.", action='store_true')
+    parser.add_argument("--profile", help="if set, RPC requests and cProfile hot spots of each phase are printed", action='store_true')
+    parser.add_argument("--profile_output", help="write profile to .prof (pstats) or .json (speedscope) file")
     args = parser.parse_args()
 
     filename = args.filename
 
-    program = lasapp.ProbabilisticProgram(filename, n_unroll_loops=3)
+    # phases are profiled with --profile (see src/static/profiling.py)
+    profiler = PhaseProfiler() if args.profile or args.profile_output is not None else None
+    run = profiler.run if profiler is not None else (lambda name, f: f())
+
+    program = run("build_ast", lambda: lasapp.ProbabilisticProgram(filename, n_unroll_loops=3))
+    if profiler is not None:
+        profiler.add_client(program.client)
 
     if args.v:
         file_content = get_file_content(filename)
-        variables = program.get_random_variables()
+        variables = run("get_random_variables", program.get_random_variables)
         highlights = [(rv.node.first_byte, rv.node.last_byte, "106m" if rv.is_observed else "102m") for rv in variables]
         print_source_highlighted(file_content, highlights)
     # print()
@@ -31,39 +40,48 @@ if __name__ == '__main__':
     # for rv in variables:
     #     print(rv.name, rv.distribution.node.source_text)
 
-    analysis = args.a
+    for analysis in args.a.split(","):
+        if analysis == "hmc":
+            warnings = run(analysis, lambda: check_hmc_assumptions(program))
+            if len(warnings) == 0:
+                print("No HMC warnings.")
+            warnings = set(map(str, warnings))
+            for (i, warning) in enumerate(warnings):
+                print(f"{i+1:2d}: {warning}")
 
-    if analysis == "hmc":
-        warnings = check_hmc_assumptions(program)
-        if len(warnings) == 0:
-            print("No HMC warnings.")
-        warnings = set(map(str, warnings))
-        for (i, warning) in enumerate(warnings):
-            print(f"{i+1:2d}: {warning}")
+        elif analysis == "graph":
+            model_graph = run(analysis, lambda: get_model_graph(program))
+            print("Model Graph Edges:")
+            merge_nodes_by_name(model_graph)
+            for x,y in model_graph.edges:
+                print(x.name, "->", y.name)
+            plot_model_graph(model_graph, view=args.view)
 
-    elif analysis == "graph":
-        model_graph = get_model_graph(program)
-        print("Model Graph Edges:")
-        merge_nodes_by_name(model_graph)
-        for x,y in model_graph.edges:
-            print(x.name, "->", y.name)
-        plot_model_graph(model_graph, view=args.view)
+        elif analysis == "constraint":
+            violations = run(analysis, lambda: validate_distribution_arg_constraints(program))
+            print_source_highlight_violations(violations)
 
-    elif analysis == "constraint":
-        violations = validate_distribution_arg_constraints(program)
-        print_source_highlight_violations(violations)
+        elif analysis == "guide-proposal":
+            violations = run(analysis, lambda: check_proposal(program))
+            if len(violations) == 0:
+                print("No warnings.")
+            for (i, v) in enumerate(violations):
+                print(f"{i+1}.:", v)
 
-    elif analysis == "guide-proposal":
-        violations = check_proposal(program)
-        if len(violations) == 0:
-            print("No warnings.")
-        for (i, v) in enumerate(violations):
-            print(f"{i+1}.:", v)
+        elif analysis == "guide-svi":
+            violations = run(analysis, lambda: check_svi(program))
+            if len(violations) == 0:
+                print("No warnings.")
+            for (i, v) in enumerate(violations):
+                print(f"{i+1}.:", v)
 
-    elif analysis == "guide-svi":
-        violations = check_svi(program)
-        if len(violations) == 0:
-            print("No warnings.")
-        for (i, v) in enumerate(violations):
-            print(f"{i+1}.:", v)
+    program.close()
 
+    if profiler is not None:
+        if args.profile:
+            profiler.print_report()
+            print("\nCache of ProbabilisticProgram:")
+            for method, stats in program.get_cache_stats().items():
+                print(f"    {method:30s} {stats['hits']:6d} hits {stats['misses']:6d} misses")
+        if args.profile_output is not None:
+            profiler.dump(args.profile_output)
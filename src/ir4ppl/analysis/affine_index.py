@@ -0,0 +1,111 @@
+from typing import Dict, Tuple, Optional, Sequence, FrozenSet
+from dataclasses import dataclass
+
+# Symbolic index domain for array dependencies.
+# An index expression is affine if it has the form b + c_1 * i_1 + ... + c_n * i_n
+# with integer constants b, c_k and integer variables i_k (identified by symbol id).
+# This allows us to decide if x[i] and x[j] may alias without unrolling loops.
+#
+# Whether two accesses alias depends on the values of the variables at the write and at the read.
+# For each variable in the index of the read we know one of
+#   - same: variable is not reassigned between write and read
+#   - distinct: we went back to a previous iteration of a loop over distinct values (e.g. range) of this variable
+#   - unknown: variable may have been reassigned with any value
+# for x[i] = ...; ... = x[i] and i the same, the accesses must alias
+# for x[i] = ...; ... = x[i] and i distinct, the accesses do not alias
+# for x[i] = ...; ... = x[i-1] and i distinct, the accesses may alias
+
+@dataclass(frozen=True)
+class AffineExpression:
+    const: int
+    coefs: Tuple[Tuple[int,int], ...] # sorted (symbol_id, coef) with coef != 0
+
+    def get_coef(self, symbol_id: int) -> int:
+        for s, c in self.coefs:
+            if s == symbol_id:
+                return c
+        return 0
+
+    def get_symbol_ids(self) -> FrozenSet[int]:
+        return frozenset(s for s, _ in self.coefs)
+
+    def __add__(self, other: 'AffineExpression') -> 'AffineExpression':
+        coefs: Dict[int,int] = dict(self.coefs)
+        for s, c in other.coefs:
+            coefs[s] = coefs.get(s, 0) + c
+        return make_affine(self.const + other.const, coefs)
+
+    def scale(self, factor: int) -> 'AffineExpression':
+        return make_affine(self.const * factor, {s: c * factor for s, c in self.coefs})
+
+    def __neg__(self) -> 'AffineExpression':
+        return self.scale(-1)
+
+    def __sub__(self, other: 'AffineExpression') -> 'AffineExpression':
+        return self + (-other)
+
+    def __repr__(self) -> str:
+        terms = [f"{c}*s{s}" for s, c in self.coefs]
+        if self.const != 0 or len(terms) == 0:
+            terms.append(str(self.const))
+        return " + ".join(terms)
+
+def make_affine(const: int, coefs: Dict[int,int]) -> AffineExpression:
+    return AffineExpression(const, tuple(sorted((s, c) for s, c in coefs.items() if c != 0)))
+
+def affine_constant(value: int) -> AffineExpression:
+    return AffineExpression(value, ())
+
+def affine_variable(symbol_id: int) -> AffineExpression:
+    return AffineExpression(0, ((symbol_id, 1),))
+
+# index of an access x[e_1, ..., e_n], None for dimensions which are not affine
+AffineIndex = Tuple[Optional[AffineExpression], ...]
+
+MUST_ALIAS = 1
+MAY_ALIAS = 0
+NO_ALIAS = -1
+
+def _dimension_alias(write: Optional[AffineExpression], read: Optional[AffineExpression], distinct: FrozenSet[int], unknown: FrozenSet[int]) -> int:
+    if write is None or read is None:
+        return MAY_ALIAS
+    symbol_ids = write.get_symbol_ids() | read.get_symbol_ids()
+    if len(symbol_ids & unknown) > 0:
+        return MAY_ALIAS
+    diff = write - read
+    distinct_symbols = symbol_ids & distinct
+    if len(distinct_symbols) == 0:
+        # all variables have the same value at write and read
+        if len(diff.coefs) == 0:
+            return MUST_ALIAS if diff.const == 0 else NO_ALIAS
+        return MAY_ALIAS
+    if len(distinct_symbols) == 1:
+        # write: c * i' + b_w + rest, read: c * i + b_r + rest with i' != i and rest the same
+        # -> alias iff c * (i' - i) = b_r - b_w for some i' - i != 0
+        symbol_id = next(iter(distinct_symbols))
+        c = write.get_coef(symbol_id)
+        if c != 0 and c == read.get_coef(symbol_id) and len(diff.coefs) == 0:
+            offset = -diff.const
+            if offset == 0 or offset % c != 0:
+                return NO_ALIAS
+            return MAY_ALIAS
+    return MAY_ALIAS
+
+def index_alias(write: AffineIndex, read: AffineIndex, distinct: FrozenSet[int], unknown: FrozenSet[int]) -> int:
+    # MUST_ALIAS, MAY_ALIAS or NO_ALIAS for the accesses x[write] and x[read]
+    if len(write) != len(read):
+        return MAY_ALIAS
+    result = MUST_ALIAS
+    for w, r in zip(write, read):
+        a = _dimension_alias(w, r, distinct, unknown)
+        if a == NO_ALIAS:
+            return NO_ALIAS
+        result = min(result, a)
+    return result
+
+def get_index_symbol_ids(index: Sequence[Optional[AffineExpression]]) -> FrozenSet[int]:
+    symbol_ids: FrozenSet[int] = frozenset()
+    for e in index:
+        if e is not None:
+            symbol_ids = symbol_ids | e.get_symbol_ids()
+    return symbol_ids
@@ -1,4 +1,5 @@
 from ir4ppl.ir import * 
+from ir4ppl.parallel import map_nodes
 from analysis.distribution_properties import get_distribution_properties, to_interval, ParamDependentBound, IntervalConstraint
 from dataclasses import dataclass
 
@@ -21,7 +22,7 @@ class ConstraintViolation:
         location = self.param_expr.get_source_location()
         return [(location.first_byte, location.last_byte)]
 
-def verify_constraints(program_ir: PPL_IR) -> tuple[list[ConstraintViolation],bool]:
+def verify_constraints(program_ir: PPL_IR, n_workers: Optional[int] = None) -> tuple[list[ConstraintViolation],bool]:
     can_be_analyzed = True
     for node in program_ir.get_sample_nodes() + program_ir.get_factor_nodes():
         try:
@@ -57,21 +58,34 @@ def verify_constraints(program_ir: PPL_IR) -> tuple[list[ConstraintViolation],bo
         if interval is not None:
             assumptions[node] = interval
 
-    violations = []
-    for node in program_ir.get_sample_nodes() + program_ir.get_factor_nodes():
+    # estimated ranges of parameters that may violate their constraints, one job per node
+    def get_violated_params(program_ir: PPL_IR, node: SampleNode | FactorNode) -> list[tuple[str,Interval]]:
         try:
             dist = node.get_distribution()
         except:
-            continue
-        # dist = node.get_distribution()        
+            return []
         properties = get_distribution_properties(dist.name)
         assert properties is not None
+        violated_params = []
         for param_name, param_expr in dist.args.items():
             param_interval = estimate_value_range(program_ir, node, param_expr, assumptions)
             assert param_name in properties.param_constraints, f"Cannot find constraints for {param_name} in {properties}"
             param_constraints = properties.param_constraints[param_name]
             assert isinstance(param_constraints, IntervalConstraint), f"Param constraints {param_constraints} are not IntervalConstraint"
             if param_interval.low < param_constraints.low or param_constraints.high < param_interval.high:
-                violations.append(ConstraintViolation(node, param_name, param_expr, param_constraints, param_interval, dist))
+                violated_params.append((param_name, param_interval))
+        return violated_params
+
+    violations = []
+    random_stmts = program_ir.get_sample_nodes() + program_ir.get_factor_nodes()
+    for node, violated_params in zip(random_stmts, map_nodes(get_violated_params, program_ir, random_stmts, n_workers)):
+        if len(violated_params) == 0:
+            continue
+        # expressions are not sent back by process workers, get them again
+        dist = node.get_distribution()
+        properties = get_distribution_properties(dist.name)
+        assert properties is not None
+        for param_name, param_interval in violated_params:
+            violations.append(ConstraintViolation(node, param_name, dist.args[param_name], properties.param_constraints[param_name], param_interval, dist))
 
     return violations, True
\ No newline at end of file
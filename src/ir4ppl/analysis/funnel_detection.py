@@ -1,6 +1,7 @@
 
 from collections import deque
 from ir4ppl.ir import * 
+from ir4ppl.parallel import map_nodes
 from typing import Deque, Tuple, List
 from dataclasses import dataclass
 
@@ -19,27 +20,32 @@ class FunnelWarning:
         return [(loc1.first_byte, loc1.last_byte), (loc2.first_byte, loc2.last_byte)]
     
 
-def get_funnel_relationships(program_ir: PPL_IR) -> List[FunnelWarning]:
+def get_funnel_warnings_for_node(program_ir: PPL_IR, node: SampleNode | FactorNode) -> List[FunnelWarning]:
+    warnings: list[FunnelWarning] = []
+    try:
+        distribution = node.get_distribution()
+        for name, expr in distribution.args.items():
+            if name == "scale":
+                marked: Set[CFGNode] = set()
+                queue: Deque[Tuple[CFGNode,Expression]] = deque([(node,expr)])
+                for dep in program_ir.get_data_deps_for_expr(node, expr):
+                    if dep not in marked:
+                        if isinstance(dep, SampleNode):
+                            warnings.append(FunnelWarning(node,dep))
+                    else:
+                        queue.append((dep, dep.get_value_expr()))
+                        if dep.get_target().is_indexed_target():
+                            queue.append((dep, dep.get_target().get_index_expr()))
+                    marked.add(dep)
+    except:
+        pass
+    return warnings
+
+def get_funnel_relationships(program_ir: PPL_IR, n_workers: Optional[int] = None) -> List[FunnelWarning]:
     
     warnings: list[FunnelWarning] = []
-    for node in program_ir.get_sample_nodes() + program_ir.get_factor_nodes():
-        try:
-            distribution = node.get_distribution()
-            for name, expr in distribution.args.items():
-                if name == "scale":
-                    marked: Set[CFGNode] = set()
-                    queue: Deque[Tuple[CFGNode,Expression]] = deque([(node,expr)])
-                    for dep in program_ir.get_data_deps_for_expr(node, expr):
-                        if dep not in marked:
-                            if isinstance(dep, SampleNode):
-                                warnings.append(FunnelWarning(node,dep))
-                        else:
-                            queue.append((dep, dep.get_value_expr()))
-                            if dep.get_target().is_indexed_target():
-                                queue.append((dep, dep.get_target().get_index_expr()))
-                        marked.add(dep)
-        except:
-            pass
+    random_stmts = program_ir.get_sample_nodes() + program_ir.get_factor_nodes()
+    for node_warnings in map_nodes(get_funnel_warnings_for_node, program_ir, random_stmts, n_workers):
+        warnings.extend(node_warnings)
         
-    return warnings
-       
+    return warnings
\ No newline at end of file
@@ -1,56 +1,108 @@
 from ir4ppl.cfg import *
+from analysis.affine_index import index_alias, get_index_symbol_ids, MUST_ALIAS, NO_ALIAS
 from copy import copy
 
-def _get_RDs(cfgnode: CFGNode, variable: Variable, path: List[CFGNode], rds: Set[AbstractAssignNode], memo: Dict[BranchNode, Set[AbstractAssignNode]]):
+# For indexed reads x[e] with affine index e, we track how the variables of e relate
+# between the current node and the read (see analysis/affine_index.py):
+# state = (distinct, unknown), where distinct is a set of (symbol_id, LoopIterNode) for which we went back
+# to a previous iteration of the loop, and unknown is a set of symbol_ids that may have been reassigned.
+IndexState = Tuple[FrozenSet[Tuple[int,LoopIterNode]], FrozenSet[int]]
+EMPTY_INDEX_STATE: IndexState = (frozenset(), frozenset())
+
+def get_loop_nodes(loop_node: LoopIterNode) -> Set[CFGNode]:
+    # nodes of the loop body, loop iter node and loop header
+    assert loop_node.loop_nodes is not None, f"Loop nodes of {loop_node} are not set"
+    return loop_node.loop_nodes
+
+def _step_index_state(state: IndexState, node: CFGNode, index_symbols: FrozenSet[int]) -> IndexState:
+    # state for the parents of node, given the state at node
+    distinct, unknown = state
+    if len(distinct) > 0 and any(node not in get_loop_nodes(loop_node) for _, loop_node in distinct):
+        # we left the loop, all iterations of a previous execution of the loop are possible
+        unknown = unknown | {s for s, loop_node in distinct if node not in get_loop_nodes(loop_node)}
+        distinct = frozenset((s, loop_node) for s, loop_node in distinct if node in get_loop_nodes(loop_node))
+    if isinstance(node, AbstractAssignNode):
+        target = node.get_target()
+        symbol_id = target.symbol_id
+        if symbol_id in index_symbols and symbol_id not in unknown and not target.is_indexed_target():
+            if isinstance(node, LoopIterNode) and node.distinct_values:
+                # previous iteration
+                distinct = distinct | {(symbol_id, node)}
+            else:
+                distinct = frozenset((s, loop_node) for s, loop_node in distinct if s != symbol_id)
+                unknown = unknown | {symbol_id}
+    return distinct, unknown
+
+def _get_RDs(cfgnode: CFGNode, variable: Variable, path: List[Tuple[CFGNode,IndexState]], rds: Set[AbstractAssignNode], memo: Dict[Tuple[BranchNode,IndexState], Set[AbstractAssignNode]],
+             read_index: Optional[AffineIndex], index_symbols: FrozenSet[int], state: IndexState):
+    symbol_id = variable.symbol_id
     for parent in cfgnode.parents:
         if isinstance(parent, (AssignNode, SampleNode)):
             target = parent.get_target()
-            if target.is_equal(variable):
-                rds.add(parent)
+            if target.symbol_id == symbol_id:
                 if not target.is_indexed_target():
                     # x = ...
+                    rds.add(parent)
                     continue
                 else:
                     # x[i] = ...
-                    if variable.is_indexed_variable() and  target.index_is_equal(variable):
-                        # x[2] = x[2]
-                        continue
+                    write_index = target.get_affine_index()
+                    if read_index is not None and write_index is not None:
+                        distinct, unknown = _step_index_state(state, parent, index_symbols)
+                        alias = index_alias(write_index, read_index, frozenset(s for s, _ in distinct), unknown)
+                        if alias != NO_ALIAS:
+                            rds.add(parent)
+                        if alias == MUST_ALIAS:
+                            # x[i] = ...; x[i]
+                            continue
+                    else:
+                        rds.add(parent)
+                        if variable.is_indexed_variable() and target.index_is_equal(variable):
+                            # x[2] = x[2]
+                            continue
         elif isinstance(parent, (FuncArgNode, LoopIterNode)):
             target = parent.get_target()
             # no indexed targets
-            if target.is_equal(variable):
+            if target.symbol_id == symbol_id:
                 rds.add(parent)
                 continue
         
-        is_cycle = any(p == parent for p in path)
+        parent_state = _step_index_state(state, parent, index_symbols) if len(index_symbols) > 0 else state
+        is_cycle = any(p == parent and s == parent_state for p, s in path)
         if not is_cycle:
             new_path = copy(path) if len(cfgnode.parents) > 1 else path
-            new_path.append(parent)
+            new_path.append((parent, parent_state))
             # we memoise at branch nodes to avoid path explosion
             if isinstance(parent, BranchNode):
-                if parent in memo:
-                    branch_rds = memo[parent]
+                if (parent, parent_state) in memo:
+                    branch_rds = memo[(parent, parent_state)]
                 else:
-                    branch_rds = _get_RDs(parent, variable, new_path, set(), memo)
-                    memo[parent] = branch_rds
+                    branch_rds = _get_RDs(parent, variable, new_path, set(), memo, read_index, index_symbols, parent_state)
+                    memo[(parent, parent_state)] = branch_rds
                 rds.update(branch_rds)
             else:
-                _get_RDs(parent, variable, new_path, rds, memo)
+                _get_RDs(parent, variable, new_path, rds, memo, read_index, index_symbols, parent_state)
     return rds
 
 def get_RDs(cfgnode: CFGNode, variable: Variable) -> Set[AbstractAssignNode]:
-    return _get_RDs(cfgnode, variable, [], set(), dict())
+    read_index = variable.get_affine_index()
+    index_symbols = get_index_symbol_ids(read_index) if read_index is not None else frozenset()
+    return _get_RDs(cfgnode, variable, [], set(), dict(), read_index, index_symbols, EMPTY_INDEX_STATE)
 
 
 def get_BPs(cfg: CFG, cfgnode: CFGNode) -> Set[BranchNode]:
     bps: Set[BranchNode] = set()
-    for branch_node in cfg.nodes:
-        if isinstance(branch_node, BranchNode):
-            paths = list(branch_node.children)
-            branch_node.block()
-            if is_reachable(paths[0], cfgnode) ^ is_reachable(paths[1], cfgnode): # xor
-                bps.add(branch_node)
-            branch_node.unblock()
+    compact = cfg.get_compact()
+    reachability = cfg.get_reachability()
+    node_ix = compact.index[cfgnode]
+    for branch_ix in reachability.branch_nodes:
+        branch_node = compact.nodes[branch_ix]
+        if not reachability.reaches(branch_ix, node_ix):
+            continue
+        paths = [compact.index[child] for child in branch_node.children]
+        # cfgnode is reachable from exactly one child without passing through branch_node
+        if reachability.reaches_avoiding(paths[0], node_ix, branch_ix) ^ reachability.reaches_avoiding(paths[1], node_ix, branch_ix): # xor
+            bps.add(branch_node)
 
     return bps
             
@@ -0,0 +1,93 @@
+from typing import Dict, Tuple, Callable, Any, Optional, List
+
+# Analysis manager (similar to LLVM's analysis manager).
+# Analyses are declared once with the analyses they depend on (register_analysis),
+# each PPL_IR has one manager (ir.analyses) which computes an analysis on first request and caches the result.
+# Checkers which run on the same IR share these results, e.g. reaching definitions computed for the
+# constraint checker are reused by the random control flow checker.
+#
+# Keyword arguments of an analysis are part of the cache key.
+#
+# Results are only valid as long as the IR is not modified.
+# After construction, edges of a CFG are only added and removed with cfg.add_edge and cfg.delete_edge, which count the modifications.
+# If the sum of the counts of the CFGs of the IR changed since the last request, all results are dropped.
+# Code which modifies nodes without changing edges (e.g. replaces expressions) has to call ir.analyses.invalidate(name)
+# for the analyses it does not preserve, which also drops all analyses that depend on them (or invalidate() to drop everything).
+#
+# Declared analyses:
+#   function_calls     fdef -> call sites (memo)                                       ir4ppl/ir.py
+#   function_summaries fdef -> FunctionSummary                                         ir4ppl/ir.py
+#   reachability       compact CFGs and reachability oracles, cached on the CFGs       ir4ppl/ir.py
+#   rd                 (node, variable) -> reaching definitions (memo)                 ir4ppl/ir.py
+#   cdg                node -> branch parents (memo)                                   ir4ppl/ir.py
+#   path_conditions    node -> branch nodes and taken direction (memo)                 ir4ppl/ir.py
+#   intervals          (node, expr, assumptions) -> estimated value range (memo)       ir4ppl/ir.py
+#   pdg                program dependence graph of random statements                   ir4ppl/pdg.py
+
+class AnalysisPass:
+    def __init__(self, name: str, dependencies: Tuple[str,...], run: Callable[..., Any], invalidate: Optional[Callable[[Any],None]] = None) -> None:
+        self.name = name
+        self.dependencies = dependencies
+        self.run = run # run(ir, **kwargs) -> result
+        self.invalidate = invalidate # invalidate(ir), for results which are cached elsewhere (e.g. on the CFGs)
+
+    def get_key(self, kwargs: Dict[str,Any]) -> Tuple[Tuple[str,Any], ...]:
+        return tuple(sorted(kwargs.items()))
+
+ANALYSES: Dict[str,AnalysisPass] = dict()
+
+def register_analysis(name: str, dependencies: Tuple[str,...] = (), invalidate: Optional[Callable[[Any],None]] = None):
+    def decorator(run: Callable[..., Any]):
+        for dependency in dependencies:
+            assert dependency in ANALYSES, f"Analysis {name} depends on unknown analysis {dependency}"
+        ANALYSES[name] = AnalysisPass(name, dependencies, run, invalidate)
+        return run
+    return decorator
+
+def get_n_modifications(ir) -> int:
+    return sum(cfg.n_modifications for cfg in ir.cfgs.values())
+
+class AnalysisManager:
+    def __init__(self, ir) -> None:
+        self.ir = ir
+        self.results: Dict[str,Dict[Tuple[Tuple[str,Any], ...],Any]] = dict() # name -> key of kwargs -> result
+        self.n_modifications = get_n_modifications(ir)
+
+    def check_modified(self):
+        # drops all results if the CFGs were modified since they were computed
+        n_modifications = get_n_modifications(self.ir)
+        if n_modifications != self.n_modifications:
+            self.n_modifications = n_modifications
+            self.invalidate()
+
+    def get(self, name: str, **kwargs) -> Any:
+        self.check_modified()
+        analysis = ANALYSES[name]
+        key = analysis.get_key(kwargs) if len(kwargs) > 0 else ()
+        results = self.results.setdefault(name, dict())
+        if key not in results:
+            for dependency in analysis.dependencies:
+                self.get(dependency)
+            results[key] = analysis.run(self.ir, **kwargs)
+        return results[key]
+
+    def is_cached(self, name: str) -> bool:
+        self.check_modified()
+        return len(self.results.get(name, ())) > 0
+
+    def get_dependents(self, name: str) -> List[str]:
+        # name and all analyses which (transitively) depend on it
+        dependents = [name]
+        for dependent in dependents:
+            for analysis in ANALYSES.values():
+                if dependent in analysis.dependencies and analysis.name not in dependents:
+                    dependents.append(analysis.name)
+        return dependents
+
+    def invalidate(self, name: Optional[str] = None):
+        names = list(ANALYSES.keys()) if name is None else self.get_dependents(name)
+        for n in names:
+            self.results.pop(n, None)
+            analysis = ANALYSES[n]
+            if analysis.invalidate is not None:
+                analysis.invalidate(self.ir)
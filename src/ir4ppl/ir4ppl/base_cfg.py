@@ -68,6 +68,10 @@ class AbstractCFGBuilder():
 
         self.fix_break_continue(nodes, for_end_join_cfgnode, for_start_join_cfgnode)
 
+        # for nested loops, the nodes of the enclosing loop are also on a cycle through loop_var_cfgnode,
+        # so the nodes of the loop are taken from the loop body
+        loop_var_cfgnode.loop_nodes = set(body_cfg.nodes) | {for_start_join_cfgnode, for_branch_cfgnode, loop_var_cfgnode}
+
 
     def build_while_cfg(self, startnode: StartNode, nodes: Set[CFGNode], endnode: EndNode,
                       while_start_join_cfgnode: JoinNode, while_branch_cfgnode: BranchNode, while_end_join_cfgnode: JoinNode,
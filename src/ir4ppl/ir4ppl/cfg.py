@@ -1,9 +1,11 @@
-from typing import List, Tuple, Dict, Set, Optional
+from typing import List, Tuple, Dict, Set, Optional, FrozenSet, Any, Sequence
 from analysis.interval_arithmetic import Interval
 from analysis.symbolics import SymbolicExpression
+from analysis.affine_index import AffineIndex
 from typing import Set, Dict, Optional
 from graphviz import Source
 from dataclasses import dataclass
+from array import array
 
 @dataclass
 class SourceLocation:
@@ -11,29 +13,69 @@ class SourceLocation:
     first_byte: int
     last_byte: int
 
+# interns variable keys (e.g. name and scope) into dense integer symbol ids when the IR is built,
+# such that comparing variables is an integer comparison
+class SymbolTable:
+    def __init__(self) -> None:
+        self.key_to_id: Dict[Any,int] = dict()
+        self.keys: List[Any] = list()
+    def intern(self, key: Any) -> int:
+        symbol_id = self.key_to_id.get(key)
+        if symbol_id is None:
+            symbol_id = len(self.keys)
+            self.key_to_id[key] = symbol_id
+            self.keys.append(key)
+        return symbol_id
+    def __len__(self) -> int:
+        return len(self.keys)
+
+NO_SYMBOL = -1
+
 class Variable:
+    symbol_id: int = NO_SYMBOL
     def is_indexed_variable(self) -> bool:
         # x[i]
         raise NotImplementedError
+    def get_affine_index(self) -> Optional[AffineIndex]:
+        # index of x[i] as affine expressions, None if not supported
+        return None
     def __eq__(self, value: object) -> bool:
         raise NotImplementedError
     def __hash__(self) -> int:
         raise NotImplementedError
     
 class FunctionDefinition:
+    symbol_id: int = NO_SYMBOL
     def is_equal(self, variable: Variable) -> bool:
-        raise NotImplementedError
+        return self.symbol_id != NO_SYMBOL and self.symbol_id == variable.symbol_id
+
+# immutable summary of an expression, computed once per syntax node when the IR is built
+# and shared by all Expression objects for this syntax node
+@dataclass(frozen=True, eq=False)
+class ExpressionSummary:
+    free_variables: Tuple[Variable, ...]
+    symbol_ids: FrozenSet[int] # symbol ids of free variables
+    # (callee, syntax node) for all function calls in expression, callee is frontend specific (symbol id for python, name for stan)
+    function_calls: Tuple[Tuple[Any, Any], ...]
+    is_constant: bool # no free variables and no function calls
+
+EMPTY_SUMMARY = ExpressionSummary((), frozenset(), (), True)
 
 # abtract
 # an expression does not modify state
 # -> this is a big assumption (implies function calls have no side-effects)
 class Expression:
+    summary: ExpressionSummary = EMPTY_SUMMARY
     def __eq__(self, value: object) -> bool:
         raise NotImplementedError
     def __hash__(self) -> int:
         raise NotImplementedError
-    def get_free_variables(self) -> List[Variable]:
-        raise NotImplementedError
+    def get_free_variables(self) -> Sequence[Variable]:
+        return self.summary.free_variables
+    def get_symbol_ids(self) -> FrozenSet[int]:
+        return self.summary.symbol_ids
+    def is_constant(self) -> bool:
+        return self.summary.is_constant
     def get_function_calls(self, fdef: FunctionDefinition) -> List['FunctionCall']:
         raise NotImplementedError
     def estimate_value_range(self, variable_mask: Dict[Variable,Interval]) -> Interval:
@@ -44,8 +86,9 @@ class Expression:
         raise NotImplementedError
 
 class AssignTarget:
+    symbol_id: int = NO_SYMBOL
     def is_equal(self, variable: Variable) -> bool:
-        raise NotImplementedError
+        return self.symbol_id == variable.symbol_id
     
     def is_indexed_target(self) -> bool:
         # x[i] = ...
@@ -57,6 +100,10 @@ class AssignTarget:
     def get_index_expr(self) -> Expression:
         raise NotImplementedError
     
+    def get_affine_index(self) -> Optional[AffineIndex]:
+        # index of x[i] = ... as affine expressions, None if not supported
+        return None
+    
 class FunctionCall(Expression):
     def get_expr_for_func_arg(self, node: 'FuncArgNode') -> Expression:
         raise NotImplementedError
@@ -69,27 +116,29 @@ class Distribution:
         args_s = ", ".join([f"{name}: {arg}" for name, arg in self.args.items()])
         return f"{self.name}({args_s})"
     
+# CFG nodes use __slots__ to keep large (unrolled) CFGs small,
+# subclasses have to declare __slots__ for their attributes as well.
 class CFGNode:
+    __slots__ = ("id", "parents", "children")
     def __init__(self, id: str) -> None:
         self.id = id
         self.parents: Set[CFGNode] = set()
         self.children: Set[CFGNode]  = set()
-        self.is_blocked = False
-    def block(self):
-        self.is_blocked = True
-    def unblock(self):
-        self.is_blocked = False
     def __repr__(self) -> str:
         s = type(self).__name__
         return f"{s}({self.id})"
 
-class StartNode(CFGNode): pass
+class StartNode(CFGNode):
+    __slots__ = ()
 
-class EndNode(CFGNode): pass
+class EndNode(CFGNode):
+    __slots__ = ()
 
-class SkipNode(CFGNode): pass
+class SkipNode(CFGNode):
+    __slots__ = ()
 
 class AbstractAssignNode(CFGNode):
+    __slots__ = ("target", "value")
     def __init__(self, id: str, target: AssignTarget, value: Expression) -> None:
         super().__init__(id)
         self.target = target
@@ -106,9 +155,10 @@ class AbstractAssignNode(CFGNode):
         
 
 class AssignNode(AbstractAssignNode):
-    pass
+    __slots__ = ()
 
 class SampleNode(AbstractAssignNode):
+    __slots__ = ()
     def get_distribution_expr(self) -> Expression:
         raise NotImplementedError
     def get_address_expr(self) -> Expression:
@@ -119,9 +169,17 @@ class SampleNode(AbstractAssignNode):
         raise NotImplementedError
     
 
-class LoopIterNode(AbstractAssignNode): pass
+class LoopIterNode(AbstractAssignNode):
+    __slots__ = ("distinct_values", "loop_nodes")
+    def __init__(self, id: str, target: AssignTarget, value: Expression, distinct_values: bool = False) -> None:
+        super().__init__(id, target, value)
+        # loop variable takes a different value in each iteration (e.g. for i in range(n))
+        self.distinct_values = distinct_values
+        # nodes of the loop (set by the CFG builder, see base_cfg.py)
+        self.loop_nodes: Optional[Set[CFGNode]] = None
 
 class FuncArgNode(AbstractAssignNode):
+    __slots__ = ("name", "index")
     def __init__(self, id: str, target: AssignTarget, value: Expression, name: str, index: int) -> None:
         super().__init__(id, target, value)
         self.name = name
@@ -133,6 +191,7 @@ class FuncArgNode(AbstractAssignNode):
 
 
 class BranchNode(CFGNode):
+    __slots__ = ("test_expression", "join_nodes", "then", "orelse")
     def __init__(self, id: str, test_expression: Expression) -> None:
         super().__init__(id)
         self.test_expression = test_expression
@@ -150,9 +209,11 @@ class BranchNode(CFGNode):
         raise NotImplementedError # if, for, while etc
         
 
-class JoinNode(CFGNode): pass
+class JoinNode(CFGNode):
+    __slots__ = ()
 
 class ReturnNode(CFGNode):
+    __slots__ = ("return_expression",)
     def __init__(self, id: str, return_expression: Expression) -> None:
         super().__init__(id)
         self.return_expression = return_expression
@@ -164,11 +225,14 @@ class ReturnNode(CFGNode):
     def get_source_location(self) -> SourceLocation:
         return self.return_expression.get_source_location()
 
-class BreakNode(CFGNode): pass
+class BreakNode(CFGNode):
+    __slots__ = ()
 
-class ContinueNode(CFGNode): pass
+class ContinueNode(CFGNode):
+    __slots__ = ()
 
 class FuncStartNode(CFGNode):
+    __slots__ = ("func_signature",)
     def __init__(self, id: str, func_signature: str) -> None:
         super().__init__(id)
         self.func_signature = func_signature
@@ -177,6 +241,7 @@ class FuncStartNode(CFGNode):
         return f"{s}({self.func_signature}, {self.id})"
 
 class ExprNode(CFGNode): 
+    __slots__ = ("expression",)
     def __init__(self, id: str, expression: Expression) -> None:
         super().__init__(id)
         self.expression = expression
@@ -189,6 +254,7 @@ class ExprNode(CFGNode):
         return self.expression.get_source_location()
 
 class FactorNode(ExprNode):
+    __slots__ = ()
     def __init__(self, id: str, factor_expression: Expression) -> None:
         super().__init__(id, factor_expression)
     def get_factor_expr(self):
@@ -251,27 +317,200 @@ def delete_edge(from_node: CFGNode, to_node: CFGNode):
 # def is_reachable(startnode:CFGNode, endnode: CFGNode):
 #     return _is_reachable_2(startnode, endnode, [], dict())
 
-def _dfs_visit_nodes(node: CFGNode, visited: Set[CFGNode]):
+def _dfs_visit_nodes(node: CFGNode, visited: Set[CFGNode], excluded: Set[CFGNode]):
+    # iterative, unrolled CFGs are too deep for recursion
     visited.add(node)
-    for parent in node.parents:
-        if parent.is_blocked:
-            visited.add(parent) # TODO: check if this makes sense
-            continue
-        if parent in visited:
-            continue
-        _dfs_visit_nodes(parent, visited)
-        
-def is_reachable(startnode: CFGNode, endnode: CFGNode):
+    stack = [node]
+    while len(stack) > 0:
+        node = stack.pop()
+        for parent in node.parents:
+            if parent in visited:
+                continue
+            visited.add(parent)
+            if parent in excluded:
+                continue # TODO: check if this makes sense
+            stack.append(parent)
+
+# paths may not pass through excluded nodes,
+# CFG nodes are never modified, so reachability queries can run concurrently on one CFG
+# (see also CompactCFG.reach for queries on a CFG)
+def is_reachable(startnode: CFGNode, endnode: CFGNode, excluded: Set[CFGNode] = frozenset()):
     if startnode == endnode:
         return True
     visited = set()
-    _dfs_visit_nodes(endnode, visited)
+    _dfs_visit_nodes(endnode, visited, excluded)
     return startnode in visited
 
 # def is_on_path_between_nodes(node: CFGNode, startnode: CFGNode, endnode: CFGNode):
 #     return is_reachable(startnode, node) and is_reachable(node, endnode)
 
 
+# Compact form of a CFG for traversals.
+# Nodes get dense integer ids (startnode is 0, endnode is n-1) and edges are stored in CSR arrays:
+# the successors of node i are succ_targets[succ_offsets[i]:succ_offsets[i+1]], same for predecessors.
+# Traversals work on these int arrays with bytearray masks instead of hashing nodes.
+# The compact form is a snapshot, it has to be built after the CFG is complete (see CFG.get_compact).
+# Same as CompactCFG in src/py/ast_utils/cfg.py (src/py and ir4ppl do not import from each other), fixes belong in both copies.
+class CompactCFG:
+    __slots__ = ("nodes", "index", "succ_offsets", "succ_targets", "pred_offsets", "pred_targets")
+    def __init__(self, startnode: CFGNode, nodes: Set[CFGNode], endnode: CFGNode) -> None:
+        inner = sorted((node for node in nodes if node != startnode and node != endnode), key=lambda node: (node.id, type(node).__name__))
+        self.nodes: List[CFGNode] = [startnode] + inner + [endnode]
+        self.index: Dict[CFGNode,int] = {node: i for i, node in enumerate(self.nodes)}
+        self.succ_offsets, self.succ_targets = self._to_csr(lambda node: node.children)
+        self.pred_offsets, self.pred_targets = self._to_csr(lambda node: node.parents)
+
+    def _to_csr(self, get_neighbours) -> Tuple[array, array]:
+        offsets = array("i", [0])
+        targets = array("i")
+        for node in self.nodes:
+            # edges leaving the CFG are ignored
+            targets.extend(sorted(self.index[n] for n in get_neighbours(node) if n in self.index))
+            offsets.append(len(targets))
+        return offsets, targets
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def successors(self, i: int) -> array:
+        return self.succ_targets[self.succ_offsets[i]:self.succ_offsets[i+1]]
+
+    def predecessors(self, i: int) -> array:
+        return self.pred_targets[self.pred_offsets[i]:self.pred_offsets[i+1]]
+
+    def reach(self, sources: Sequence[int], forward: bool = True, excluded: Optional[bytearray] = None) -> bytearray:
+        # mask of all nodes reachable from sources (including sources),
+        # paths do not pass through excluded nodes (excluded nodes are reached, but not expanded; sources are always expanded)
+        offsets, targets = (self.succ_offsets, self.succ_targets) if forward else (self.pred_offsets, self.pred_targets)
+        visited = bytearray(len(self.nodes))
+        stack = list(sources)
+        for i in stack:
+            visited[i] = 1
+        while len(stack) > 0:
+            i = stack.pop()
+            for k in range(offsets[i], offsets[i+1]):
+                j = targets[k]
+                if not visited[j]:
+                    visited[j] = 1
+                    if excluded is None or not excluded[j]:
+                        stack.append(j)
+        return visited
+
+    def mask(self, nodes: Sequence[CFGNode]) -> bytearray:
+        # nodes which are not in the CFG are ignored
+        m = bytearray(len(self.nodes))
+        for node in nodes:
+            i = self.index.get(node)
+            if i is not None:
+                m[i] = 1
+        return m
+
+def _get_strongly_connected_components(nodes: List[Any], successors: Dict[Any,List[Any]]) -> List[List[Any]]:
+    # Tarjan's algorithm (iterative), components are returned in reverse topological order (callees first)
+    index: Dict[Any,int] = dict()
+    lowlink: Dict[Any,int] = dict()
+    stack: List[Any] = []
+    on_stack: Set[Any] = set()
+    sccs: List[List[Any]] = []
+    for root in nodes:
+        if root in index:
+            continue
+        work = [(root, iter(successors[root]))]
+        index[root] = lowlink[root] = len(index)
+        stack.append(root); on_stack.add(root)
+        while len(work) > 0:
+            v, it = work[-1]
+            w = next(it, None)
+            if w is not None:
+                if w not in index:
+                    index[w] = lowlink[w] = len(index)
+                    stack.append(w); on_stack.add(w)
+                    work.append((w, iter(successors[w])))
+                elif w in on_stack:
+                    lowlink[v] = min(lowlink[v], index[w])
+            else:
+                work.pop()
+                if len(work) > 0:
+                    u = work[-1][0]
+                    lowlink[u] = min(lowlink[u], lowlink[v])
+                if lowlink[v] == index[v]:
+                    scc = []
+                    while True:
+                        w = stack.pop(); on_stack.discard(w)
+                        scc.append(w)
+                        if w == v:
+                            break
+                    sccs.append(scc)
+    return sccs
+
+# Reachability oracle for a CFG, built lazily from the compact form (see CFG.get_reachability).
+# The transitive closure is computed on the DAG of strongly connected components,
+# closure[c] is the bitset (python int) of all nodes reachable from a node in SCC c (including the SCC itself),
+# so plain reachability is a single bit test.
+# Reachability avoiding a node x (paths from u may end in x, but not pass through x) equals the closure
+# if x is not reachable from u, otherwise we search from u and stop at nodes which cannot reach x (taking their closure).
+# These sets are cached per (u, x). get_BPs and get_path_condition only ask for u a child of branch node x.
+class ReachabilityOracle:
+    def __init__(self, compact: CompactCFG) -> None:
+        self.compact = compact
+        n = len(compact)
+        sccs = _get_strongly_connected_components(list(range(n)), [compact.successors(i) for i in range(n)])
+        self.scc = array("i", bytes(4 * n))
+        self.closure: List[int] = []
+        for c, scc in enumerate(sccs):
+            # reverse topological order, successor SCCs are done before
+            reach = 0
+            for i in scc:
+                self.scc[i] = c
+                reach |= 1 << i
+            for i in scc:
+                for j in compact.successors(i):
+                    d = self.scc[j]
+                    if d != c:
+                        reach |= self.closure[d]
+            self.closure.append(reach)
+        self.avoiding: Dict[Tuple[int,int],int] = dict()
+        self.branch_nodes: List[int] = [i for i, node in enumerate(compact.nodes) if isinstance(node, BranchNode)]
+
+    def reaches(self, u: int, v: int) -> bool:
+        return (self.closure[self.scc[u]] >> v) & 1 == 1
+
+    def reachable_avoiding(self, u: int, x: int) -> int:
+        # bitset of nodes reachable from u on paths that do not pass through x
+        key = (u, x)
+        reach = self.avoiding.get(key)
+        if reach is None:
+            reach = self._reachable_avoiding(u, x)
+            self.avoiding[key] = reach
+        return reach
+
+    def _reachable_avoiding(self, u: int, x: int) -> int:
+        closure = self.closure[self.scc[u]]
+        if u != x and (closure >> x) & 1 == 0:
+            return closure
+        reach = 0
+        visited = bytearray(len(self.compact))
+        visited[u] = 1
+        stack = [u]
+        while len(stack) > 0:
+            i = stack.pop()
+            reach |= 1 << i
+            if i != u:
+                if i == x:
+                    continue # not expanded
+                closure = self.closure[self.scc[i]]
+                if (closure >> x) & 1 == 0:
+                    reach |= closure
+                    continue
+            for j in self.compact.successors(i):
+                if not visited[j]:
+                    visited[j] = 1
+                    stack.append(j)
+        return reach
+
+    def reaches_avoiding(self, u: int, v: int, x: int) -> bool:
+        return (self.reachable_avoiding(u, x) >> v) & 1 == 1
+
 class CFG:
     def __init__(self, startnode: StartNode | FuncStartNode, nodes: Set[CFGNode], endnode: EndNode) -> None:
         # assert isinstance(startnode, (StartNode, FuncStartNode)), f"Wrong type for startnode {startnode}"
@@ -281,6 +520,28 @@ class CFG:
         self.startnode = startnode
         self.nodes = nodes
         self.endnode = endnode
+        self.compact: Optional[CompactCFG] = None
+        self.reachability: Optional[ReachabilityOracle] = None
+        # number of edge modifications after construction, such that cached analyses can detect modified CFGs (see ir4ppl/analysis_manager.py)
+        self.n_modifications = 0
+
+    def add_edge(self, from_node: CFGNode, to_node: CFGNode):
+        self.n_modifications += 1
+        add_edge(from_node, to_node)
+
+    def delete_edge(self, from_node: CFGNode, to_node: CFGNode):
+        self.n_modifications += 1
+        delete_edge(from_node, to_node)
+
+    def get_compact(self) -> CompactCFG:
+        if self.compact is None:
+            self.compact = CompactCFG(self.startnode, self.nodes, self.endnode)
+        return self.compact
+
+    def get_reachability(self) -> ReachabilityOracle:
+        if self.reachability is None:
+            self.reachability = ReachabilityOracle(self.get_compact())
+        return self.reachability
 
     def contains(self, node: CFGNode):
         return self.startnode == node or self.endnode == node or node in self.nodes
@@ -1,5 +1,7 @@
 from typing import Set, Dict, List, Any
 from .cfg import *
+from .cfg import _get_strongly_connected_components
+from .analysis_manager import AnalysisManager, register_analysis
 from analysis.rd_bp import *
 from analysis.interval_arithmetic import *
 from analysis.symbolics import Symbol, SymConstant, SymOperation, SymNot
@@ -11,15 +13,26 @@ class PPL_IR:
         self.node_to_cfg = {node: (fdef, cfg) for fdef, cfg in cfgs.items() for node in cfg.nodes}
         self.model_cfg = model_cfg
         self.guide_cfg = guide_cfg
+        # symbol_id -> CFG of user-defined function
+        self.symbol_to_cfg = {fdef.symbol_id: cfg for fdef, cfg in cfgs.items() if fdef.symbol_id != NO_SYMBOL}
+        self.symbol_to_fdef = {fdef.symbol_id: fdef for fdef in cfgs.keys() if fdef.symbol_id != NO_SYMBOL}
+        # cached analysis results (see ir4ppl/analysis_manager.py)
+        self.analyses = AnalysisManager(self)
 
     def is_user_defined_function(self, variable: Variable) -> bool:
-        return any(fdef.is_equal(variable) for fdef, _ in self.cfgs.items())
+        return variable.symbol_id in self.symbol_to_cfg
 
     def get_user_defined_function(self, variable: Variable) -> CFG:
-        for fdef, fcfg in self.cfgs.items():
-            if fdef.is_equal(variable):
-                return fcfg
-        raise ValueError
+        fcfg = self.symbol_to_cfg.get(variable.symbol_id)
+        if fcfg is None:
+            raise ValueError
+        return fcfg
+
+    def get_user_defined_function_definition(self, variable: Variable) -> FunctionDefinition:
+        fdef = self.symbol_to_fdef.get(variable.symbol_id)
+        if fdef is None:
+            raise ValueError
+        return fdef
     
     def get_model(self) -> Optional[CFG]:
         return self.model_cfg
@@ -28,6 +41,9 @@ class PPL_IR:
         return self.guide_cfg
     
     def get_all_function_calls(self, fdef: FunctionDefinition) -> List[Tuple[CFGNode,FunctionCall]]:
+        function_calls: Dict[FunctionDefinition, List[Tuple[CFGNode,FunctionCall]]] = self.analyses.get("function_calls")
+        if fdef in function_calls:
+            return function_calls[fdef]
         calls: List[Tuple[CFGNode,FunctionCall]] = list()
         for _, cfg in self.cfgs.items():
             for node in cfg.nodes:
@@ -43,8 +59,12 @@ class PPL_IR:
                     calls_in_node: List[FunctionCall] = list()
                 for call in calls_in_node:
                     calls.append((node, call))
+        function_calls[fdef] = calls
         return calls
 
+    def get_function_summary(self, fdef: FunctionDefinition) -> "FunctionSummary":
+        return self.analyses.get("function_summaries")[fdef]
+
     
     def get_cfg_for_node(self, cfgnode: CFGNode) -> Tuple[FunctionDefinition,CFG]:
         return self.node_to_cfg[cfgnode]
@@ -67,6 +87,152 @@ class PPL_IR:
     def get_control_deps_for_node(self, cfgnode: CFGNode, expr: Expression) -> List[BranchNode]:
         return list(control_parents_for_expr(self, cfgnode, expr))
 
+# Analyses of PPL_IR (see ir4ppl/analysis_manager.py),
+# memo analyses are dicts which are filled on demand by the functions below.
+
+@register_analysis("function_calls")
+def _run_function_calls(ir: PPL_IR) -> Dict[FunctionDefinition, List[Tuple[CFGNode,FunctionCall]]]:
+    return dict()
+
+@register_analysis("rd")
+def _run_rd(ir: PPL_IR) -> Dict[Tuple[CFGNode,Variable],Set[AbstractAssignNode]]:
+    return dict()
+
+def _invalidate_reachability(ir: PPL_IR):
+    for cfg in ir.cfgs.values():
+        cfg.compact = None
+        cfg.reachability = None
+
+@register_analysis("reachability", invalidate=_invalidate_reachability)
+def _run_reachability(ir: PPL_IR) -> bool:
+    return True # built lazily per CFG (see CFG.get_reachability)
+
+@register_analysis("cdg", ("reachability",))
+def _run_cdg(ir: PPL_IR) -> Dict[CFGNode,Set[BranchNode]]:
+    return dict()
+
+@register_analysis("function_summaries", ("function_calls", "rd", "cdg"))
+def _run_function_summaries(ir: PPL_IR) -> Dict[FunctionDefinition,"FunctionSummary"]:
+    return compute_function_summaries(ir)
+
+@register_analysis("path_conditions", ("cdg",))
+def _run_path_conditions(ir: PPL_IR) -> Dict[CFGNode,List[Tuple[BranchNode,bool]]]:
+    return dict()
+
+@register_analysis("intervals", ("rd", "function_summaries"))
+def _run_intervals(ir: PPL_IR) -> Dict[Tuple[CFGNode,Expression,FrozenSet],Interval]:
+    return dict()
+
+def get_cached_RDs(ir: PPL_IR, cfgnode: CFGNode, variable: Variable) -> Set[AbstractAssignNode]:
+    rd_memo = ir.analyses.get("rd")
+    key = (cfgnode, variable)
+    rds = rd_memo.get(key)
+    if rds is None:
+        rds = get_RDs(cfgnode, variable)
+        rd_memo[key] = rds
+    return set(rds) # callers may modify the result
+
+def get_cached_BPs(ir: PPL_IR, cfg: CFG, cfgnode: CFGNode) -> Set[BranchNode]:
+    cdg_memo = ir.analyses.get("cdg")
+    bps = cdg_memo.get(cfgnode)
+    if bps is None:
+        bps = get_BPs(cfg, cfgnode)
+        cdg_memo[cfgnode] = bps
+    return set(bps)
+
+
+# Per-function summaries:
+# The dependencies of the return value of a function do not depend on its call site,
+# because they stop at the FuncArgNodes of the function (which stand for its parameters).
+# So instead of re-entering the callee CFG for each use of a function, we compute once per function
+#   - return_data_deps: data dependencies of its return statements (nodes in the function or its callees, FuncArgNodes for parameters)
+#   - return_control_deps: control parents of its return statements (including those of callees)
+#   - sample_nodes: sample nodes in the function and all functions called by it
+# and apply them at call sites.
+# Summaries are computed bottom-up over the strongly connected components of the call graph,
+# for (mutually) recursive functions we iterate until the summaries of the component do not change anymore.
+class FunctionSummary:
+    def __init__(self, fdef: FunctionDefinition) -> None:
+        self.fdef = fdef
+        self.return_data_deps: Set[AbstractAssignNode] = set()
+        self.return_control_deps: Set[BranchNode] = set()
+        self.sample_nodes: Set[SampleNode] = set()
+
+    def get_param_deps(self) -> Set[FuncArgNode]:
+        # parameters that flow into the return value
+        return {node for node in self.return_data_deps if isinstance(node, FuncArgNode)}
+
+    def __repr__(self) -> str:
+        return f"FunctionSummary({self.fdef}, data={len(self.return_data_deps)}, control={len(self.return_control_deps)}, samples={len(self.sample_nodes)})"
+
+def _get_node_expr(node: CFGNode) -> Optional[Expression]:
+    if isinstance(node, AbstractAssignNode):
+        return node.get_value_expr()
+    elif isinstance(node, BranchNode):
+        return node.get_test_expr()
+    elif isinstance(node, ReturnNode):
+        return node.get_return_expr()
+    elif isinstance(node, ExprNode):
+        return node.get_expr()
+    return None
+
+def compute_function_summaries(ir: PPL_IR) -> Dict[FunctionDefinition,FunctionSummary]:
+    fdefs = [fdef for fdef in ir.cfgs.keys() if fdef.symbol_id != NO_SYMBOL]
+
+    # local parts of summaries and call graph edges
+    local: Dict[FunctionDefinition,FunctionSummary] = dict()
+    return_callees: Dict[FunctionDefinition,List[FunctionDefinition]] = dict() # functions used in return statements
+    callees: Dict[FunctionDefinition,List[FunctionDefinition]] = dict() # functions used anywhere
+    for fdef in fdefs:
+        cfg = ir.cfgs[fdef]
+        summary = FunctionSummary(fdef)
+        return_callees[fdef] = []
+        callees[fdef] = []
+        for node in cfg.nodes:
+            if isinstance(node, SampleNode):
+                summary.sample_nodes.add(node)
+            expr = _get_node_expr(node)
+            if expr is None:
+                continue
+            if isinstance(node, ReturnNode):
+                summary.return_control_deps |= get_cached_BPs(ir, cfg, node)
+            for variable in expr.get_free_variables():
+                if ir.is_user_defined_function(variable):
+                    callee = ir.get_user_defined_function_definition(variable)
+                    if callee not in callees[fdef]:
+                        callees[fdef].append(callee)
+                    if isinstance(node, ReturnNode) and callee not in return_callees[fdef]:
+                        return_callees[fdef].append(callee)
+                elif isinstance(node, ReturnNode):
+                    summary.return_data_deps |= get_cached_RDs(ir, node, variable)
+        local[fdef] = summary
+
+    summaries = {fdef: FunctionSummary(fdef) for fdef in fdefs}
+    for scc in _get_strongly_connected_components(fdefs, callees):
+        changed = True
+        while changed:
+            changed = False
+            for fdef in scc:
+                summary = summaries[fdef]
+                return_data_deps = set(local[fdef].return_data_deps)
+                return_control_deps = set(local[fdef].return_control_deps)
+                sample_nodes = set(local[fdef].sample_nodes)
+                for callee in return_callees[fdef]:
+                    return_data_deps |= summaries[callee].return_data_deps
+                    return_control_deps |= summaries[callee].return_control_deps
+                for callee in callees[fdef]:
+                    sample_nodes |= summaries[callee].sample_nodes
+                if (return_data_deps != summary.return_data_deps or
+                    return_control_deps != summary.return_control_deps or
+                    sample_nodes != summary.sample_nodes):
+                    summary.return_data_deps = return_data_deps
+                    summary.return_control_deps = return_control_deps
+                    summary.sample_nodes = sample_nodes
+                    changed = True
+            if len(scc) == 1 and scc[0] not in callees[scc[0]]:
+                break # not recursive, one pass suffices
+
+    return summaries
 
 def data_deps_for_expr(ir: PPL_IR, cfgnode: CFGNode, expr: Expression) -> Set[AbstractAssignNode]:
     if isinstance(cfgnode, FuncArgNode):
@@ -86,12 +252,10 @@ def data_deps_for_expr(ir: PPL_IR, cfgnode: CFGNode, expr: Expression) -> Set[Ab
         data_deps: Set[AbstractAssignNode] = set()
         for variable in variables:
             if ir.is_user_defined_function(variable):
-                function_cfg = ir.get_user_defined_function(variable)
-                for returnnode in function_cfg.nodes:
-                    if isinstance(returnnode, ReturnNode):
-                        data_deps = data_deps | data_deps_for_expr(ir, returnnode, returnnode.get_return_expr())
+                summary = ir.get_function_summary(ir.get_user_defined_function_definition(variable))
+                data_deps = data_deps | summary.return_data_deps
             else:
-                rds = get_RDs(cfgnode, variable)
+                rds = get_cached_RDs(ir, cfgnode, variable)
                 data_deps = data_deps | rds
 
         return data_deps
@@ -107,24 +271,31 @@ def control_parents_for_expr(ir: PPL_IR, cfgnode: CFGNode, expr: Expression) ->
         calls = ir.get_all_function_calls(fdef)
         # collect all control parents of call node
         for callnode, call in calls:
-            bps = bps | control_parents_for_expr(ir, callnode, call)        
+            bps = bps | control_parents_for_expr(ir, callnode, call)
         return bps
     else:
-        bps = get_BPs(cfg, cfgnode)
+        bps = get_cached_BPs(ir, cfg, cfgnode)
 
         variables = expr.get_free_variables()
         for variable in variables:
             if ir.is_user_defined_function(variable):
-                function_cfg = ir.get_user_defined_function(variable)
-                for returnnode in function_cfg.nodes:
-                    if isinstance(returnnode, ReturnNode):
-                        bps = bps | control_parents_for_expr(ir, returnnode, returnnode.get_return_expr())
+                summary = ir.get_function_summary(ir.get_user_defined_function_definition(variable))
+                bps = bps | summary.return_control_deps
 
         return bps
 
 
 DEBUG_ESTIMATE_VALUE_RANGE = False
-def estimate_value_range(ir: PPL_IR, node: CFGNode, expr: Expression, assumptions: Dict[AbstractAssignNode,Interval], working_set: Set[Tuple[CFGNode,Expression]] = set(), tab="") -> Interval:
+def estimate_value_range(ir: PPL_IR, node: CFGNode, expr: Expression, assumptions: Dict[AbstractAssignNode,Interval], working_set: Optional[Set[Tuple[CFGNode,Expression]]] = None, tab="") -> Interval:
+    if working_set is None:
+        # top-level query, the result only depends on the assumptions and is cached
+        intervals_memo = ir.analyses.get("intervals")
+        key = (node, expr, frozenset(assumptions.items()))
+        interval = intervals_memo.get(key)
+        if interval is None:
+            interval = estimate_value_range(ir, node, expr, assumptions, set(), tab)
+            intervals_memo[key] = interval
+        return Interval(interval.low, interval.high) # callers may modify the result
     if DEBUG_ESTIMATE_VALUE_RANGE: print(tab, "estimate_value_range", "node:", node, "expr:", expr)
     if (node, expr) in working_set:
         # expr depends on itself (e.g. in loops)
@@ -148,7 +319,7 @@ def estimate_value_range(ir: PPL_IR, node: CFGNode, expr: Expression, assumption
                 if isinstance(returnnode, ReturnNode):
                     intervals.append(estimate_value_range(ir, returnnode, returnnode.get_return_expr(), assumptions, working_set, tab+" |"))
         else:
-            rds = get_RDs(node, variable)
+            rds = get_cached_RDs(ir, node, variable)
             for rd in rds:
                 if DEBUG_ESTIMATE_VALUE_RANGE: print(tab, "rd", rd)
                 if rd in assumptions:
@@ -169,8 +340,10 @@ def estimate_value_range(ir: PPL_IR, node: CFGNode, expr: Expression, assumption
     return interval
 
 DEBUG_SYMBOLIC = False
-def get_symbolic_expression(ir: PPL_IR, node: CFGNode, expr: Expression, assumptions: Dict[AbstractAssignNode,SymbolicExpression], working_set: Set[Tuple[CFGNode,Expression]] = set(), tab="") -> SymbolicExpression:
+def get_symbolic_expression(ir: PPL_IR, node: CFGNode, expr: Expression, assumptions: Dict[AbstractAssignNode,SymbolicExpression], working_set: Optional[Set[Tuple[CFGNode,Expression]]] = None, tab="") -> SymbolicExpression:
     if DEBUG_SYMBOLIC: print(tab, "get_symbolic_expression", "node:", node, "expr:", expr)
+    if working_set is None:
+        working_set = set()
     if isinstance(node, FuncArgNode):
         if DEBUG_SYMBOLIC: print(tab, f"new symbol for funcarg {node.name}")
         return Symbol(node.name)
@@ -189,7 +362,7 @@ def get_symbolic_expression(ir: PPL_IR, node: CFGNode, expr: Expression, assumpt
         if ir.is_user_defined_function(variable):
             continue # Not supported
         else:
-            rds = get_RDs(node, variable)
+            rds = get_cached_RDs(ir, node, variable)
             if len(rds) == 0:
                 print(tab, f"no rds for {variable}")
                 continue
@@ -221,24 +394,42 @@ def get_symbolic_expression(ir: PPL_IR, node: CFGNode, expr: Expression, assumpt
     if DEBUG_SYMBOLIC: print(tab, "return sexpr", sexpr)
     return sexpr
 
+def get_path_branches(ir: PPL_IR, node: CFGNode) -> List[Tuple[BranchNode,bool]]:
+    # branch nodes which decide if node is executed and if node is in the then (True) or orelse (False) branch
+    path_conditions_memo = ir.analyses.get("path_conditions")
+    branches = path_conditions_memo.get(node)
+    if branches is not None:
+        return branches
+    branches = []
+    _, cfg = ir.get_cfg_for_node(node)
+    bps = get_cached_BPs(ir, cfg, node)
+    compact = cfg.get_compact()
+    reachability = cfg.get_reachability()
+    node_ix = compact.index[node]
+    for branch_node in bps:
+        if isinstance(branch_node.then, LoopIterNode):
+            # the condition of a for loop (iterable is not exhausted) cannot be expressed symbolically
+            continue
+        # node is reachable from then or orelse without passing through branch_node
+        branch_ix = compact.index[branch_node]
+        if reachability.reaches_avoiding(compact.index[branch_node.then], node_ix, branch_ix):
+            branches.append((branch_node, True))
+        else:
+            assert reachability.reaches_avoiding(compact.index[branch_node.orelse], node_ix, branch_ix)
+            branches.append((branch_node, False))
+    path_conditions_memo[node] = branches
+    return branches
+
 def get_path_condition(ir: PPL_IR, node: CFGNode, assumptions: Dict[AbstractAssignNode,SymbolicExpression], tab="") -> SymbolicExpression:
     if DEBUG_SYMBOLIC: print(tab, "get_path_condition", node)
     pc = SymConstant(True)
-    _, cfg = ir.get_cfg_for_node(node)
-    bps = get_BPs(cfg, node)
-    for branch_node in bps:
+    for branch_node, is_then in get_path_branches(ir, node):
         if DEBUG_SYMBOLIC: print(tab, "bp", branch_node)
         test_symexpr = get_symbolic_expression(ir, branch_node, branch_node.get_test_expr(), assumptions, set(), tab + " |")
-        branch_node.block()
-        if is_reachable(branch_node.then, node):
-            pc_conj = test_symexpr
-        else:
-            assert is_reachable(branch_node.orelse, node)
-            pc_conj = SymNot(test_symexpr)
+        pc_conj = test_symexpr if is_then else SymNot(test_symexpr)
         if isinstance(pc, SymConstant):
             pc = pc_conj
         else:
             pc = SymOperation("&", pc, pc_conj)
-        branch_node.unblock()
 
     return pc
\ No newline at end of file
@@ -0,0 +1,84 @@
+from typing import List, Any, Callable, Sequence, Optional, Dict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+import pickle
+import io
+from .cfg import CFGNode
+
+# Execution layer for independent per-node jobs of checkers (e.g. one query per random variable).
+# Results are returned in the order of the nodes, independent of the number of workers.
+#
+# Reachability queries do not modify the IR, so jobs can run in a thread pool on one PPL_IR
+# (lazily built caches like compact CFGs and function summaries may be computed twice, but are never observed half-built).
+# With the process executor, workers are forked and inherit the IR, i.e. it is never pickled.
+# Results are sent back with CFG nodes replaced by their position in the IR (see _NodePickler),
+# so they refer to the nodes of the parent IR. Results must not contain other IR objects (e.g. expressions).
+# Analyses which the workers compute (e.g. the rd and cdg memos of ir.analyses) are filled in their copies of the IR
+# and lost, so later checkers on the same IR recompute them. Each checker maps over its nodes at most once,
+# such that at most one pool is started per checker run. The program dependence graph is built sequentially (see ir4ppl/pdg.py).
+
+N_WORKERS = 1 # 1 runs jobs sequentially in the calling thread
+# threads share the analyses of the IR, processes only help for large programs if the jobs do not share many queries
+EXECUTOR = "thread" # "thread" or "process"
+# workers are only started if each gets at least this many jobs, starting a pool costs more than a few queries
+MIN_JOBS_PER_WORKER = 8
+
+def set_workers(n_workers: int, executor: Optional[str] = None):
+    # configures map_nodes for all checkers (e.g. -j option of analyse_ir4ppl.py), executor None keeps the default
+    global N_WORKERS, EXECUTOR
+    assert n_workers >= 1, f"Invalid number of workers {n_workers}"
+    assert executor in (None, "thread", "process"), f"Unknown executor {executor}"
+    N_WORKERS = n_workers
+    if executor is not None:
+        EXECUTOR = executor
+
+class _NodePickler(pickle.Pickler):
+    def __init__(self, file, node_to_index: Dict[CFGNode,int]) -> None:
+        super().__init__(file)
+        self.node_to_index = node_to_index
+    def persistent_id(self, obj):
+        if isinstance(obj, CFGNode):
+            return self.node_to_index[obj]
+        return None
+
+class _NodeUnpickler(pickle.Unpickler):
+    def __init__(self, file, nodes: List[CFGNode]) -> None:
+        super().__init__(file)
+        self.nodes = nodes
+    def persistent_load(self, pid):
+        return self.nodes[pid]
+
+# set before forking the workers, workers inherit it
+_FORKED_JOB: Optional[tuple] = None
+
+def _run_forked_job(i: int) -> bytes:
+    assert _FORKED_JOB is not None
+    job, program_ir, items, node_to_index = _FORKED_JOB
+    result = job(program_ir, items[i])
+    buffer = io.BytesIO()
+    _NodePickler(buffer, node_to_index).dump(result)
+    return buffer.getvalue()
+
+def _map_in_processes(job: Callable[[Any,Any],Any], program_ir, items: Sequence[Any], n_workers: int) -> List[Any]:
+    global _FORKED_JOB
+    nodes: List[CFGNode] = [node for cfg in program_ir.cfgs.values() for node in [cfg.startnode, *cfg.nodes, cfg.endnode]]
+    node_to_index = {node: i for i, node in enumerate(nodes)}
+    _FORKED_JOB = (job, program_ir, items, node_to_index)
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("fork")) as executor:
+            results = list(executor.map(_run_forked_job, range(len(items))))
+    finally:
+        _FORKED_JOB = None
+    return [_NodeUnpickler(io.BytesIO(result), nodes).load() for result in results]
+
+def map_nodes(job: Callable[[Any,Any],Any], program_ir, items: Sequence[Any], n_workers: Optional[int] = None, executor: Optional[str] = None) -> List[Any]:
+    # [job(program_ir, item) for item in items]
+    n_workers = N_WORKERS if n_workers is None else n_workers
+    executor = EXECUTOR if executor is None else executor
+    n_workers = min(n_workers, len(items) // MIN_JOBS_PER_WORKER)
+    if n_workers <= 1:
+        return [job(program_ir, item) for item in items]
+    if executor == "process" and "fork" in multiprocessing.get_all_start_methods():
+        return _map_in_processes(job, program_ir, items, n_workers)
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        return list(pool.map(lambda item: job(program_ir, item), items))
@@ -0,0 +1,200 @@
+from typing import List, Dict, Tuple, Optional, Any
+from dataclasses import dataclass
+from .ir import *
+from .cfg import _get_strongly_connected_components
+from .analysis_manager import register_analysis
+import graphviz
+
+# Program dependence graph (PDG) of the random statements of a program.
+# Vertices are CFG nodes, an edge dep -> node means that expression `role` of node depends on dep:
+#   kind "data": dep is a reaching definition (AbstractAssignNode) of a variable in the expression
+#   kind "control": dep is a branch node that decides if node is executed
+# The roles of a node are the expressions which are analysed for it:
+#   SampleNode: "address", "distribution", FactorNode: "factor", BranchNode: "test",
+#   other assign nodes: "value" and "index" (for indexed targets)
+#
+# The graph is built once from the random statements (sample and factor nodes) and contains all nodes they depend on.
+# The value of a sample statement only depends on its address (it is random), so when we reach a sample node
+# as dependency, we only continue with its "address" expression, the "distribution" is only followed from the random statement itself.
+#
+# For each node we precompute on the DAG of strongly connected components:
+#   random ancestors: sample nodes that are reached as data dependency (nodes reached through other sample nodes included)
+#   data control deps: branch nodes on which node is control dependent through data dependencies only
+# Random control dependencies of r are the random ancestors of the data control deps of r.
+
+@dataclass(frozen=True)
+class PDGEdge:
+    source: CFGNode # dependency
+    target: CFGNode
+    kind: str # "data" or "control"
+    role: str
+
+def get_role_expressions(node: CFGNode) -> List[Tuple[str,Expression]]:
+    if isinstance(node, SampleNode):
+        return [("address", node.get_address_expr()), ("distribution", node.get_distribution_expr())]
+    if isinstance(node, FactorNode):
+        return [("factor", node.get_factor_expr())]
+    if isinstance(node, BranchNode):
+        return [("test", node.get_test_expr())]
+    if isinstance(node, AbstractAssignNode):
+        exprs = [("value", node.get_value_expr())]
+        if node.get_target().is_indexed_target():
+            exprs.append(("index", node.get_target().get_index_expr()))
+        return exprs
+    return []
+
+def get_dependency_edges(program_ir: PPL_IR, node: CFGNode) -> List[PDGEdge]:
+    edges: List[PDGEdge] = []
+    for role, expr in get_role_expressions(node):
+        for dep in program_ir.get_data_deps_for_expr(node, expr):
+            edges.append(PDGEdge(dep, node, "data", role))
+        for dep in program_ir.get_control_deps_for_node(node, expr):
+            edges.append(PDGEdge(dep, node, "control", role))
+    return edges
+
+def _get_label(node: CFGNode) -> str:
+    try:
+        return node.get_source_location().source_text
+    except NotImplementedError:
+        return str(node) # frontend without source locations
+
+class ProgramDependenceGraph:
+    def __init__(self, program_ir: PPL_IR) -> None:
+        self.program_ir = program_ir
+        self.random_stmts: List[SampleNode | FactorNode] = program_ir.get_sample_nodes() + program_ir.get_factor_nodes()
+
+        # node -> incoming edges, in order of roles and dependencies
+        self.dependencies: Dict[CFGNode,List[PDGEdge]] = dict()
+        self.vertices: List[CFGNode] = []
+        # breadth-first, sequentially such that the dependency queries fill the rd and cdg memos of program_ir.analyses,
+        # which are then shared with the checkers (worker processes of ir4ppl/parallel.py would fill their own copies)
+        frontier: List[CFGNode] = list(dict.fromkeys(self.random_stmts))
+        while len(frontier) > 0:
+            self.vertices.extend(frontier)
+            next_frontier: Dict[CFGNode,None] = dict()
+            for node in frontier:
+                self.dependencies[node] = get_dependency_edges(program_ir, node)
+            for node in frontier:
+                for edge in self.dependencies[node]:
+                    if edge.source not in self.dependencies:
+                        next_frontier[edge.source] = None
+            frontier = list(next_frontier)
+
+        self.samples: List[SampleNode] = [node for node in self.vertices if isinstance(node, SampleNode)]
+        self.sample_index = {node: i for i, node in enumerate(self.samples)}
+        self.branches: List[BranchNode] = [node for node in self.vertices if isinstance(node, BranchNode)]
+        self.branch_index = {node: i for i, node in enumerate(self.branches)}
+
+        # bitsets over self.samples and self.branches
+        self.random_ancestors: Dict[CFGNode,int] = dict()
+        self.data_control_deps: Dict[CFGNode,int] = dict()
+        self._compute_random_ancestors()
+        self._compute_data_control_deps()
+
+    def _get_dependency_edges(self, node: CFGNode) -> List[PDGEdge]:
+        # edges which are followed if node is reached as dependency
+        edges = self.dependencies[node]
+        if isinstance(node, SampleNode):
+            return [edge for edge in edges if edge.role == "address"]
+        return edges
+
+    def _compute_random_ancestors(self):
+        successors = {node: [edge.source for edge in self._get_dependency_edges(node)] for node in self.vertices}
+        for scc in _get_strongly_connected_components(self.vertices, successors):
+            # dependencies first
+            ancestors = 0
+            for node in scc:
+                for edge in self._get_dependency_edges(node):
+                    dep = edge.source
+                    if dep in self.sample_index:
+                        ancestors |= 1 << self.sample_index[dep]
+                    ancestors |= self.random_ancestors.get(dep, 0) # 0 for dependencies in the same scc
+            for node in scc:
+                self.random_ancestors[node] = ancestors
+
+    def _compute_data_control_deps(self):
+        successors = {node: [edge.source for edge in self._get_dependency_edges(node) if edge.kind == "data"] for node in self.vertices}
+        for scc in _get_strongly_connected_components(self.vertices, successors):
+            control_deps = 0
+            for node in scc:
+                for edge in self._get_dependency_edges(node):
+                    if edge.kind == "control":
+                        control_deps |= 1 << self.branch_index[edge.source]
+                    else:
+                        control_deps |= self.data_control_deps.get(edge.source, 0)
+            for node in scc:
+                self.data_control_deps[node] = control_deps
+
+    def _to_samples(self, bitset: int) -> List[SampleNode]:
+        return [node for i, node in enumerate(self.samples) if (bitset >> i) & 1]
+
+    def _random_stmt_bitsets(self, r: SampleNode | FactorNode) -> Tuple[int,int]:
+        # like random_ancestors and data_control_deps, but with all roles of r (e.g. also the distribution of a sample node)
+        if isinstance(r, FactorNode):
+            return self.random_ancestors[r], self.data_control_deps[r]
+        ancestors = self.random_ancestors[r]
+        control_deps = self.data_control_deps[r]
+        for edge in self.dependencies[r]:
+            if edge.role != "distribution":
+                continue
+            if edge.kind == "data":
+                if edge.source in self.sample_index:
+                    ancestors |= 1 << self.sample_index[edge.source]
+                ancestors |= self.random_ancestors[edge.source]
+                control_deps |= self.data_control_deps[edge.source]
+            else:
+                ancestors |= self.random_ancestors[edge.source]
+                control_deps |= 1 << self.branch_index[edge.source]
+        return ancestors, control_deps
+
+    def get_dependencies(self, node: CFGNode) -> List[PDGEdge]:
+        return self.dependencies[node]
+
+    def get_random_ancestors(self, r: SampleNode | FactorNode) -> List[SampleNode]:
+        # sample nodes on which r depends through data and control dependencies
+        ancestors, _ = self._random_stmt_bitsets(r)
+        return self._to_samples(ancestors)
+
+    def get_random_control_dependencies(self, r: SampleNode | FactorNode) -> List[SampleNode]:
+        # sample nodes which influence the condition of a branch node on which r is control dependent
+        _, control_deps = self._random_stmt_bitsets(r)
+        ancestors = 0
+        for i, branch_node in enumerate(self.branches):
+            if (control_deps >> i) & 1:
+                ancestors |= self.random_ancestors[branch_node]
+        return self._to_samples(ancestors)
+
+    def to_json(self) -> Dict[str,Any]:
+        index = {node: i for i, node in enumerate(self.vertices)}
+        return {
+            "nodes": [{
+                    "id": i,
+                    "cfgnode": node.id,
+                    "type": type(node).__name__,
+                    "label": _get_label(node)
+                } for i, node in enumerate(self.vertices)],
+            "edges": [{
+                    "source": index[edge.source],
+                    "target": index[edge.target],
+                    "kind": edge.kind,
+                    "role": edge.role
+                } for node in self.vertices for edge in self.dependencies[node]]
+        }
+
+    def to_dot(self) -> str:
+        dot = graphviz.Digraph('pdg', engine="dot")
+        index = {node: str(i) for i, node in enumerate(self.vertices)}
+        for node in self.vertices:
+            dot.node(index[node], _get_label(node), shape="box" if isinstance(node, BranchNode) else "ellipse")
+        for node in self.vertices:
+            for edge in self.dependencies[node]:
+                dot.edge(index[edge.source], index[edge.target], label=edge.role, style="solid" if edge.kind == "data" else "dashed")
+        return dot.source
+
+@register_analysis("pdg", ("rd", "cdg", "function_summaries"))
+def _run_pdg(program_ir: PPL_IR) -> ProgramDependenceGraph:
+    return ProgramDependenceGraph(program_ir)
+
+def get_pdg(program_ir: PPL_IR) -> ProgramDependenceGraph:
+    # built once per IR (see ir4ppl/analysis_manager.py)
+    return program_ir.analyses.get("pdg")
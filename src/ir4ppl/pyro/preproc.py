@@ -3,7 +3,26 @@ from typing import Callable
 import ast
 import uuid
 from copy import deepcopy
-import ast_scope
+
+# Copy of own_singletons in src/py/ast_utils/preprocess.py (see Confusion (1) there), ir4ppl does not import from src/py.
+# Here the shared singletons would leak the syntaxnode annotations of make_syntaxtree into other trees.
+# Modifies root_node in place.
+SINGLETON_AST_TYPES = (ast.expr_context, ast.boolop, ast.operator, ast.unaryop, ast.cmpop)
+
+def own_singletons(root_node: ast.AST):
+    owned: dict[type, ast.AST] = {}
+    def own(value):
+        t = type(value)
+        if t not in owned:
+            owned[t] = t()
+        return owned[t]
+    for node in ast.walk(root_node):
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, SINGLETON_AST_TYPES):
+                setattr(node, field, own(value))
+            elif isinstance(value, list) and len(value) > 0 and isinstance(value[0], SINGLETON_AST_TYPES):
+                # ast.Compare ops
+                setattr(node, field, [own(op) for op in value])
 
 # x = y = 1 -> [x = 1, y = 1]
 # x, y = value -> [tmp = value, x = tmp[0], y = tmp[1]]
@@ -16,11 +35,12 @@ class MultitargetTransformer(ast.NodeVisitor):
                 position_args = {"lineno": stmt.lineno, "col_offset": stmt.col_offset, "end_lineno": stmt.end_lineno, "end_col_offset": stmt.end_col_offset}
                 match stmt:
                     case ast.Assign(targets=[_, _, *_]): # x = y = 1
-                        for name in stmt.targets:
-                            new_stmt = deepcopy(stmt)
-                            new_stmt.targets = [deepcopy(name)]
-                            # new_stmt = ast.Assign(targets=[name], value=deepcopy(stmt.value), **position_args)
+                        # only the value is copied, the last assignment reuses stmt
+                        for name in stmt.targets[:-1]:
+                            new_stmt = ast.Assign(targets=[name], value=deepcopy(stmt.value), **position_args)
                             new_body.append(new_stmt)
+                        stmt.targets = [stmt.targets[-1]]
+                        new_body.append(stmt)
                     case ast.Assign(targets=[ast.Tuple()], value=value): # x, y = 1
                         uuid4 = str(uuid.uuid4())[:5]
                         tmp_name_store = ast.Name(id=f'__TMP__{uuid4}', ctx=ast.Store())
@@ -77,10 +97,11 @@ class LoopUnroller(ast.NodeTransformer):
                             iter_range = range(value)
                         case [ast.Constant(value=value1), ast.Constant(value=value2)]:
                             iter_range = range(value1, value2)
-                    for i in iter_range:
+                    for k, i in enumerate(iter_range):
                         assert isinstance(stmt.target, ast.Name)
                         for forbody_stmt in stmt.body:
-                            forbody_stmt_copy = deepcopy(forbody_stmt)
+                            # the last iteration reuses the loop body, all others are copies
+                            forbody_stmt_copy = forbody_stmt if k == len(iter_range) - 1 else deepcopy(forbody_stmt)
                             NameReplacer(stmt.target.id, ast.Constant(value=i)).visit(forbody_stmt_copy)
                             new_block_body.append(forbody_stmt_copy)
                 case _:
@@ -99,70 +120,6 @@ class LoopUnroller(ast.NodeTransformer):
     
 
 
-class ASTNodeFinder(ast.NodeVisitor):
-    def __init__(self, predicate, map, visit_matched_nodes=False, visit_predicate=None):
-        super().__init__()
-        self.predicate = predicate
-        self.map = map
-        if visit_predicate is None:
-            if visit_matched_nodes:
-                visit_predicate = lambda _: True
-            else:
-                visit_predicate = lambda node: not predicate(node)
-        self.visit_predicate = visit_predicate
-        self.result = []
-
-    def visit(self, node):
-        if self.predicate(node):
-            self.result.append(self.map(node))
-        if self.visit_predicate(node):
-            self.generic_visit(node)
-            
-        return self.result
-    
-def CallFinder(func_syntaxnode: ast.FunctionDef, call_unquifier):
-    assert isinstance(func_syntaxnode, ast.FunctionDef)
-    if func_syntaxnode not in call_unquifier.scope_info:
-        # if we deepcopy a function foo which defines a nested function,
-        # we have to find scope for the nested function (deepcopied foo)
-        call_unquifier.scope_info = ast_scope.annotate(call_unquifier.root_node)
-
-    scope_info = call_unquifier.scope_info
-    return ASTNodeFinder(
-        lambda node: (isinstance(node, ast.Call) and
-                      isinstance(node.func, ast.Name) and
-                      node.func.id == func_syntaxnode.name and
-                      node.func in scope_info and
-                      scope_info[node.func] == scope_info[func_syntaxnode]),
-        lambda node: node
-    )
-
-class CallUniquifier(ast.NodeVisitor):
-    def __init__(self, root_node, scope_info) -> None:
-        self.root_node = root_node
-        self.scope_info = scope_info
-        # scope_info must be updated after transforming ast
-
-    def visit(self, node: ast.AST):
-        if hasattr(node, "body") and isinstance(node.body, list):
-            new_body = []
-            for stmt in node.body:
-                new_body.append(stmt)
-                match stmt:
-                    case ast.FunctionDef(name=_name):
-                        call_finder = CallFinder(stmt, self)
-                        calls = call_finder.visit(self.root_node)
-                        if len(calls) > 1:
-                            for i, call in enumerate(calls):
-                                new_name = f"{_name}_{i}"
-                                call.func.id = new_name
-                                new_func = deepcopy(stmt)
-                                new_func.name = new_name
-                                new_body.append(new_func)
-            node.body = new_body
-
-        return self.generic_visit(node)
-
 def get_pos_args(stmt):
     return {
         "lineno": stmt.lineno,
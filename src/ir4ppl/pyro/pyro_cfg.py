@@ -6,24 +6,60 @@ from ir4ppl.cfg import AssignTarget, Dict, Distribution, Expression, FunctionDef
 from ir4ppl.cfg import SourceLocation
 from ir4ppl.cfg import CFGNode, EndNode, FuncStartNode, StartNode
 from pyro.syntaxnode import Dict
-from .node_finder import NodeVisitor, NodeFinder
+from .node_finder import NodeVisitor
 from .syntaxnode import *
 import ast_scope
 from ast_scope.annotate import ScopeInfo
 from ir4ppl.ir import PPL_IR
-from typing import Any, List, Set
+from typing import Any, List, Set, FrozenSet
 from ir4ppl.base_cfg import AbstractCFGBuilder
 from analysis.symbolics import Symbol, SymOperation, SymConstant
 from analysis.interval_arithmetic import * 
+from analysis.affine_index import AffineExpression, AffineIndex, affine_constant, affine_variable
 from typing import Callable
 
+# symbol ids for python identifiers are keyed by name and scope
+class PythonSymbolTable(SymbolTable):
+    def __init__(self, scope_info: ScopeInfo) -> None:
+        super().__init__()
+        self.scope_info = scope_info
+        self.summaries: Dict[SyntaxNode,ExpressionSummary] = dict()
+
+    def get_symbol_id(self, node: ast.AST) -> int:
+        symbol_id = getattr(node, "symbol_id", None)
+        if symbol_id is None:
+            if isinstance(node, ast.Name):
+                name = node.id
+            elif isinstance(node, ast.arg):
+                name = node.arg
+            else:
+                assert isinstance(node, ast.FunctionDef)
+                name = node.name
+            symbol_id = self.intern((name, self.scope_info[node]))
+            node.symbol_id = symbol_id # type: ignore
+        return symbol_id
+
+    def get_summary(self, syntaxnode: SyntaxNode) -> ExpressionSummary:
+        summary = self.summaries.get(syntaxnode)
+        if summary is None:
+            summary = ExpressionSummarizer(self).summarize(syntaxnode)
+            self.summaries[syntaxnode] = summary
+        return summary
+
+    def resolve(self, root_node: ast.AST):
+        # interns every identifier once before building the IR
+        for node in ast.walk(root_node):
+            if isinstance(node, (ast.Name, ast.arg, ast.FunctionDef)) and node in self.scope_info:
+                self.get_symbol_id(node)
+
 class PythonVariable(Variable):
-    def __init__(self, syntaxnode: SyntaxNode, scope_info: ScopeInfo) -> None:
+    def __init__(self, syntaxnode: SyntaxNode, symbols: PythonSymbolTable) -> None:
         super().__init__()
         assert isinstance(syntaxnode.ast_node, ast.Name)
         self.syntaxnode = syntaxnode
         self.name = syntaxnode.ast_node.id
-        self.scope = scope_info[syntaxnode.ast_node]
+        self.symbol_id = symbols.get_symbol_id(syntaxnode.ast_node)
+        self.symbols = symbols
     def __eq__(self, value: object) -> bool:
         if isinstance(value, PythonVariable):
             return self.syntaxnode == value.syntaxnode
@@ -36,6 +72,12 @@ class PythonVariable(Variable):
         # x[i]
         return self.syntaxnode.parent is not None and self.syntaxnode.parent.is_kind(ast.Subscript)
     
+    def get_affine_index(self) -> Optional[AffineIndex]:
+        parent = self.syntaxnode.parent
+        if parent is None or not parent.is_kind(ast.Subscript) or parent.ast_node.value is not self.syntaxnode.ast_node:
+            return None
+        return get_affine_index_of_subscript(parent.ast_node, self.symbols)
+    
     def __repr__(self) -> str:
         return f"PythonVariable({self.name})"
 
@@ -57,22 +99,52 @@ def get_static_index_of_ref_identifier(ref_node: ast.AST):
             return [peval_ints(_slice)]
     return math.nan
 
+def get_affine_expr(node: ast.AST, symbols: PythonSymbolTable) -> Optional[AffineExpression]:
+    match node:
+        case ast.Constant(value=value) if isinstance(value, int) and not isinstance(value, bool):
+            return affine_constant(value)
+        case ast.Name():
+            return affine_variable(symbols.get_symbol_id(node))
+        case ast.UnaryOp(op=ast.USub(), operand=operand):
+            e = get_affine_expr(operand, symbols)
+            return -e if e is not None else None
+        case ast.BinOp(left=left, op=ast.Add() | ast.Sub() | ast.Mult() as op, right=right):
+            l = get_affine_expr(left, symbols)
+            r = get_affine_expr(right, symbols)
+            if l is None or r is None:
+                return None
+            if isinstance(op, ast.Add):
+                return l + r
+            if isinstance(op, ast.Sub):
+                return l - r
+            # product is only affine if one factor is constant
+            if len(l.coefs) == 0:
+                return r.scale(l.const)
+            if len(r.coefs) == 0:
+                return l.scale(r.const)
+    return None
+
+def get_affine_index_of_subscript(ref_node: ast.Subscript, symbols: PythonSymbolTable) -> AffineIndex:
+    if isinstance(ref_node.slice, ast.Tuple):
+        return tuple(get_affine_expr(el, symbols) for el in ref_node.slice.elts)
+    return (get_affine_expr(ref_node.slice, symbols),)
+
 
 class PythonAssignTarget(AssignTarget):
-    def __init__(self, target: SyntaxNode, scope_info: ScopeInfo) -> None:
+    def __init__(self, target: SyntaxNode, symbols: PythonSymbolTable) -> None:
         super().__init__()
         assert target.is_kind((ast.Name, ast.Subscript, ast.Attribute, ast.arg)), f"target {target} is of wrong kind {target.kind()}"
         self.target = target
-        self.scope_info = scope_info
+        self.symbols = symbols
 
         if isinstance(target.ast_node, ast.Name):
             self.name = target.ast_node.id
-            self.scope = scope_info[target.ast_node]
+            self.symbol_id = symbols.get_symbol_id(target.ast_node)
         elif isinstance(target.ast_node, ast.Subscript):
             assert isinstance(target.ast_node.value, ast.Name), "Subscript AssignTarget has to be static"
             name_node = target.ast_node.value
             self.name = name_node.id
-            self.scope = scope_info[name_node]
+            self.symbol_id = symbols.get_symbol_id(name_node)
         elif isinstance(target.ast_node, ast.Attribute):
             # a.b -> (a, scope[a])
             name_node = target.ast_node
@@ -80,15 +152,11 @@ class PythonAssignTarget(AssignTarget):
                 name_node = name_node.attr
             assert isinstance(name_node, ast.Name)
             self.name = name_node.id
-            self.scope = scope_info[name_node]
+            self.symbol_id = symbols.get_symbol_id(name_node)
         else: #isinstance(target.ast_node, ast.arg):
             assert isinstance(target.ast_node, ast.arg)
             self.name = target.ast_node.arg
-            self.scope = scope_info[target.ast_node]
-    
-    def is_equal(self, variable: Variable) -> bool:
-        assert isinstance(variable, PythonVariable)
-        return self.name == variable.name and self.scope == variable.scope
+            self.symbol_id = symbols.get_symbol_id(target.ast_node)
     
     def is_indexed_target(self) -> bool:
         return self.target.is_kind(ast.Subscript)
@@ -101,7 +169,12 @@ class PythonAssignTarget(AssignTarget):
         
     def get_index_expr(self) -> Expression:
         assert self.target.is_kind(ast.Subscript)
-        return PythonExpression(self.target["slice"], self.scope_info)
+        return PythonExpression(self.target["slice"], self.symbols)
+    
+    def get_affine_index(self) -> Optional[AffineIndex]:
+        if not self.target.is_kind(ast.Subscript):
+            return None
+        return get_affine_index_of_subscript(self.target.ast_node, self.symbols)
  
     def __repr__(self) -> str:
         return ast.unparse(self.target.ast_node)
@@ -166,10 +239,11 @@ def get_call_name(node: ast.Call) -> str:
     raise Exception(f"Cannot find name for call {ast.dump(node)}")
 
 class PythonExpression(Expression):
-    def __init__(self, syntaxnode: SyntaxNode, scope_info: ScopeInfo) -> None:
+    def __init__(self, syntaxnode: SyntaxNode, symbols: PythonSymbolTable) -> None:
         super().__init__()
         self.syntaxnode = syntaxnode
-        self.scope_info = scope_info
+        self.symbols = symbols
+        self.summary = symbols.get_summary(syntaxnode)
     def __eq__(self, value: object) -> bool:
         if isinstance(value, PythonExpression):
             return self.syntaxnode == value.syntaxnode
@@ -178,24 +252,15 @@ class PythonExpression(Expression):
     def __hash__(self) -> int:
         return hash(self.syntaxnode)
 
-    def get_free_variables(self) -> List[Variable]:
-        name_finder = NodeFinder(
-            lambda node: isinstance(node.ast_node, ast.Name) and isinstance(node.ast_node.ctx, ast.Load),
-            lambda node: PythonVariable(node, self.scope_info)) # this also returns variable names for user-defined functions
-        return name_finder.visit(self.syntaxnode)
-    
     def get_function_calls(self, fdef: FunctionDefinition) -> List[FunctionCall]:
-        call_finder = NodeFinder(
-            lambda node: (isinstance(node.ast_node, ast.Call) and
-                          node["func"].is_kind(ast.Name) and
-                          fdef.is_equal(PythonVariable(node["func"], self.scope_info))),
-            lambda node: PythonFunctionCall(node, self.scope_info))
-        return call_finder.visit(self.syntaxnode)
+        if fdef.symbol_id not in self.summary.symbol_ids:
+            return list()
+        return [PythonFunctionCall(node, self.symbols) for symbol_id, node in self.summary.function_calls if symbol_id == fdef.symbol_id]
 
     def _estimate_value_range_rec(self, node: ast.AST, variable_mask: Dict[Variable,Interval]) -> Interval:
         match node:
             case ast.Name(id=name):
-                v = PythonVariable(get_syntaxnode(node), self.scope_info)
+                v = PythonVariable(get_syntaxnode(node), self.symbols)
                 return variable_mask.get(v, Interval(float('-inf'), float('inf')))
             case ast.Constant(value=value):
                 return Interval(value, value)
@@ -219,7 +284,7 @@ class PythonExpression(Expression):
             case ast.Call(func=name, args=args):
                 symvalues = [self._estimate_value_range_rec(value, variable_mask) for value in args]
                 if isinstance(name, ast.Name):
-                    v = PythonVariable(get_syntaxnode(name), self.scope_info)
+                    v = PythonVariable(get_syntaxnode(name), self.symbols)
                     if v in variable_mask:
                         return variable_mask[v]
                 name = get_call_name(node)
@@ -239,7 +304,7 @@ class PythonExpression(Expression):
     def _symbolic_rec(self, node: ast.AST, variable_mask: Dict[Variable,SymbolicExpression]) -> SymbolicExpression:
         match node:
             case ast.Name(id=name):
-                v = PythonVariable(get_syntaxnode(node), self.scope_info)
+                v = PythonVariable(get_syntaxnode(node), self.symbols)
                 return variable_mask.get(v, Symbol(name))
             case ast.Constant(value=value):
                 return SymConstant(value)
@@ -284,16 +349,43 @@ class PythonFunctionCall(PythonExpression, FunctionCall):
         for kw in call_site.get_children("keywords"):
             assert isinstance(kw.ast_node, ast.keyword)
             if kw.ast_node == node.get_arg_name():
-                return PythonExpression(kw["value"], self.scope_info)
+                return PythonExpression(kw["value"], self.symbols)
 
         param_ix = node.get_index_in_func()
         args = list(call_site.get_children("args"))
         if param_ix < len(args):
             # select param_ix-th argument in call site
-            return PythonExpression(args[param_ix], self.scope_info)
+            return PythonExpression(args[param_ix], self.symbols)
         else:
             return EmptyPythonExpression() # has to have default argument
 
+
+# collects free variables and calls of an expression in one traversal
+class ExpressionSummarizer(NodeVisitor):
+    def __init__(self, symbols: PythonSymbolTable) -> None:
+        self.symbols = symbols
+        self.free_variables: List[Variable] = []
+        self.function_calls: List[Tuple[int,SyntaxNode]] = []
+        self.has_calls = False
+
+    def visit(self, node: SyntaxNode):
+        if isinstance(node.ast_node, ast.Name) and isinstance(node.ast_node.ctx, ast.Load):
+            # this also returns variable names for user-defined functions
+            self.free_variables.append(PythonVariable(node, self.symbols))
+        elif isinstance(node.ast_node, ast.Call):
+            self.has_calls = True
+            if node["func"].is_kind(ast.Name):
+                self.function_calls.append((self.symbols.get_symbol_id(node["func"].ast_node), node))
+        self.generic_visit(node)
+
+    def summarize(self, syntaxnode: SyntaxNode) -> ExpressionSummary:
+        self.visit(syntaxnode)
+        return ExpressionSummary(
+            tuple(self.free_variables),
+            frozenset(variable.symbol_id for variable in self.free_variables),
+            tuple(self.function_calls),
+            len(self.free_variables) == 0 and not self.has_calls
+        )
     
 class EmptyPythonExpression(PythonExpression):
     def __init__(self) -> None:
@@ -302,8 +394,6 @@ class EmptyPythonExpression(PythonExpression):
         return 0
     def __eq__(self, value: object) -> bool:
         return isinstance(value, EmptyPythonExpression)
-    def get_free_variables(self) -> List[Variable]:
-        return list()
     def get_function_calls(self, fdef: FunctionDefinition) -> List[FunctionCall]:
         return list()
     def estimate_value_range(self, variable_mask: Dict[Variable,Interval]) -> Interval:
@@ -318,23 +408,19 @@ def get_only_elem(s: Set[CFGNode]) -> CFGNode:
     return list(s)[0]
 
 class PythonFunctionDefinition(FunctionDefinition):
-    def __init__(self, syntaxnode: SyntaxNode, scope_info: ScopeInfo) -> None:
+    def __init__(self, syntaxnode: SyntaxNode, symbols: PythonSymbolTable) -> None:
         super().__init__()
         assert syntaxnode.is_kind(ast.Module) or syntaxnode.is_kind(ast.FunctionDef) # toplevel ("main") or functiondef
         self.syntaxnode = syntaxnode
         self.name = ""
         if isinstance(syntaxnode.ast_node, ast.FunctionDef):
             self.name = syntaxnode.ast_node.name
-            self.scope = scope_info[syntaxnode.ast_node]
-            # is the scope in which the function is defined
-            # ast.Name in ast.Call will also have this scope
+            # symbol is keyed by the scope in which the function is defined
+            # ast.Name in ast.Call will also have this symbol
+            self.symbol_id = symbols.get_symbol_id(syntaxnode.ast_node)
         else:
             self.name = "Toplevel"
-            self.scope = None
-
-    def is_equal(self, variable: Variable) -> bool:
-        assert isinstance(variable, PythonVariable)
-        return self.name == variable.name and self.scope == variable.scope
+            self.symbol_id = NO_SYMBOL
         
     def __repr__(self) -> str:
         if self.syntaxnode.is_kind(ast.Module):
@@ -344,7 +430,7 @@ class PythonFunctionDefinition(FunctionDefinition):
             return f"PythonFunctionDefinition{self.syntaxnode.ast_node.name})"
 
 from .torch_distribution import parse_torch_distribution
-def get_distribution_from_node(distribution_node: ast.AST, scope_info: ScopeInfo):
+def get_distribution_from_node(distribution_node: ast.AST, symbols: PythonSymbolTable):
     # dist.Normal(0,1).to_event() ... -> dist.Normal(0,1)
     while isinstance(distribution_node, ast.Call) and isinstance(distribution_node.func, ast.Attribute) and isinstance(distribution_node.func.value, ast.Call):
         distribution_node = distribution_node.func.value
@@ -356,15 +442,16 @@ def get_distribution_from_node(distribution_node: ast.AST, scope_info: ScopeInfo
     kwargs = {kw.arg: kw.value for kw in distribution_node.keywords}
 
     dist_name, dist_params = parse_torch_distribution(name, args, kwargs)
-    dist_args: Dict[str, Expression] = {argname: PythonExpression(get_syntaxnode(ast_node), scope_info) for argname, ast_node in dist_params.items()}
+    dist_args: Dict[str, Expression] = {argname: PythonExpression(get_syntaxnode(ast_node), symbols) for argname, ast_node in dist_params.items()}
     return Distribution(dist_name, dist_args)
 
 class PyroSampleNode(SampleNode):
+    __slots__ = ()
     def get_distribution_expr(self) -> Expression:
         value_expr = self.get_value_expr()
         assert isinstance(value_expr, PythonExpression)
         assert value_expr.syntaxnode.is_kind(ast.Call)
-        return PythonExpression(value_expr.syntaxnode["args_1"], value_expr.scope_info)
+        return PythonExpression(value_expr.syntaxnode["args_1"], value_expr.symbols)
     
     def get_distribution(self) -> Distribution:
         value_expr = self.get_value_expr()
@@ -372,13 +459,13 @@ class PyroSampleNode(SampleNode):
         assert value_expr.syntaxnode.is_kind(ast.Call)
         distribution_syntaxnode = value_expr.syntaxnode["args_1"]
         distribution_node = distribution_syntaxnode.ast_node
-        return get_distribution_from_node(distribution_node, value_expr.scope_info)
+        return get_distribution_from_node(distribution_node, value_expr.symbols)
         
     def get_address_expr(self) -> Expression:
         value_expr = self.get_value_expr()
         assert isinstance(value_expr, PythonExpression)
         assert value_expr.syntaxnode.is_kind(ast.Call)
-        return PythonExpression(value_expr.syntaxnode["args_0"], value_expr.scope_info)
+        return PythonExpression(value_expr.syntaxnode["args_0"], value_expr.symbols)
     
     def symbolic_name(self) -> str:
         addr = self.get_address_expr()
@@ -386,6 +473,7 @@ class PyroSampleNode(SampleNode):
         return ast.unparse(addr.syntaxnode.ast_node)
 
 class PyroFactorNode(FactorNode):
+    __slots__ = ()
     def __init__(self, id: str, factor_expression: Expression) -> None:
         super().__init__(id, factor_expression)
     def get_distribution(self) -> Distribution:
@@ -394,7 +482,7 @@ class PyroFactorNode(FactorNode):
         assert value_expr.syntaxnode.is_kind(ast.Call)
         distribution_syntaxnode = value_expr.syntaxnode["args_1"]
         distribution_node = distribution_syntaxnode.ast_node
-        return get_distribution_from_node(distribution_node, value_expr.scope_info)
+        return get_distribution_from_node(distribution_node, value_expr.symbols)
 
 
 def is_supported_expression(node: ast.AST):
@@ -418,10 +506,10 @@ class PyroCFG(CFG):
         return self.source_location
 
 class PyroCFGBuilder(AbstractCFGBuilder):
-    def __init__(self, node_to_id: Dict[SyntaxNode,str], scope_info: ScopeInfo) -> None:
+    def __init__(self, node_to_id: Dict[SyntaxNode,str], symbols: PythonSymbolTable) -> None:
         self.node_to_id = node_to_id
         self.cfgs: Dict[FunctionDefinition,CFG] = dict() # toplevel -> CFG, functiondef -> CFG
-        self.scope_info = scope_info
+        self.symbols = symbols
 
     def is_random_variable_definition(self, node: ast.AST) -> bool:
         match node:
@@ -460,7 +548,7 @@ class PyroCFGBuilder(AbstractCFGBuilder):
 
         if node.is_kind(ast.Module):
             cfg = self.get_cfg(node["body"], None, None, None)
-            self.cfgs[PythonFunctionDefinition(node, self.scope_info)] = cfg
+            self.cfgs[PythonFunctionDefinition(node, self.symbols)] = cfg
             return cfg
         
         if node.is_kind(ast.With):
@@ -475,12 +563,12 @@ class PyroCFGBuilder(AbstractCFGBuilder):
                 child_node_id = self.node_to_id[child]
                 if child.is_kind(ast.FunctionDef):
                     function_cfg = self.get_function_cfg(child)
-                    self.cfgs[PythonFunctionDefinition(child, self.scope_info)] = function_cfg
+                    self.cfgs[PythonFunctionDefinition(child, self.symbols)] = function_cfg
                 
                 elif child.is_kind((ast.Return, ast.Break, ast.Continue)):
                     if child.is_kind(ast.Return):
                         if "value" in child.children:
-                            special_node = ReturnNode(child_node_id, PythonExpression(child["value"], self.scope_info))
+                            special_node = ReturnNode(child_node_id, PythonExpression(child["value"], self.symbols))
                         else:
                             special_node = ReturnNode(child_node_id, EmptyPythonExpression())
                         goto_node = returnnode
@@ -524,19 +612,19 @@ class PyroCFGBuilder(AbstractCFGBuilder):
                 if self.is_observed(node.ast_node):
                     cfgnode = PyroFactorNode(
                         node_id,
-                        PythonExpression(node["value"], self.scope_info)
+                        PythonExpression(node["value"], self.symbols)
                     )
                 else:
                     cfgnode = PyroSampleNode(
                         node_id,        
-                        PythonAssignTarget(node["targets_0"], self.scope_info),
-                        PythonExpression(node["value"], self.scope_info)
+                        PythonAssignTarget(node["targets_0"], self.symbols),
+                        PythonExpression(node["value"], self.symbols)
                     )
             else:
                 cfgnode = AssignNode(
                     node_id,
-                    PythonAssignTarget(node["targets_0"], self.scope_info),
-                    PythonExpression(node["value"], self.scope_info)
+                    PythonAssignTarget(node["targets_0"], self.symbols),
+                    PythonExpression(node["value"], self.symbols)
                 )
             nodes.add(cfgnode)
             add_edge(startnode, cfgnode)
@@ -545,7 +633,7 @@ class PyroCFGBuilder(AbstractCFGBuilder):
         elif node.is_kind(ast.If):
             test_node = node["test"]
             
-            branch_cfgnode = BranchNode(node_id + "_if_start", PythonExpression(test_node, self.scope_info))
+            branch_cfgnode = BranchNode(node_id + "_if_start", PythonExpression(test_node, self.symbols))
             branch_join_cfgnode = JoinNode(node_id + "_if_end")
             branch_cfgnode.join_nodes.add(branch_join_cfgnode)
 
@@ -562,7 +650,7 @@ class PyroCFGBuilder(AbstractCFGBuilder):
             test_node = node["test"]
 
             while_start_join_cfgnode = JoinNode(node_id + "_while_start")
-            while_branch_cfgnode = BranchNode(node_id + "_while_test", PythonExpression(test_node, self.scope_info))
+            while_branch_cfgnode = BranchNode(node_id + "_while_test", PythonExpression(test_node, self.symbols))
             while_end_join_cfgnode = JoinNode(node_id + "_while_end")
 
             while_branch_cfgnode.join_nodes.add(while_start_join_cfgnode)
@@ -578,19 +666,23 @@ class PyroCFGBuilder(AbstractCFGBuilder):
             body = node["body"]
 
             for_start_join_cfgnode = JoinNode(node_id + "_for_start")
-            for_branch_cfgnode = BranchNode(node_id + "_for_iter", PythonExpression(loop_var, self.scope_info))
+            for_branch_cfgnode = BranchNode(node_id + "_for_iter", PythonExpression(loop_var, self.symbols))
             for_end_join_cfgnode = JoinNode(node_id + "_for_end")
 
+            # for i in range(...) iterates over distinct values
+            iter_node = node.ast_node.iter
+            is_range = isinstance(iter_node, ast.Call) and isinstance(iter_node.func, ast.Name) and iter_node.func.id == "range"
             loop_var_cfgnode = LoopIterNode(
                 node_id, 
-                PythonAssignTarget(node["target"], self.scope_info),
-                PythonExpression(node["iter"], self.scope_info)
+                PythonAssignTarget(node["target"], self.symbols),
+                PythonExpression(node["iter"], self.symbols),
+                distinct_values=is_range
             )
 
             self.build_for_cfg(startnode, nodes, endnode, for_start_join_cfgnode, for_branch_cfgnode, for_end_join_cfgnode, loop_var_cfgnode, body, returnnode)
             
         elif is_supported_expression(node.ast_node):
-            cfgnode = ExprNode(node_id, PythonExpression(node, self.scope_info))
+            cfgnode = ExprNode(node_id, PythonExpression(node, self.symbols))
             nodes.add(cfgnode)
             add_edge(startnode, cfgnode)
             add_edge(cfgnode, endnode)
@@ -642,7 +734,7 @@ class PyroCFGBuilder(AbstractCFGBuilder):
             funcarg_node_id = self.node_to_id[p]
             assert isinstance(p.ast_node, ast.arg), f"Param {p} is not ast.arg"
             name = p.ast_node.arg
-            funcarg_node = FuncArgNode(funcarg_node_id, PythonAssignTarget(p, self.scope_info), EmptyPythonExpression(), name, i)
+            funcarg_node = FuncArgNode(funcarg_node_id, PythonAssignTarget(p, self.symbols), EmptyPythonExpression(), name, i)
             add_edge(current_node, funcarg_node)
             nodes.add(funcarg_node)
             current_node = funcarg_node
@@ -687,17 +779,23 @@ class NodeIdAssigner(NodeVisitor):
 
         self.generic_visit(node)
 
-from .preproc import MultitargetTransformer, PyroPreprocessor, LoopUnroller
-def get_IR_for_pyro(filename: str):
+from .preproc import MultitargetTransformer, PyroPreprocessor, LoopUnroller, own_singletons
+def get_IR_for_pyro(filename: str, n_unroll_loops: int = 0):
+    # loops do not have to be unrolled for precise array dependencies (see analysis/affine_index.py)
 
     line_offsets = get_line_offsets(filename)
     file_content = get_file_content(filename)
-    root_node = deepcopy(ast.parse(file_content.source))
+    root_node = ast.parse(file_content.source)
+    # the transformers below modify the freshly parsed tree in place
+    own_singletons(root_node)
     MultitargetTransformer().visit(root_node)
-    LoopUnroller(3).visit(root_node)
+    if n_unroll_loops > 0:
+        LoopUnroller(n_unroll_loops).visit(root_node)
     root_node = PyroPreprocessor().visit(root_node)
 
     scope_info = ast_scope.annotate(root_node)
+    symbols = PythonSymbolTable(scope_info)
+    symbols.resolve(root_node)
     syntaxtree = make_syntaxtree(root_node, line_offsets, file_content)
 
     node_id_assigner = NodeIdAssigner()
@@ -705,7 +803,7 @@ def get_IR_for_pyro(filename: str):
     node_to_id = node_id_assigner.node_to_id
     id_to_node = node_id_assigner.id_to_node
 
-    cfgbuilder = PyroCFGBuilder(node_to_id, scope_info)
+    cfgbuilder = PyroCFGBuilder(node_to_id, symbols)
     cfgbuilder.get_cfg(syntaxtree, None, None, None)
     for _, cfg in cfgbuilder.cfgs.items():
         assert verify_cfg(cfg)
@@ -2,10 +2,10 @@ from copy import copy
 from ir4ppl.cfg import *
 from stan.syntaxnode import StanSyntaxNode
 from ir4ppl.base_cfg import AbstractCFGBuilder
-from .node_finder import NodeVisitor, NodeFinder
+from .node_finder import NodeVisitor
 from .syntaxnode import *
 from ir4ppl.ir import PPL_IR
-from typing import Any, List
+from typing import Any, List, FrozenSet
 from .unparser import unparse, hide_loc_data
 from analysis.interval_arithmetic import *
 from typing import Callable
@@ -18,6 +18,7 @@ class StanVariable(Variable):
         match syntaxnode.sexpr:
             case ['Variable', [['name', name], ['id_loc', idloc]]]:
                 self.name = name # not scope aware
+                self.symbol_id: int = syntaxnode.symbol_id # interned by NodeIdAssigner
             case _:
                 raise Exception(f"Unkown Stan variable {(syntaxnode.sexpr)}")
 
@@ -60,7 +61,7 @@ def match_arg_and_collect_indices(sexpr, indices: list):
             raise Exception(f"Unknown arg: {hide_loc_data(sexpr)}")
 
 class StanAssignTarget(AssignTarget):
-    def __init__(self, syntaxnode: StanSyntaxNode, sexpr_to_node: Dict[int,StanSyntaxNode]) -> None:
+    def __init__(self, syntaxnode: StanSyntaxNode, sexpr_to_node: Dict[int,StanSyntaxNode], symbols: SymbolTable) -> None:
         super().__init__()
         self.syntaxnode = syntaxnode
         self.is_indexed = False
@@ -100,11 +101,7 @@ class StanAssignTarget(AssignTarget):
             
         if isinstance(self.name, bool):
             pprint(self.syntaxnode.sexpr)
-        
-    
-    def is_equal(self, variable: Variable) -> bool:
-        assert isinstance(variable, StanVariable)
-        return self.name == variable.name
+        self.symbol_id = symbols.intern(self.name)
     
     def is_indexed_target(self) -> bool:
         return self.is_indexed
@@ -189,6 +186,50 @@ STAN_OP_TO_FUNC: Dict[str, Callable] = {
     'cell_prob': interval_real,
 }
 
+# collects free variables and calls of a syntax node in one traversal
+class ExpressionSummarizer(NodeVisitor):
+    def __init__(self) -> None:
+        self.free_variables: List[Variable] = []
+        self.function_calls: List[Tuple[str,StanSyntaxNode]] = []
+        self.has_calls = False
+
+    def visit(self, node: StanSyntaxNode):
+        match node.sexpr:
+            # would have to modify here to also return variable names for user-defined functions
+            case ['Variable', *_]:
+                self.free_variables.append(StanVariable(node))
+            case ['FunApp' | 'CondDistApp' | 'NRFunApp', _, [['name', name], ['id_loc', _]], args]:
+                self.has_calls = True
+                self.function_calls.append((name, node))
+            case _:
+                pass
+        self.generic_visit(node)
+
+    def summarize(self, syntaxnode: StanSyntaxNode) -> ExpressionSummary:
+        self.visit(syntaxnode)
+        return ExpressionSummary(
+            tuple(self.free_variables),
+            frozenset(variable.symbol_id for variable in self.free_variables),
+            tuple(self.function_calls),
+            len(self.free_variables) == 0 and not self.has_calls
+        )
+
+# summaries are cached in the syntax node
+def get_summary(syntaxnode: StanSyntaxNode) -> ExpressionSummary:
+    summary = getattr(syntaxnode, "summary", None)
+    if summary is None:
+        summary = ExpressionSummarizer().summarize(syntaxnode)
+        syntaxnode.summary = summary
+    return summary
+
+def merge_summaries(summaries: List[ExpressionSummary]) -> ExpressionSummary:
+    return ExpressionSummary(
+        tuple(variable for summary in summaries for variable in summary.free_variables),
+        frozenset().union(*[summary.symbol_ids for summary in summaries]),
+        tuple(call for summary in summaries for call in summary.function_calls),
+        all(summary.is_constant for summary in summaries)
+    )
+
 class StanExpression(Expression):
     def __init__(self, syntaxnodes: List[StanSyntaxNode], sexpr_to_node: Dict[int,StanSyntaxNode]) -> None:
         super().__init__()
@@ -196,6 +237,10 @@ class StanExpression(Expression):
             assert isinstance(syntaxnode, StanSyntaxNode)
         self.syntaxnodes = syntaxnodes
         self.sexpr_to_node = sexpr_to_node
+        if len(syntaxnodes) == 1:
+            self.summary = get_summary(syntaxnodes[0])
+        else:
+            self.summary = merge_summaries([get_summary(syntaxnode) for syntaxnode in syntaxnodes])
 
     def __eq__(self, value: object) -> bool:
         if isinstance(value, StanExpression):
@@ -210,36 +255,10 @@ class StanExpression(Expression):
         last_byte = max(syntaxnode.end_position for syntaxnode in self.syntaxnodes)
         return SourceLocation(self.syntaxnodes[0].source[first_byte:last_byte], first_byte, last_byte)
 
-    def get_free_variables(self) -> List[Variable]:
-        def is_variable(syntaxnode: StanSyntaxNode) -> bool:
-            match syntaxnode.sexpr:
-                # would have to modify here to also return variable names for user-defined functions
-                case ['Variable', *_]:
-                    return True
-                case _:
-                    return False
-        name_finder = NodeFinder(
-            is_variable,
-            lambda node: StanVariable(node))
-        for syntaxnode in self.syntaxnodes:
-            name_finder.visit(syntaxnode)
-        return name_finder.result
-    
     def get_function_calls(self, fdef: FunctionDefinition) -> List[FunctionCall]:
         assert isinstance(fdef, StanFunctionDefinition)
-        def is_function_call(syntaxnode: StanSyntaxNode) -> bool:
-            match syntaxnode.sexpr:
-                case ['FunApp' | 'CondDistApp' | 'NRFunApp', _, [['name', name], ['id_loc', _]], args]:
-                    return fdef.name == name or fdef.name == name + "_lpdf" or fdef.name == name + "_lpmf"
-                case _:
-                    return False
-            
-        call_finder = NodeFinder(
-            is_function_call,
-            lambda node: StanFunctionCall([node], self.sexpr_to_node))
-        for syntaxnode in self.syntaxnodes:
-            call_finder.visit(syntaxnode)
-        return call_finder.result
+        return [StanFunctionCall([node], self.sexpr_to_node) for name, node in self.summary.function_calls
+                if fdef.name == name or fdef.name == name + "_lpdf" or fdef.name == name + "_lpmf"]
     
     def _estimate_value_range_rec(self, sexpr, variable_mask: Dict[Variable,Interval], tab="") -> Interval:
         # print(tab, "    _estimate_value_range_rec", hide_loc_data(sexpr))
@@ -317,8 +336,6 @@ class EmptyStanExpression(StanExpression):
         return isinstance(value, EmptyStanExpression)
     def __hash__(self) -> int:
         return 0
-    def get_free_variables(self) -> List[Variable]:
-        return list()
     def get_function_calls(self, fdef: FunctionDefinition) -> List[FunctionCall]:
         return list()
     def estimate_value_range(self, variable_mask: Dict[Variable,Interval]) -> Interval:
@@ -335,8 +352,6 @@ class VarDeclStanExpression(StanExpression):
         return False
     def __hash__(self) -> int:
         return hash(self.range)
-    def get_free_variables(self) -> List[Variable]:
-        return list()
     def get_function_calls(self, fdef: FunctionDefinition) -> List[FunctionCall]:
         return list()
     def estimate_value_range(self, variable_mask: Dict[Variable,Interval]) -> Interval:
@@ -351,7 +366,7 @@ def get_only_elem(s: Set[CFGNode]) -> CFGNode:
     return list(s)[0]
 
 class StanFunctionDefinition(FunctionDefinition):
-    def __init__(self, syntaxnode: StanSyntaxNode, name: str | None = None) -> None:
+    def __init__(self, syntaxnode: StanSyntaxNode, symbols: SymbolTable, name: str | None = None) -> None:
         super().__init__()
         self.syntaxnode = syntaxnode
         self.name: str = ""
@@ -363,15 +378,13 @@ class StanFunctionDefinition(FunctionDefinition):
                     raise Exception(f"Cannot find name for func: {hide_loc_data(syntaxnode.sexpr)}")
         else:
             self.name = name # not scope aware
-
-    def is_equal(self, variable: Variable) -> bool:
-        assert isinstance(variable, StanVariable)
-        return self.name == variable.name
+        self.symbol_id = symbols.intern(self.name)
         
     def __repr__(self) -> str:
         return f"StanFunctionDefinition({self.name})"
 
 class StanSampleNode(SampleNode):
+    __slots__ = ("syntaxnode", "sexpr_to_node")
     def __init__(self, id: str, target: AssignTarget, value: Expression, syntaxnode: StanSyntaxNode, sexpr_to_node: Dict[int,StanSyntaxNode]) -> None:
         super().__init__(id, target, value)
         self.syntaxnode = syntaxnode
@@ -410,6 +423,7 @@ class StanSampleNode(SampleNode):
         return SourceLocation(self.syntaxnode.sourcetext(), self.syntaxnode.position, self.syntaxnode.end_position)
     
 class StanFactorNode(FactorNode):
+    __slots__ = ("syntaxnode", "sexpr_to_node")
     def __init__(self, id: str, factor_expression: Expression, syntaxnode: StanSyntaxNode, sexpr_to_node: Dict[int,StanSyntaxNode]) -> None:
         super().__init__(id, factor_expression)
         self.syntaxnode = syntaxnode
@@ -609,9 +623,10 @@ class StanFactorNode(FactorNode):
 
 from pprint import pprint
 class StanCFGBuilder(AbstractCFGBuilder):
-    def __init__(self, node_to_id: Dict[StanSyntaxNode,str], sexpr_to_node: Dict[int,StanSyntaxNode]) -> None:
+    def __init__(self, node_to_id: Dict[StanSyntaxNode,str], sexpr_to_node: Dict[int,StanSyntaxNode], symbols: SymbolTable) -> None:
         self.node_to_id = node_to_id
         self.sexpr_to_node = sexpr_to_node
+        self.symbols = symbols
         self.cfgs: Dict[FunctionDefinition,CFG] = dict() # toplevel -> CFG, functiondef -> CFG
 
     def get_cfg(self, node: StanSyntaxNode, breaknode:Optional[JoinNode], continuenode:Optional[JoinNode], returnnode:Optional[JoinNode]) -> CFG: # type:ignore
@@ -638,7 +653,7 @@ class StanCFGBuilder(AbstractCFGBuilder):
             return self.get_cfg(node[0], breaknode, continuenode, returnnode)
         elif node.head == "FunDef":
             function_cfg = self.get_function_cfg(node)
-            self.cfgs[StanFunctionDefinition(node)] = function_cfg
+            self.cfgs[StanFunctionDefinition(node, self.symbols)] = function_cfg
             self.build_empty_cfg(startnode, nodes, endnode, node)
         elif node.head == "VarDecl":
             assert node[3].head == "variables"
@@ -656,7 +671,7 @@ class StanCFGBuilder(AbstractCFGBuilder):
                 parent_node = parent_node.parent
             if is_parameter:
                 assert node.parent is not None and node.parent.head == "stmt"
-                cfgnode = StanSampleNode(node_id, StanAssignTarget(node[3],self.sexpr_to_node), EmptyStanExpression(), node.parent, self.sexpr_to_node)
+                cfgnode = StanSampleNode(node_id, StanAssignTarget(node[3], self.sexpr_to_node, self.symbols), EmptyStanExpression(), node.parent, self.sexpr_to_node)
             else:
                 range = None
                 match node.sexpr:
@@ -664,7 +679,7 @@ class StanCFGBuilder(AbstractCFGBuilder):
                         if value != []:
                             assert len(value) == 1
                             # constrain (non-data) variable with initial value
-                            cfgnode = AssignNode(node_id, StanAssignTarget(node[3],self.sexpr_to_node), StanExpression([self.sexpr_to_node[id(value[0])]], self.sexpr_to_node))
+                            cfgnode = AssignNode(node_id, StanAssignTarget(node[3], self.sexpr_to_node, self.symbols), StanExpression([self.sexpr_to_node[id(value[0])]], self.sexpr_to_node))
                         elif is_data:
                             match trafo:
                                 case 'Identity' | ['OffsetMultiplier' | 'Multiplier' | 'Offset', *_]:
@@ -682,11 +697,11 @@ class StanCFGBuilder(AbstractCFGBuilder):
                                     # print("Warning: Unknown transformation: {hide_loc_data(trafo)}")
                                     # raise Exception(f"Unknown transformation: {hide_loc_data(trafo)}")
                              # we constrain data variable
-                            cfgnode = AssignNode(node_id, StanAssignTarget(node[3],self.sexpr_to_node), VarDeclStanExpression(range))
+                            cfgnode = AssignNode(node_id, StanAssignTarget(node[3], self.sexpr_to_node, self.symbols), VarDeclStanExpression(range))
                         else:
                             # we do not constrain non-data variable without initial value and we do not consider it an assignment
                             cfgnode = SkipNode(node_id)
-                            # cfgnode = AssignNode(node_id, StanAssignTarget(node[3],self.sexpr_to_node), EmptyStanExpression())
+                            # cfgnode = AssignNode(node_id, StanAssignTarget(node[3], self.sexpr_to_node, self.symbols), EmptyStanExpression())
                     case _:
                         raise Exception(f"Unknown vardecl: {hide_loc_data(node.sexpr)}")
 
@@ -699,7 +714,7 @@ class StanCFGBuilder(AbstractCFGBuilder):
             assert node[1].head == "assign_op"
             assert node[2].head == "assign_rhs"
             assert node[1][0].value == "Assign", hide_loc_data(node[1][0].sexpr)
-            cfgnode = AssignNode(node_id, StanAssignTarget(node[0],self.sexpr_to_node), StanExpression([node[2]], self.sexpr_to_node))
+            cfgnode = AssignNode(node_id, StanAssignTarget(node[0], self.sexpr_to_node, self.symbols), StanExpression([node[2]], self.sexpr_to_node))
             nodes.add(cfgnode)
             add_edge(startnode, cfgnode)
             add_edge(cfgnode, endnode)
@@ -709,7 +724,7 @@ class StanCFGBuilder(AbstractCFGBuilder):
             assert node[1].head == "distribution"
             assert node[2].head == "args"
             try:
-                target = StanAssignTarget(node[0],self.sexpr_to_node)
+                target = StanAssignTarget(node[0], self.sexpr_to_node, self.symbols)
                 cfgnode = StanSampleNode(node_id, target, StanExpression([node[1],node[2]], self.sexpr_to_node), node.parent, self.sexpr_to_node)
             except Exception as e:
                 print("Warning:", e)
@@ -756,7 +771,7 @@ class StanCFGBuilder(AbstractCFGBuilder):
 
             loop_var_cfgnode = LoopIterNode(
                 node_id, 
-                StanAssignTarget(loop_var,self.sexpr_to_node),
+                StanAssignTarget(loop_var, self.sexpr_to_node, self.symbols),
                 StanExpression([node[1],node[2]], self.sexpr_to_node)
             )
             self.build_for_cfg(startnode, nodes, endnode, for_start_join_cfgnode, for_branch_cfgnode, for_end_join_cfgnode, loop_var_cfgnode, body, returnnode)
@@ -787,7 +802,7 @@ class StanCFGBuilder(AbstractCFGBuilder):
 
         if node.parent is None:
             # toplevel
-            self.cfgs[StanFunctionDefinition(node, "__MAIN__")] = cfg
+            self.cfgs[StanFunctionDefinition(node, self.symbols, "__MAIN__")] = cfg
 
         return cfg
     
@@ -825,7 +840,7 @@ class StanCFGBuilder(AbstractCFGBuilder):
                         match arg.sexpr:
                             case ['AutoDiffable' | 'DataOnly', _, [['name', argname], ['id_loc', _]]]:
                                 arg_id = self.node_to_id[arg]
-                                funcarg_node = FuncArgNode(arg_id, StanAssignTarget(arg,self.sexpr_to_node), EmptyStanExpression(), argname, i)
+                                funcarg_node = FuncArgNode(arg_id, StanAssignTarget(arg, self.sexpr_to_node, self.symbols), EmptyStanExpression(), argname, i)
                                 funcarg_nodes.append(funcarg_node)
                             case _:
                                 raise Exception(f"Unkown function argument: {hide_loc_data(arg.sexpr)}")
@@ -841,16 +856,20 @@ class StanCFGBuilder(AbstractCFGBuilder):
     
 
 class NodeIdAssigner(NodeVisitor):
-    def __init__(self) -> None:
+    def __init__(self, symbols: SymbolTable) -> None:
         self.node_to_id: Dict[StanSyntaxNode, str] = {}
         self.id_to_node: Dict[str, StanSyntaxNode] = {}
         self.sexpr_to_node : Dict[Any, StanSyntaxNode] = {}
+        self.symbols = symbols
 
     def visit(self, node: StanSyntaxNode):
         i = f"node_{len(self.node_to_id) + 1}"
         self.node_to_id[node] = i
         self.id_to_node[i] = node
         self.sexpr_to_node[id(node.sexpr)] = node
+        match node.sexpr:
+            case ['Variable', [['name', name], ['id_loc', _]]]:
+                node.symbol_id = self.symbols.intern(name)
 
         self.generic_visit(node)
 
@@ -882,13 +901,14 @@ def get_IR_for_stan(filename: str, unsugar_tilde: bool = True, stanc="stanc"):
     syntaxtree = make_stan_syntaxtree(sexpr, line_offsets, file_content)
     # print(unparse(syntaxtree.sexpr))
 
-    node_id_assigner = NodeIdAssigner()
+    symbols = SymbolTable() # symbol ids for stan identifiers are keyed by name (not scope aware)
+    node_id_assigner = NodeIdAssigner(symbols)
     node_id_assigner.visit(syntaxtree)
     node_to_id = node_id_assigner.node_to_id
     id_to_node = node_id_assigner.id_to_node
     sexpr_to_node = node_id_assigner.sexpr_to_node
 
-    cfgbuilder = StanCFGBuilder(node_to_id, sexpr_to_node)
+    cfgbuilder = StanCFGBuilder(node_to_id, sexpr_to_node, symbols)
     cfgbuilder.get_cfg(syntaxtree, None, None, None)
     for fdef, cfg in cfgbuilder.cfgs.items():
         assert verify_cfg(cfg)
@@ -0,0 +1,43 @@
+# helpers for the pyro_test_* scripts, which analyse small programs given as source
+import os
+import tempfile
+from pyro.pyro_cfg import get_IR_for_pyro
+from ir4ppl.ir import PPL_IR
+from ir4ppl.cfg import AbstractAssignNode, SampleNode
+from utils.bcolors import bcolors
+
+HEADER = """
+import torch
+import pyro
+import pyro.distributions as dist
+"""
+
+def get_IR_for_pyro_source(source: str, **kwargs) -> PPL_IR:
+    # source has to define functions model and guide
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as f:
+        f.write(HEADER + source)
+    try:
+        return get_IR_for_pyro(f.name, **kwargs)
+    finally:
+        os.remove(f.name)
+
+def get_assign_node(ir: PPL_IR, target: str, kind: type = AbstractAssignNode) -> AbstractAssignNode:
+    # the only assign node of kind with target (e.g. "x" or "x[i]")
+    nodes = [node for cfg in ir.cfgs.values() for node in cfg.nodes if isinstance(node, kind) and str(node.get_target()) == target]
+    assert len(nodes) == 1, f"{len(nodes)} nodes for {target}"
+    return nodes[0]
+
+def get_sample_node(ir: PPL_IR, target: str) -> SampleNode:
+    node = get_assign_node(ir, target, SampleNode)
+    assert isinstance(node, SampleNode)
+    return node
+
+def get_targets(nodes) -> set[str]:
+    return {str(node.get_target()) for node in nodes}
+
+def check(name: str, result, expected):
+    if result == expected:
+        print(bcolors.OKGREEN, "OK ", bcolors.ENDC, name, sep="")
+    else:
+        print(bcolors.FAIL, "FAIL ", bcolors.ENDC, name, ": ", result, " != ", expected, sep="")
+    assert result == expected
@@ -0,0 +1,94 @@
+# %%
+import sys
+sys.path.append("src/ir4ppl")
+sys.path.append("src/ir4ppl/test")
+from pyro_programs import get_IR_for_pyro_source, get_sample_node, check
+from ir4ppl.ir import *
+from ir4ppl.pdg import get_pdg
+from ir4ppl.analysis_manager import ANALYSES, register_analysis
+import ir4ppl.ir
+from analysis.constraint_verification import verify_constraints
+from analysis.random_control_flow import check_for_random_control_flow
+from analysis.funnel_detection import get_funnel_relationships
+
+source = """
+def model(N):
+    s = pyro.sample("s", dist.Exponential(1.))
+    m = pyro.sample("m", dist.Normal(0., 1.))
+    for i in range(N):
+        if m > 0:
+            x = pyro.sample(f"x_{i}", dist.Normal(m, s))
+        else:
+            x = pyro.sample(f"x_{i}", dist.Normal(-m, m))
+
+def guide(N):
+    pass
+"""
+
+# count how often analyses are computed and how often reaching definitions and branch parents are queried
+runs = {name: 0 for name in ANALYSES}
+for name, analysis in ANALYSES.items():
+    def counted(ir, _run=analysis.run, _name=name, **kwargs):
+        runs[_name] += 1
+        return _run(ir, **kwargs)
+    analysis.run = counted
+
+queries = {"rd": 0, "cdg": 0}
+def counted_RDs(cfgnode, variable, _get_RDs=ir4ppl.ir.get_RDs):
+    queries["rd"] += 1
+    return _get_RDs(cfgnode, variable)
+def counted_BPs(cfg, cfgnode, _get_BPs=ir4ppl.ir.get_BPs):
+    queries["cdg"] += 1
+    return _get_BPs(cfg, cfgnode)
+ir4ppl.ir.get_RDs = counted_RDs
+ir4ppl.ir.get_BPs = counted_BPs
+
+# %%
+# checkers share the analyses, each query is computed once
+ir = get_IR_for_pyro_source(source)
+violations, can_be_analyzed = verify_constraints(ir)
+check("constraint violations", (len(violations), can_be_analyzed), (1, True))
+check("random control flow", len(check_for_random_control_flow(ir)), 2)
+check("funnels", len(get_funnel_relationships(ir)), 2)
+check("rd computed once", runs["rd"], 1)
+check("cdg computed once", runs["cdg"], 1)
+check("pdg computed once", runs["pdg"], 1)
+check("rd queries", queries["rd"], len(ir.analyses.get("rd")))
+check("cdg queries", queries["cdg"], len(ir.analyses.get("cdg")))
+
+# %%
+# invalidation drops the analysis and all analyses that depend on it
+for name in ["rd", "cdg", "function_summaries", "pdg", "reachability", "intervals"]:
+    ir.analyses.get(name)
+ir.analyses.invalidate("rd")
+check("invalidate rd", {name: ir.analyses.is_cached(name) for name in ["rd", "cdg", "function_summaries", "pdg", "reachability", "intervals"]},
+      {"rd": False, "cdg": True, "function_summaries": False, "pdg": False, "reachability": True, "intervals": False})
+ir.analyses.invalidate("reachability")
+check("invalidate reachability", {name: ir.analyses.is_cached(name) for name in ["cdg", "reachability", "path_conditions"]},
+      {"cdg": False, "reachability": False, "path_conditions": False})
+check("reachability of cfgs", all(cfg.compact is None and cfg.reachability is None for cfg in ir.cfgs.values()), True)
+
+# %%
+# keyword arguments are part of the cache key
+@register_analysis("test_n_samples", ("rd",))
+def _run_test_n_samples(ir: PPL_IR, factor: int = 1) -> int:
+    return factor * len(ir.get_sample_nodes())
+
+check("kwargs", (ir.analyses.get("test_n_samples"), ir.analyses.get("test_n_samples", factor=2), ir.analyses.get("test_n_samples", factor=2)), (4, 8, 8))
+check("kwargs cache", ANALYSES["test_n_samples"].get_key({"factor": 2}), (("factor", 2),))
+
+# %%
+# modifying edges of the CFGs drops all results, building another IR does not
+rd = ir.analyses.get("rd")
+other_ir = get_IR_for_pyro_source(source)
+other_ir.cfgs[next(iter(other_ir.cfgs))].n_modifications += 1
+check("other IR", ir.analyses.is_cached("rd") and ir.analyses.get("rd") is rd, True)
+
+node = get_sample_node(ir, "m")
+cfg = next(cfg for cfg in ir.cfgs.values() if cfg.contains(node))
+child = next(iter(node.children))
+cfg.delete_edge(node, child)
+check("modified edges", {name: ir.analyses.is_cached(name) for name in ["rd", "cdg", "pdg", "test_n_samples"]},
+      {"rd": False, "cdg": False, "pdg": False, "test_n_samples": False})
+cfg.add_edge(node, child)
+check("n_modifications", cfg.n_modifications, 2)
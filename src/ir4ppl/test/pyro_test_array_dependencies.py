@@ -0,0 +1,78 @@
+# %%
+import sys
+sys.path.append("src/ir4ppl")
+sys.path.append("src/ir4ppl/test")
+from pyro_programs import get_IR_for_pyro_source, get_sample_node, get_targets, check
+from ir4ppl.ir import *
+from analysis.model_graph import get_graph
+
+# dependencies of indexed reads x[e] on indexed writes x[e'] in range loops (see analysis/affine_index.py),
+# loops are not unrolled
+
+source = """
+def model(N, j):
+    x = torch.zeros(N)
+    for i in range(N):
+        x[i] = pyro.sample(f"x_{i}", dist.Normal(0., 1.))
+        a = pyro.sample(f"a_{i}", dist.Normal(x[i], 1.))
+        b = pyro.sample(f"b_{i}", dist.Normal(x[i-1], 1.))
+        c = pyro.sample(f"c_{i}", dist.Normal(x[j], 1.))
+    w = torch.zeros(2*N)
+    for i in range(N):
+        w[2*i] = pyro.sample(f"w_{i}", dist.Normal(0., 1.))
+        g = pyro.sample(f"g_{i}", dist.Normal(w[2*i+1], 1.))
+    y = torch.zeros(N, N)
+    for k in range(N):
+        for l in range(N):
+            y[k, l] = pyro.sample(f"y_{k}_{l}", dist.Normal(0., 1.))
+            d = pyro.sample(f"d_{k}_{l}", dist.Normal(y[k, l], 1.))
+            e = pyro.sample(f"e_{k}_{l}", dist.Normal(y[k, l-1], 1.))
+            f = pyro.sample(f"f_{k}_{l}", dist.Normal(y[k-1, l], 1.))
+
+def guide(N, j):
+    pass
+"""
+
+ir = get_IR_for_pyro_source(source)
+
+def get_array_deps(target: str) -> set[str]:
+    # data dependencies of the distribution of sample node target on assignments to arrays
+    node = get_sample_node(ir, target)
+    deps = ir.get_data_deps_for_expr(node, node.get_distribution_expr())
+    return {t for t in get_targets(deps) if t[0] in "xwy"}
+
+# %%
+# x[i] = ...; x[i] must alias, the initial value of x is not reaching
+check("x[i] after x[i]", get_array_deps("a"), {"x[i]"})
+# x[i-1] is written in the previous iteration or is the initial value of x
+check("x[i-1] after x[i]", get_array_deps("b"), {"x", "x[i]"})
+# j is unknown
+check("x[j] after x[i]", get_array_deps("c"), {"x", "x[i]"})
+# even and odd indices
+check("w[2*i+1] after w[2*i]", get_array_deps("g"), {"w"})
+
+# %%
+# nested range loops
+check("y[k, l] after y[k, l]", get_array_deps("d"), {"y[k, l]"})
+check("y[k, l-1] after y[k, l]", get_array_deps("e"), {"y", "y[k, l]"})
+# written in a previous iteration of the outer loop
+check("y[k-1, l] after y[k, l]", get_array_deps("f"), {"y", "y[k, l]"})
+
+# %%
+# random variables which depend on their value in the previous iteration of a loop
+# are self-loops in the model graph (instead of a chain z_0 -> z_1 -> z_2 of unrolled loops)
+
+source = """
+def model(T):
+    z = 0.
+    for t in range(T):
+        z = pyro.sample(f"z_{t}", dist.Normal(z, 1.))
+        x = pyro.sample(f"x_{t}", dist.Normal(z, 1.))
+
+def guide(T):
+    pass
+"""
+
+ir = get_IR_for_pyro_source(source)
+_, edges = get_graph(ir)
+check("self-loop", {(str(x.get_target()), str(y.get_target())) for x, y in edges}, {("z", "z"), ("z", "x")})
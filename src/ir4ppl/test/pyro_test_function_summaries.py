@@ -0,0 +1,71 @@
+# %%
+import sys
+sys.path.append("src/ir4ppl")
+sys.path.append("src/ir4ppl/test")
+from pyro_programs import get_IR_for_pyro_source, get_sample_node, get_targets, check
+from ir4ppl.ir import *
+from ir4ppl.pdg import get_pdg
+
+# summaries of mutually recursive functions are computed by iterating over their strongly connected component,
+# summaries of functions used in return statements are applied to the return value of the caller
+
+source = """
+def even(n, x):
+    if n == 0:
+        return x
+    return odd(n - 1, x)
+
+def odd(n, y):
+    u = pyro.sample("u", dist.Normal(0., 1.))
+    if n == 0:
+        return y
+    return even(n - 1, y + u)
+
+def helper(z):
+    return z * 2
+
+def scale(w):
+    return helper(w) + 1
+
+def model():
+    a = pyro.sample("a", dist.Normal(0., 1.))
+    n = pyro.sample("n", dist.Poisson(3.))
+    b = pyro.sample("b", dist.Normal(even(n, a), 1.))
+    c = pyro.sample("c", dist.Normal(0., 1.))
+    d = pyro.sample("d", dist.Normal(scale(c), 1.))
+
+def guide():
+    pass
+"""
+
+ir = get_IR_for_pyro_source(source)
+fdefs = {fdef.name: fdef for fdef in ir.cfgs.keys()}
+
+def qualified(nodes) -> set[str]:
+    # function.target for assign nodes, function for branch nodes
+    result = set()
+    for node in nodes:
+        fdef, _ = ir.get_cfg_for_node(node)
+        result.add(f"{fdef.name}.{node.get_target()}" if isinstance(node, AbstractAssignNode) else fdef.name)
+    return result
+
+# %%
+even = ir.get_function_summary(fdefs["even"])
+odd = ir.get_function_summary(fdefs["odd"])
+check("recursive data deps", qualified(even.return_data_deps), {"even.n", "even.x", "odd.n", "odd.y", "odd.u"})
+check("recursive control deps", qualified(even.return_control_deps), {"even", "odd"})
+check("recursive sample nodes", qualified(even.sample_nodes), {"odd.u"})
+check("same summary in component", (odd.return_data_deps, odd.return_control_deps, odd.sample_nodes), (even.return_data_deps, even.return_control_deps, even.sample_nodes))
+check("recursive param deps", qualified(even.get_param_deps()), {"even.n", "even.x", "odd.n", "odd.y"})
+
+# %%
+check("helper data deps", qualified(ir.get_function_summary(fdefs["helper"]).return_data_deps), {"helper.z"})
+check("return callee data deps", qualified(ir.get_function_summary(fdefs["scale"]).return_data_deps), {"helper.z", "scale.w"})
+check("model sample nodes", qualified(ir.get_function_summary(fdefs["model"]).sample_nodes), {"model.a", "model.n", "model.b", "model.c", "model.d", "odd.u"})
+
+# %%
+# summaries are applied at call sites, parameters are resolved to the arguments of the calls
+pdg = get_pdg(ir)
+check("random ancestors b", get_targets(pdg.get_random_ancestors(get_sample_node(ir, "b"))), {"a", "n", "u"})
+check("random control deps b", get_targets(pdg.get_random_control_dependencies(get_sample_node(ir, "b"))), {"n"})
+check("random ancestors d", get_targets(pdg.get_random_ancestors(get_sample_node(ir, "d"))), {"c"})
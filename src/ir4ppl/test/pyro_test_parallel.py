@@ -0,0 +1,56 @@
+# %%
+import sys
+sys.path.append("src/ir4ppl")
+from pyro.pyro_cfg import *
+from utils.bcolors import bcolors
+import ir4ppl.parallel as parallel
+from ir4ppl.parallel import map_nodes
+from ir4ppl.pdg import get_dependency_edges
+from analysis.funnel_detection import get_funnel_warnings_for_node
+from analysis.constraint_verification import verify_constraints
+from analysis.model_graph import get_graph
+import os
+
+# map_nodes returns the same results in the order of the nodes for sequential execution, threads and processes
+
+# start workers also for small programs
+parallel.MIN_JOBS_PER_WORKER = 1
+
+CONFIGS = [(1, "thread"), (4, "thread"), (4, "process")]
+
+def get_checker_results(ir: PPL_IR):
+    _, edges = get_graph(ir)
+    # the program dependence graph is built sequentially, its queries stay in the analyses of the IR
+    n_queries = (len(ir.analyses.get("rd")), len(ir.analyses.get("cdg")))
+    try:
+        violations, _ = verify_constraints(ir)
+        constraints = [(v.node.id, v.param_name, str(v.estimated_range)) for v in violations]
+    except Exception as e:
+        constraints = repr(e) # unsupported expressions
+    return [(x.id, y.id) for x, y in edges], n_queries, constraints
+
+folder = "evaluation/pyro"
+
+for root, dir, files in os.walk(folder):
+    for file in sorted(files):
+        if file.endswith(".py"):
+            filename = root + "/" + file
+            ir = get_IR_for_pyro(filename)
+            nodes = [node for cfg in ir.cfgs.values() for node in cfg.nodes]
+            random_stmts = ir.get_sample_nodes() + ir.get_factor_nodes()
+
+            edges = [map_nodes(get_dependency_edges, ir, nodes, n_workers, executor) for n_workers, executor in CONFIGS]
+            funnels = [map_nodes(get_funnel_warnings_for_node, ir, random_stmts, n_workers, executor) for n_workers, executor in CONFIGS]
+            assert edges[0] == [get_dependency_edges(ir, node) for node in nodes]
+            assert all(e == edges[0] for e in edges)
+            assert all(f == funnels[0] for f in funnels)
+
+            # checkers without cached analyses
+            checker_results = []
+            for n_workers, executor in CONFIGS:
+                ir.analyses.invalidate()
+                parallel.set_workers(n_workers, executor)
+                checker_results.append(get_checker_results(ir))
+            assert all(r == checker_results[0] for r in checker_results)
+
+            print(bcolors.OKGREEN, "OK ", bcolors.ENDC, filename, f" ({len(nodes)} nodes)", sep="")
@@ -0,0 +1,70 @@
+# %%
+import sys
+sys.path.append("src/ir4ppl")
+sys.path.append("src/ir4ppl/test")
+from pyro_programs import get_IR_for_pyro_source, get_sample_node, get_targets, check
+from ir4ppl.ir import *
+from ir4ppl.pdg import get_pdg
+
+# random ancestors and random control dependencies are propagated over the strongly connected components of the PDG,
+# u and v depend on each other in the loop (cyclic component), the branch depends on them
+
+source = """
+def model(T):
+    s = pyro.sample("s", dist.Normal(0., 1.))
+    z = 0.
+    v = 0.
+    for t in range(T):
+        z = pyro.sample(f"z_{t}", dist.Normal(z, 1.))
+        u = v + z
+        v = u * 2
+        if u > s:
+            x = pyro.sample(f"x_{t}", dist.Normal(0., 1.))
+        else:
+            x = 0.
+        w = pyro.sample(f"w_{t}", dist.Normal(x, 1.))
+    y = pyro.sample("y", dist.Normal(v, 1.))
+
+def guide(T):
+    pass
+"""
+
+ir = get_IR_for_pyro_source(source)
+pdg = get_pdg(ir)
+
+# %%
+def random_ancestors(target: str) -> set[str]:
+    return get_targets(pdg.get_random_ancestors(get_sample_node(ir, target)))
+
+def random_control_deps(target: str) -> set[str]:
+    return get_targets(pdg.get_random_control_dependencies(get_sample_node(ir, target)))
+
+check("random ancestors s", random_ancestors("s"), set())
+# value of the previous iteration
+check("random ancestors z", random_ancestors("z"), {"z"})
+# through the branch u > s
+check("random ancestors x", random_ancestors("x"), {"s", "z"})
+check("random ancestors w", random_ancestors("w"), {"s", "x", "z"})
+# through the cyclic component {u, v}
+check("random ancestors y", random_ancestors("y"), {"z"})
+
+check("random control deps s", random_control_deps("s"), set())
+check("random control deps z", random_control_deps("z"), set())
+check("random control deps x", random_control_deps("x"), {"s", "z"})
+# x = 0. is control dependent on the branch
+check("random control deps w", random_control_deps("w"), {"s", "z"})
+check("random control deps y", random_control_deps("y"), set())
+
+# %%
+pdg_json = pdg.to_json()
+check("json nodes", [node["cfgnode"] for node in pdg_json["nodes"]], [node.id for node in pdg.vertices])
+json_edges = [(pdg_json["nodes"][edge["source"]]["cfgnode"], pdg_json["nodes"][edge["target"]]["cfgnode"], edge["kind"], edge["role"]) for edge in pdg_json["edges"]]
+pdg_edges = [(edge.source.id, edge.target.id, edge.kind, edge.role) for node in pdg.vertices for edge in pdg.get_dependencies(node)]
+check("json edges", json_edges, pdg_edges)
+z = get_sample_node(ir, "z")
+check("json self-loop", (z.id, z.id, "data", "distribution") in json_edges, True)
+
+dot = pdg.to_dot()
+check("dot nodes", sum(1 for line in dot.splitlines() if "[label=" in line and "->" not in line), len(pdg.vertices))
+check("dot control edges", sum(1 for line in dot.splitlines() if "->" in line and "style=dashed" in line), sum(1 for edge in json_edges if edge[2] == "control"))
+check("dot data edges", sum(1 for line in dot.splitlines() if "->" in line and "style=solid" in line), sum(1 for edge in json_edges if edge[2] == "data"))
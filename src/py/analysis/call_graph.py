@@ -1,8 +1,8 @@
 import ast
-from typing import Any
+from typing import Any, Optional
 from ast_utils.node_finder import NodeFinder
 from ast_utils.node_finders import get_user_defined_functions
-from ast_utils.utils import get_call_name
+from ast_utils.symbol_table import get_symbol_id
 
 class CallFinder(ast.NodeVisitor):
     def __init__(self) -> None:
@@ -14,68 +14,82 @@ class CallFinder(ast.NodeVisitor):
         # don't visit nested functions
         pass
 
-def get_called_functions(functions, scope_info, node: ast.AST):
+def get_function_index(functions) -> dict[int,ast.FunctionDef]:
+    # symbol_id -> function definition
+    # same symbol <=> same name and scope, the first definition wins (as in the linear search before)
+    index = dict()
+    for function in functions:
+        symbol_id = get_symbol_id(function)
+        if symbol_id is not None:
+            index.setdefault(symbol_id, function)
+    return index
+
+def _get_called_functions(function_index: dict[int,ast.FunctionDef], node: ast.AST):
     call_finder = CallFinder()
     if isinstance(node, ast.FunctionDef):
         call_finder.visit(node.body)
     else:
         call_finder.visit(node)
 
-    
     # get function definitions for all calls
     called_functions = []
     for call in call_finder.calls:
-        call_name = get_call_name(call)
-        for function in functions:
-            # same name and scope
-            if call_name == function.name and scope_info[call.func] == scope_info[function]:
-                called_functions.append(function)
-                break
+        call_symbol_id = get_symbol_id(call.func)
+        if call_symbol_id is None:
+            continue
+        if call_symbol_id in function_index:
+            called_functions.append(function_index[call_symbol_id])
 
     return called_functions
 
-class CallGraphAnalyzer(ast.NodeVisitor):
-    def __init__(self, functions, scope_info):
-        self.functions = functions
-        self.scope_info = scope_info
-        self.call_graph = {}
+def get_called_functions(functions, node: ast.AST):
+    return _get_called_functions(get_function_index(functions), node)
 
-    def visit_FunctionDef(self, node: ast.FunctionDef):
-        
-        self.call_graph[node] = get_called_functions(self.functions, self.scope_info, node)
-        
-        self.generic_visit(node)
+class CallGraph:
+    # Call graph of the entire syntax tree (file), built once.
+    # Calls are resolved to user-defined functions by their symbol_id (name and scope).
+    # The subgraphs reachable from a node are cached, such that repeated queries (get_call_graph RPC) are lookups.
+    def __init__(self, syntax_tree: ast.AST) -> None:
+        self.functions = get_user_defined_functions(syntax_tree)
+        self.function_index = get_function_index(self.functions)
+        self.call_graph = {function: _get_called_functions(self.function_index, function) for function in self.functions}
+        self._subgraphs = dict() # node -> reachable subgraph
+        self.cache_lookups = [0, 0] # hits, misses
+
+    def get_subgraph(self, node: Optional[ast.AST]) -> dict[ast.AST,list[ast.FunctionDef]]:
+        if node is None:
+            # complete call graph
+            return dict(self.call_graph)
+
+        self.cache_lookups[0 if node in self._subgraphs else 1] += 1
+        if node not in self._subgraphs:
+            # get subset called by node
+            call_subgraph = {}
+
+            called_functions = _get_called_functions(self.function_index, node)
+            call_subgraph[node] = called_functions.copy()
+
+            # traverse complete call graph starting from node to get only functions that are reachable from node
+            processed = set()
+            to_process = called_functions
+            while len(to_process) > 0:
+                called = to_process.pop()
+                call_subgraph[called] = self.call_graph[called]
+                processed.add(called)
 
-        
-    
+                for sub_call in self.call_graph[called]:
+                    if sub_call not in processed and sub_call not in to_process:
+                        to_process.append(sub_call)
+
+            self._subgraphs[node] = call_subgraph
+
+        return dict(self._subgraphs[node])
+
+    def get_cache_stats(self) -> dict[str,float]:
+        hits, misses = self.cache_lookups
+        return {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses) if hits + misses > 0 else 0.}
+
+
+# scope_info is not needed anymore, identifiers are resolved by their symbol_id
 def compute_call_graph(syntax_tree: ast.AST, scope_info, node: ast.AST):
-    functions = get_user_defined_functions(syntax_tree)
-    
-    cga = CallGraphAnalyzer(functions, scope_info)
-    cga.visit(syntax_tree) # for the entire syntax_tree (file)
-
-
-    if node is not None:
-        # get subset called by node
-        call_subgraph = {}
-
-        called_functions = get_called_functions(functions, scope_info, node)
-        call_subgraph[node] = called_functions.copy()
-        
-        # traverse complete call graph starting from node to get only functions that are reachable from node
-        processed = set()
-        to_process = called_functions
-        while len(to_process) > 0:
-            called = to_process.pop()
-            call_subgraph[called] = cga.call_graph[called]
-            processed.add(called)
-
-            for sub_call in cga.call_graph[called]:
-                if sub_call not in processed and sub_call not in to_process:
-                    to_process.append(sub_call)
-
-        return call_subgraph
-    else:
-        # return complete call graph
-        return cga.call_graph
-        
\ No newline at end of file
+    return CallGraph(syntax_tree).get_subgraph(node)
@@ -1,9 +1,9 @@
 import math
 import ast
-from ast_utils.node_finder import NodeFinder
 from ast_utils.utils import get_assignment_name, get_name, get_call_name
 from ast_utils.scoped_tree import ScopedTree, FunctionDefinition, NameFinder, is_referenced_identifier
 from ast_utils.cfg import *
+from ast_utils.call_context import Context, EMPTY_CONTEXT, get_enclosing_function
 from copy import copy
 from typing import Tuple, Optional
 
@@ -130,12 +130,7 @@ def get_identifiers_read_in_syntaxnode(scoped_tree: ScopedTree, node: ast.AST):
 
 def find_call_sites_for_function(scoped_tree: ScopedTree, func_syntaxnode: ast.AST):
     assert isinstance(func_syntaxnode, ast.FunctionDef)
-    call_finder = NodeFinder(
-        lambda node: isinstance(node, ast.Call) and scoped_tree.identifieres_are_the_same(node.func, func_syntaxnode),
-        lambda node: node
-    )
-    call_finder.visit(scoped_tree.root_node)
-    return call_finder.result
+    return scoped_tree.get_call_sites(func_syntaxnode)
 
 def get_function_for_parameter(param_node: ast.arg):
      assert isinstance(param_node, ast.arg)
@@ -160,115 +155,128 @@ def get_matching_call_arg(param_node: ast.arg, call_site: ast.Call, func: ast.Fu
     else:
         return None # has to have default argument
 
-def get_all_exprs_passed_to_function_at_param(scoped_tree: ScopedTree, param_node: ast.arg):
-    exprs = []
-    func_syntaxnode = get_function_for_parameter(param_node)
-    # in a pre-processing step we could duplicate the function for each of its calls
-    # to make the following more precise, i.e. only <=1 call site per function
-    call_sites = find_call_sites_for_function(scoped_tree, func_syntaxnode)
-    for call_site in call_sites:
-        matching_call_arg = get_matching_call_arg(param_node, call_site, func_syntaxnode)
-        if matching_call_arg is not None:
-            exprs.append(matching_call_arg)
-    return exprs
-
-
-def get_all_exprs_passed_to_function(scoped_tree: ScopedTree, func_syntaxnode: ast.AST):
-    exprs =[]
-    call_sites = find_call_sites_for_function(scoped_tree, func_syntaxnode)
-    for call_site in call_sites:
-        for call_arg in call_site.args + call_site.keywords:
-            exprs.append(call_arg)
-    return exprs
+# data and control dependencies are computed context-sensitively (see ast_utils/call_context.py)
+# the *_in_context functions return sets of (syntaxnode, context) pairs,
+# where the context of a FunctionDef, its arguments and parameters is the context of the function body
 
-def data_deps_for_node(scoped_tree: ScopedTree, syntaxnode: ast.AST):
+def get_context_function(syntaxnode: ast.AST) -> Optional[ast.FunctionDef]:
+    if isinstance(syntaxnode, ast.FunctionDef):
+        return syntaxnode
+    return get_enclosing_function(syntaxnode)
+
+def _expand_contexts(scoped_tree: ScopedTree, deps: set[tuple[ast.AST, Context]]):
+    # replace truncated or unknown contexts with all matching contexts
+    call_contexts = scoped_tree.get_call_contexts()
+    return {(node, c) for node, ctx in deps for c in call_contexts.expand_context(get_context_function(node), ctx)}
+
+def data_deps_for_node_in_context(scoped_tree: ScopedTree, syntaxnode: ast.AST, ctx: Context):
+    call_contexts = scoped_tree.get_call_contexts()
     if isinstance(syntaxnode, ast.FunctionDef):
         # union over data dependencies of all return statements
         cfg = scoped_tree.get_cfg_for_function_syntaxnode(syntaxnode)
         data_deps = set()
         for cfgnode in cfg.nodes:
             if isinstance(cfgnode, ReturnNode):
-                data_deps = data_deps | _data_deps_for_node(scoped_tree, cfgnode, get_return_expr(cfgnode))
-        return data_deps
+                data_deps = data_deps | _data_deps_for_node(scoped_tree, cfgnode, get_return_expr(cfgnode), ctx)
     
     elif isinstance(syntaxnode, ast.arg):
-        # union of expression corresponding to parameter in all calls
+        # union of expression corresponding to parameter in all calls of context
         data_deps = set()
-        # return data_deps
-        for expr in get_all_exprs_passed_to_function_at_param(scoped_tree, syntaxnode):
-            _, cfgnode = scoped_tree.get_cfgnode_for_syntaxnode(expr)
-            data_deps = data_deps | _data_deps_for_node(scoped_tree, cfgnode, expr)
-        return data_deps
+        func_syntaxnode = get_function_for_parameter(syntaxnode)
+        for call_site, caller_ctx in call_contexts.get_call_sites_in_context(func_syntaxnode, ctx):
+            expr = get_matching_call_arg(syntaxnode, call_site, func_syntaxnode)
+            if expr is not None:
+                _, cfgnode = scoped_tree.get_cfgnode_for_syntaxnode(expr)
+                data_deps = data_deps | _data_deps_for_node(scoped_tree, cfgnode, expr, caller_ctx)
     
     elif isinstance(syntaxnode, ast.arguments):
-        # union of expression corresponding to ALL parameters in all calls
+        # union of expression corresponding to ALL parameters in all calls of context
         data_deps = set()
-        # return data_deps
         func_syntaxnode = syntaxnode.parent
-        for expr in get_all_exprs_passed_to_function(scoped_tree, func_syntaxnode):
-            _, cfgnode = scoped_tree.get_cfgnode_for_syntaxnode(expr)
-            data_deps = data_deps | _data_deps_for_node(scoped_tree, cfgnode, expr)
-        return data_deps
+        for call_site, caller_ctx in call_contexts.get_call_sites_in_context(func_syntaxnode, ctx):
+            for expr in call_site.args + call_site.keywords:
+                _, cfgnode = scoped_tree.get_cfgnode_for_syntaxnode(expr)
+                data_deps = data_deps | _data_deps_for_node(scoped_tree, cfgnode, expr, caller_ctx)
 
     else:
         _, cfgnode = scoped_tree.get_cfgnode_for_syntaxnode(syntaxnode)
-        return _data_deps_for_node(scoped_tree, cfgnode, syntaxnode)
+        data_deps = _data_deps_for_node(scoped_tree, cfgnode, syntaxnode, ctx)
+
+    return _expand_contexts(scoped_tree, data_deps)
+
+def data_deps_for_node(scoped_tree: ScopedTree, syntaxnode: ast.AST):
+    # context-insensitive, union over all contexts
+    return {node for node, _ in data_deps_for_node_in_context(scoped_tree, syntaxnode, EMPTY_CONTEXT)}
 
 def maybe_get_user_function(scoped_tree: ScopedTree, identifier) -> Tuple[bool, Optional[FunctionDefinition]]:
-    for function in scoped_tree.all_functions:
-        if scoped_tree.identifieres_are_the_same(identifier, function.node):
-            return True, function
-    return False, None
+    function = scoped_tree.get_user_function(identifier)
+    return function is not None, function
 
-def _data_deps_for_node(scoped_tree: ScopedTree, cfgnode: CFGNode, syntaxnode: ast.AST):
+def _data_deps_for_node(scoped_tree: ScopedTree, cfgnode: CFGNode, syntaxnode: ast.AST, ctx: Context = EMPTY_CONTEXT):
     identifiers = get_identifiers_read_in_syntaxnode(scoped_tree, syntaxnode)
 
     data_deps = set()
     for identifier in identifiers:
         is_function, function = maybe_get_user_function(scoped_tree, identifier)
         if is_function:
-            data_deps.add(function.node)
+            call = identifier.parent
+            if isinstance(call, ast.Call) and call.func == identifier:
+                callee_ctx = scoped_tree.get_call_contexts().push_context(ctx, call)
+            else:
+                callee_ctx = EMPTY_CONTEXT # function is not called here, any context
+            data_deps.add((function.node, callee_ctx))
         else:
             rds = get_RDs(scoped_tree, cfgnode, identifier)
             for rd in rds:
-                data_deps.add(rd.syntaxnode)
+                data_deps.add((rd.syntaxnode, ctx))
 
     return data_deps
 
-def control_parents_for_node(scoped_tree: ScopedTree, syntaxnode: ast.AST):
+def control_parents_for_node_in_context(scoped_tree: ScopedTree, syntaxnode: ast.AST, ctx: Context):
     if isinstance(syntaxnode, ast.FunctionDef):
         cfg = scoped_tree.get_cfg_for_function_syntaxnode(syntaxnode)
         cfgnode = list(cfg.endnode.parents)[0] # function join node
-        return _control_parents_for_node(scoped_tree, cfg, cfgnode)
+        control_parents = {(node, ctx) for node in _control_parents_for_node(scoped_tree, cfg, cfgnode)}
     
     elif isinstance(syntaxnode, ast.arg) or isinstance(syntaxnode, ast.arguments):
         control_parents = set()
-        # return set()
         func_syntaxnode = syntaxnode.parent if isinstance(syntaxnode, ast.arguments) else get_function_for_parameter(syntaxnode)
-        call_sites = find_call_sites_for_function(scoped_tree, func_syntaxnode)
-        for call_site in call_sites:
-            control_parents = control_parents | control_parents_for_node(scoped_tree, call_site)
-        return control_parents
+        call_contexts = scoped_tree.get_call_contexts()
+        for call_site, caller_ctx in call_contexts.get_call_sites_in_context(func_syntaxnode, ctx):
+            control_parents = control_parents | control_parents_for_node_in_context(scoped_tree, call_site, caller_ctx)
 
     else:
         cfg, cfgnode = scoped_tree.get_cfgnode_for_syntaxnode(syntaxnode)
-        return _control_parents_for_node(scoped_tree, cfg, cfgnode)
+        control_parents = {(node, ctx) for node in _control_parents_for_node(scoped_tree, cfg, cfgnode)}
+
+    return _expand_contexts(scoped_tree, control_parents)
+
+def control_parents_for_node(scoped_tree: ScopedTree, syntaxnode: ast.AST):
+    # context-insensitive, union over all contexts
+    return {node for node, _ in control_parents_for_node_in_context(scoped_tree, syntaxnode, EMPTY_CONTEXT)}
 
 def _control_parents_for_node(scoped_tree: ScopedTree, cfg: CFG, cfgnode: CFGNode):
     assert cfgnode in cfg.nodes
     bps = get_BPs(scoped_tree, cfgnode)
 
     if isinstance(cfg.startnode, FuncStartNode):
-        for branch_node in cfg.nodes:
-            if not isinstance(branch_node, BranchNode):
-                continue
-            if is_on_path_between_nodes(cfgnode, branch_node, cfg.endnode):
-                cfgnode.block()
-                branch_node.join_node.block()
-                if is_reachable(branch_node, cfg.endnode):
-                    bps.add(branch_node)
-                branch_node.join_node.unblock()
-                cfgnode.unblock()
+        compact = cfg.get_compact()
+        node_ix = compact.index[cfgnode]
+        end_ix = compact.index[cfg.endnode]
+        reaches_node = compact.reach([node_ix], forward=False)
+        reached_from_node = compact.reach([node_ix])
+        # cfgnode can only reach itself if it lies on a cycle
+        reaches_node[node_ix] = any(reached_from_node[i] for i in compact.predecessors(node_ix))
+        if reached_from_node[end_ix]:
+            for branch_node in cfg.nodes:
+                if not isinstance(branch_node, BranchNode):
+                    continue
+                branch_ix = compact.index[branch_node]
+                if reaches_node[branch_ix]: # cfgnode is on path between branch_node and endnode
+                    # branch_node can reach endnode without passing cfgnode or its join node (e.g. by returning early)
+                    excluded = compact.mask([cfgnode, branch_node.join_node])
+                    if compact.reach([branch_ix], excluded=excluded)[end_ix]:
+                        bps.add(branch_node)
 
     return {bp.syntaxnode.parent for bp in bps}
 
@@ -1,7 +1,7 @@
 import math
 import typing
 from collections import deque
-from ast_utils.utils import get_call_name
+from ast_utils.utils import get_call_name, ConstantArray
 from ast_utils.scoped_tree import ScopedTree, Assignment, FunctionDefinition
 from analysis.data_control_flow import *
 from copy import copy
@@ -158,7 +158,7 @@ class StaticIntervalEvaluator(ast.NodeVisitor):
         self.valuation = valuation
 
     def visit(self, node: ast.AST) -> Interval:
-        if isinstance(node, (ast.Constant, ast.List, ast.Name, ast.Subscript, ast.UnaryOp, ast.BinOp, ast.Call, ast.Attribute, ast.Return)):
+        if isinstance(node, (ast.Constant, ast.List, ConstantArray, ast.Name, ast.Subscript, ast.UnaryOp, ast.BinOp, ast.Call, ast.Attribute, ast.Return)):
             return super().visit(node)
         if isinstance(node, ast.Expr):
             return self.visit(node.value)
@@ -176,6 +176,10 @@ class StaticIntervalEvaluator(ast.NodeVisitor):
             # one interval for all elements
             return reduce(union, [self.visit(arg) for arg in node.elts])
     
+    def visit_ConstantArray(self, node: ConstantArray) -> Interval:
+        # value range was computed in preprocessing
+        return Interval(node.low, node.high)
+
     def visit_Name(self, node: ast.Name) -> Interval:
         if node.id in self.valuation:
             # return current interval valuation for identifier
@@ -221,7 +225,7 @@ class StaticIntervalEvaluator(ast.NodeVisitor):
 
             # # evaluate interval operation
             return func(*values)
-        elif call_name == 'array' and isinstance(node.args[0], ast.List):
+        elif call_name == 'array' and isinstance(node.args[0], (ast.List, ConstantArray)):
             # np array literal
             list = node.args[0]
             return self.visit(list)
@@ -1,6 +1,6 @@
 import ast
 import typing
-from ast_utils.utils import get_call_name, Block
+from ast_utils.utils import get_call_name, Block, ConstantArray
 import copy
 
 class SymbolicExpression:
@@ -184,7 +184,7 @@ class SymbolicEvaluator(ast.NodeVisitor):
             return self.node_to_symbol[node]
         
         if isinstance(node, (ast.FunctionDef, ast.If, ast.With, Block, ast.Assign, ast.Constant, ast.Name,
-                             ast.UnaryOp, ast.BinOp, ast.BoolOp, ast.Compare, ast.Call, ast.List)):
+                             ast.UnaryOp, ast.BinOp, ast.BoolOp, ast.Compare, ast.Call, ast.List, ConstantArray)):
             return super().visit(node)
         if isinstance(node, ast.Expr):
             return self.visit(node.value)
@@ -260,6 +260,10 @@ class SymbolicEvaluator(ast.NodeVisitor):
         values = [self.visit(arg) for arg in node.elts]
         return Operation("List", *values)
 
+    def visit_ConstantArray(self, node: ConstantArray):
+        # elements are not known anymore, only their range
+        return Operation("ConstantArray", Constant(node.low), Constant(node.high))
+
 # We will collect multiple path conditions that can be combined by following rule
 # (A and B and ...) or (!A and B and ...) => B and ...
 def combine_paths(paths):
@@ -0,0 +1,105 @@
+import ast
+from typing import Optional
+
+# Call-string (k-CFA) contexts.
+# Instead of copying a function for each of its call sites (CallUniquifier),
+# there is one CFG per function and call sites are told apart by the context in which a node is analysed.
+# A context is the tuple of the last K_CFA ast.Call nodes on the call path from toplevel (innermost call last).
+# Contexts of length K_CFA are truncated, i.e. they stand for all call paths ending with these calls.
+#
+# def foo(x):
+#     return x
+# foo(y) # call_1
+# foo(z) # call_2
+# ->
+# contexts of foo: (call_1,), (call_2,)
+# data dependencies of x in context (call_1,) are data dependencies of y only.
+#
+# Entry functions (e.g. model and guide, which are called by the inference engine) only have the empty context,
+# calls to them in the program (e.g. in a training loop) do not give them a context.
+
+K_CFA = 3
+
+Context = tuple # tuple[ast.Call, ...]
+EMPTY_CONTEXT: Context = ()
+
+def push_context(ctx: Context, call: ast.Call, k: int = K_CFA) -> Context:
+    if k == 0:
+        return EMPTY_CONTEXT
+    return (ctx + (call,))[-k:]
+
+def get_enclosing_function(node: ast.AST) -> Optional[ast.FunctionDef]:
+    # None for toplevel
+    scope_node = node.parent
+    while scope_node is not None and not isinstance(scope_node, ast.FunctionDef):
+        scope_node = scope_node.parent
+    return scope_node
+
+class CallContexts:
+    def __init__(self, scoped_tree, k: int = K_CFA, entry_functions: list[ast.FunctionDef] = []) -> None:
+        self.scoped_tree = scoped_tree
+        self.k = k # k = 0 is context-insensitive
+        self.entry_functions = set(entry_functions)
+        # function (None for toplevel) -> list of (call, callee)
+        self.calls_in_function: dict[Optional[ast.FunctionDef], list[tuple[ast.Call, ast.FunctionDef]]] = {None: []}
+        for function in scoped_tree.all_functions:
+            self.calls_in_function[function.node] = []
+        for function in scoped_tree.all_functions:
+            if function.node in self.entry_functions:
+                continue
+            for call in scoped_tree.get_call_sites(function.node):
+                self.calls_in_function[get_enclosing_function(call)].append((call, function.node))
+
+        self.contexts: dict[Optional[ast.FunctionDef], set[Context]] = {f: set() for f in self.calls_in_function}
+        self._compute_contexts()
+
+    def _propagate(self, worklist: list[Optional[ast.FunctionDef]]):
+        while len(worklist) > 0:
+            caller = worklist.pop()
+            for call, callee in self.calls_in_function[caller]:
+                new_contexts = {push_context(ctx, call, self.k) for ctx in self.contexts[caller]} - self.contexts[callee]
+                if len(new_contexts) > 0:
+                    self.contexts[callee].update(new_contexts)
+                    worklist.append(callee)
+
+    def _compute_contexts(self):
+        # entry points are toplevel and functions without call sites (e.g. model and guide)
+        worklist = []
+        for function in self.contexts:
+            if function is None or function in self.entry_functions or len(self.scoped_tree.get_call_sites(function)) == 0:
+                self.contexts[function].add(EMPTY_CONTEXT)
+                worklist.append(function)
+        self._propagate(worklist)
+        # functions which are only called in (mutually) recursive functions without entry
+        for function, contexts in self.contexts.items():
+            if len(contexts) == 0:
+                contexts.add(EMPTY_CONTEXT)
+                self._propagate([function])
+
+    def get_contexts(self, function: Optional[ast.FunctionDef]) -> list[Context]:
+        return sorted(self.contexts[function], key=lambda ctx: (len(ctx), [call.position for call in ctx]))
+
+    def expand_context(self, function: Optional[ast.FunctionDef], ctx: Context) -> list[Context]:
+        # all contexts of function which are described by ctx
+        # ctx may be truncated (or empty if unknown), then it matches all contexts ending with ctx
+        if ctx in self.contexts[function]:
+            return [ctx]
+        return [c for c in self.get_contexts(function) if len(c) >= len(ctx) and c[len(c)-len(ctx):] == ctx]
+
+    def push_context(self, ctx: Context, call: ast.Call) -> Context:
+        return push_context(ctx, call, self.k)
+
+    def get_call_sites_in_context(self, function: ast.FunctionDef, ctx: Context) -> list[tuple[ast.Call, Context]]:
+        # call sites of function together with the context of the caller
+        if len(ctx) > 0:
+            call_sites = [ctx[-1]]
+            caller_ctx = ctx[:-1]
+        else:
+            call_sites = self.scoped_tree.get_call_sites(function)
+            caller_ctx = EMPTY_CONTEXT
+        result = []
+        for call in call_sites:
+            caller = get_enclosing_function(call)
+            for c in self.expand_context(caller, caller_ctx):
+                result.append((call, c))
+        return result
@@ -1,6 +1,5 @@
 import ast
-import ast_scope
-from copy import deepcopy
+from ast_utils.symbol_table import SymbolTable, get_symbol_id
 from ast_utils.node_finder import NodeFinder
 
 # def foo(x):
@@ -21,28 +20,21 @@ from ast_utils.node_finder import NodeFinder
 # TODO:
 # check if we need to do this recursively (calls of user-def functions in body of user-def functions)
 
-def CallFinder(func_syntaxnode: ast.FunctionDef, call_unquifier):
+def CallFinder(func_syntaxnode: ast.FunctionDef):
     assert isinstance(func_syntaxnode, ast.FunctionDef)
-    if func_syntaxnode not in call_unquifier.scope_info:
-        # if we deepcopy a function foo which defines a nested function,
-        # we have to find scope for the nested function (deepcopied foo)
-        call_unquifier.scope_info = ast_scope.annotate(call_unquifier.root_node)
-
-    scope_info = call_unquifier.scope_info
     return NodeFinder(
         lambda node: (isinstance(node, ast.Call) and
                       isinstance(node.func, ast.Name) and
-                      node.func.id == func_syntaxnode.name and
-                      node.func in scope_info and
-                      scope_info[node.func] == scope_info[func_syntaxnode]),
+                      get_symbol_id(node.func) is not None and
+                      get_symbol_id(node.func) == get_symbol_id(func_syntaxnode)),
         lambda node: node
     )
 
 class CallUniquifier(ast.NodeVisitor):
-    def __init__(self, root_node, scope_info) -> None:
+    def __init__(self, root_node, symbol_table: SymbolTable) -> None:
         self.root_node = root_node
-        self.scope_info = scope_info
-        # scope_info must be updated after transforming ast
+        # copied functions get fresh symbols, so we do not have to re-annotate scopes after transforming ast
+        self.symbol_table = symbol_table
 
     def visit(self, node: ast.AST):
         if hasattr(node, "body") and isinstance(node.body, list):
@@ -51,14 +43,17 @@ class CallUniquifier(ast.NodeVisitor):
                 new_body.append(stmt)
                 match stmt:
                     case ast.FunctionDef(name=_name):
-                        call_finder = CallFinder(stmt, self)
+                        call_finder = CallFinder(stmt)
                         calls = call_finder.visit(self.root_node)
                         if len(calls) > 1:
+                            scope_node = self.symbol_table[stmt.symbol_id].scope_node
                             for i, call in enumerate(calls):
                                 new_name = f"{_name}_{i}"
-                                call.func.id = new_name
-                                new_func = deepcopy(stmt)
+                                new_func = self.symbol_table.copy_function(stmt)
                                 new_func.name = new_name
+                                new_func.symbol_id = self.symbol_table.new_symbol(new_name, scope_node)
+                                call.func.id = new_name
+                                call.func.symbol_id = new_func.symbol_id
                                 new_body.append(new_func)
             node.body = new_body
 
@@ -1,39 +1,40 @@
 import ast
-from ast_utils.utils import Block
+from ast_utils.utils import Block, ConstantArray
+from typing import Set,Dict,Optional,Sequence
 
+# CFG nodes use __slots__ to keep large (unrolled) CFGs small,
+# subclasses have to declare __slots__ for their attributes as well.
 class CFGNode:
+    __slots__ = ("id", "syntaxnode", "parents", "children")
     def __init__(self, id: str, syntaxnode: ast.AST) -> None:
         self.id = id
         self.syntaxnode = syntaxnode
         self.parents = set()
         self.children = set()
-        self.is_blocked = False
-    def block(self):
-        self.is_blocked = True
-    def unblock(self):
-        self.is_blocked = False
     def __repr__(self) -> str:
         return get_short_node_string(self)
 
-class StartNode(CFGNode): pass
-class EndNode(CFGNode): pass
-class AssignNode(CFGNode): pass
+class StartNode(CFGNode): __slots__ = ()
+class EndNode(CFGNode): __slots__ = ()
+class AssignNode(CFGNode): __slots__ = ()
 class BranchNode(CFGNode):
+    __slots__ = ("join_node",)
     def __init__(self, id: str, syntaxnode: ast.AST) -> None:
         super().__init__(id, syntaxnode)
         self.join_node: CFGNode = None # to be set later
 class JoinNode(CFGNode):
+    __slots__ = ("branch_node",)
     def __init__(self, id: str, syntaxnode: ast.AST) -> None:
         super().__init__(id, syntaxnode)
         self.branch_node: CFGNode = None  # to be set later
-class ReturnNode(CFGNode): pass
-class BreakNode(CFGNode): pass
-class ContinueNode(CFGNode): pass
-class FuncStartNode(CFGNode): pass
-class FuncArgNode(CFGNode): pass
-class FuncJoinNode(CFGNode): pass
-class ExprNode(CFGNode): pass
-class LoopIterNode(CFGNode): pass
+class ReturnNode(CFGNode): __slots__ = ()
+class BreakNode(CFGNode): __slots__ = ()
+class ContinueNode(CFGNode): __slots__ = ()
+class FuncStartNode(CFGNode): __slots__ = ()
+class FuncArgNode(CFGNode): __slots__ = ()
+class FuncJoinNode(CFGNode): __slots__ = ()
+class ExprNode(CFGNode): __slots__ = ()
+class LoopIterNode(CFGNode): __slots__ = ()
 
 def get_short_node_string(node: CFGNode):
     s = type(node).__name__
@@ -57,28 +58,89 @@ def delete_edge(from_node: CFGNode, to_node: CFGNode):
 
 
 # returns true if startnode is reachable from endnode
-def _is_reachable(startnode: CFGNode, endnode: CFGNode, path: list[CFGNode]):
-    if endnode.is_blocked:
+# (iterative backwards search, unrolled CFGs are too deep for recursion)
+# paths may not pass through excluded nodes (CFG nodes are never modified, so queries can run concurrently)
+def is_reachable(startnode:CFGNode, endnode: CFGNode, excluded: Set[CFGNode] = frozenset()):
+    if endnode in excluded:
         return False
-    
-    for parent in endnode.parents:
-        if parent == startnode:
-            return True
-        is_cycle = any(p == parent for p in path)
-        if not is_cycle:
-            new_path = copy(path) if len(endnode.parents) > 1 else path
-            new_path.append(parent)
-            if _is_reachable(startnode, parent, new_path):
+    visited = {endnode}
+    stack = [endnode]
+    while len(stack) > 0:
+        node = stack.pop()
+        for parent in node.parents:
+            if parent == startnode:
                 return True
+            if parent in visited or parent in excluded:
+                continue
+            visited.add(parent)
+            stack.append(parent)
     return False
 
-def is_reachable(startnode:CFGNode, endnode: CFGNode):
-    return _is_reachable(startnode, endnode, [])
-
 def is_on_path_between_nodes(node: CFGNode, startnode: CFGNode, endnode: CFGNode):
     return is_reachable(startnode, node) and is_reachable(node, endnode)
 
-from typing import Set,Dict,Optional
+from array import array
+
+# Compact form of a CFG for traversals.
+# Nodes get dense integer ids (startnode is 0, endnode is n-1) and edges are stored in CSR arrays:
+# the successors of node i are succ_targets[succ_offsets[i]:succ_offsets[i+1]], same for predecessors.
+# Traversals work on these int arrays with bytearray masks instead of hashing nodes.
+# The compact form is a snapshot, it has to be built after the CFG is complete (see CFG.get_compact).
+# Same as CompactCFG in src/ir4ppl/ir4ppl/cfg.py (src/py and ir4ppl do not import from each other), fixes belong in both copies.
+class CompactCFG:
+    __slots__ = ("nodes", "index", "succ_offsets", "succ_targets", "pred_offsets", "pred_targets")
+    def __init__(self, startnode: CFGNode, nodes: Set[CFGNode], endnode: CFGNode) -> None:
+        inner = sorted((node for node in nodes if node != startnode and node != endnode), key=lambda node: (node.id, type(node).__name__))
+        self.nodes: list[CFGNode] = [startnode] + inner + [endnode]
+        self.index: Dict[CFGNode,int] = {node: i for i, node in enumerate(self.nodes)}
+        self.succ_offsets, self.succ_targets = self._to_csr(lambda node: node.children)
+        self.pred_offsets, self.pred_targets = self._to_csr(lambda node: node.parents)
+
+    def _to_csr(self, get_neighbours) -> tuple[array, array]:
+        offsets = array("i", [0])
+        targets = array("i")
+        for node in self.nodes:
+            # edges leaving the CFG are ignored
+            targets.extend(sorted(self.index[n] for n in get_neighbours(node) if n in self.index))
+            offsets.append(len(targets))
+        return offsets, targets
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def successors(self, i: int) -> array:
+        return self.succ_targets[self.succ_offsets[i]:self.succ_offsets[i+1]]
+
+    def predecessors(self, i: int) -> array:
+        return self.pred_targets[self.pred_offsets[i]:self.pred_offsets[i+1]]
+
+    def reach(self, sources: Sequence[int], forward: bool = True, excluded: Optional[bytearray] = None) -> bytearray:
+        # mask of all nodes reachable from sources (including sources),
+        # paths do not pass through excluded nodes (excluded nodes are reached, but not expanded; sources are always expanded)
+        offsets, targets = (self.succ_offsets, self.succ_targets) if forward else (self.pred_offsets, self.pred_targets)
+        visited = bytearray(len(self.nodes))
+        stack = list(sources)
+        for i in stack:
+            visited[i] = 1
+        while len(stack) > 0:
+            i = stack.pop()
+            for k in range(offsets[i], offsets[i+1]):
+                j = targets[k]
+                if not visited[j]:
+                    visited[j] = 1
+                    if excluded is None or not excluded[j]:
+                        stack.append(j)
+        return visited
+
+    def mask(self, nodes: Sequence[CFGNode]) -> bytearray:
+        # nodes which are not in the CFG are ignored
+        m = bytearray(len(self.nodes))
+        for node in nodes:
+            i = self.index.get(node)
+            if i is not None:
+                m[i] = 1
+        return m
+
 class CFG:
     def __init__(self, startnode: StartNode, nodes: Set[CFGNode], endnode: EndNode) -> None:
         assert isinstance(startnode, (StartNode, FuncStartNode)), f"Wrong type for startnode {startnode}"
@@ -88,6 +150,12 @@ class CFG:
         self.startnode = startnode
         self.nodes = nodes
         self.endnode = endnode
+        self.compact: Optional[CompactCFG] = None
+
+    def get_compact(self) -> CompactCFG:
+        if self.compact is None:
+            self.compact = CompactCFG(self.startnode, self.nodes, self.endnode)
+        return self.compact
 
 def verify_cfg(cfg: CFG):
     if not isinstance(cfg.startnode, (StartNode, FuncStartNode)):
@@ -125,11 +193,8 @@ def verify_cfg(cfg: CFG):
                 j1 = b1.join_node
                 j2 = b2.join_node
                 # all paths from b2 to j1 have to go through j2
-                b1.block() # B2 -> ... B1 -> ... J1 -> ... J2
-                j2.block()
-                assert not is_reachable(b2, j1), f"{b2} can reach {j1} without going through its {j2} or {b1}."
-                j2.unblock()
-                b1.unblock()
+                # B2 -> ... B1 -> ... J1 -> ... J2
+                assert not is_reachable(b2, j1, excluded={b1, j2}), f"{b2} can reach {j1} without going through its {j2} or {b1}."
 
     return True
 
@@ -137,7 +202,7 @@ def is_supported_expression(node: ast.AST):
     if not isinstance(node, (
         ast.Expr, ast.Import, ast.ImportFrom, # stmt
         ast.BoolOp, ast.NamedExpr, ast.BinOp, ast.UnaryOp, ast.Dict, ast.Set, ast.Compare, ast.Call, ast.JoinedStr, ast.FormattedValue,
-        ast.Constant, ast.Attribute, ast.Subscript, ast.Name, ast.List, ast.Tuple, ast.Slice, # expr
+        ast.Constant, ast.Attribute, ast.Subscript, ast.Name, ast.List, ast.Tuple, ast.Slice, ConstantArray, # expr
         ast.expr_context, ast.boolop, ast.operator, ast.unaryop, ast.cmpop, ast.arguments, ast.arg, ast.keyword, ast.alias,
         ast.Pass
         )):
@@ -276,8 +341,9 @@ class CFGBuilder():
             for child in node.elts:
                 child_node_id = self.node_to_id[child]
                 if isinstance(child, ast.FunctionDef):
-                    function_cfg = self.get_function_cfg(child)
-                    self.cfgs[child] = function_cfg
+                    # function definitions get their own CFG, which is built on demand
+                    # (see ScopedTree.get_cfg and get_cfg_representation)
+                    continue
                 
                 elif isinstance(child, (ast.Return, ast.Break, ast.Continue)):
                     if isinstance(child, ast.Return):
@@ -451,8 +517,12 @@ class CFGBuilder():
         return CFG(startnode, nodes, endnode)
             
 def get_cfg_representation(root_node: ast.AST, node_to_id: Dict[ast.AST, str]):
+    # eagerly builds CFGs for root node and all function definitions
     cfgbuilder = CFGBuilder(node_to_id)
     cfgbuilder.get_cfg(root_node, None, None)
+    for node in ast.walk(root_node):
+        if isinstance(node, ast.FunctionDef):
+            cfgbuilder.cfgs[node] = cfgbuilder.get_function_cfg(node)
     return cfgbuilder.cfgs
 
 
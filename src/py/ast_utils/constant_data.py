@@ -0,0 +1,64 @@
+import ast
+from .utils import ConstantArray
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Data is often embedded in programs as literal, e.g. x = np.array([1.1, 1.9, 2.3, ...]).
+# Each element would be a node of the syntax tree, which gets an id, position and parent,
+# and is visited by every pass and analysis.
+# We replace constant numeric list and tuple literals with at least MIN_CONSTANT_ARRAY_SIZE elements
+# by a ConstantArray, which only records length, dtype and value range of the elements.
+# The position of the literal is kept, such that source text and diagnostics are unchanged.
+# Called first, before any other transformation.
+
+MIN_CONSTANT_ARRAY_SIZE = 16
+
+def _collect_constants(node: ast.AST, values: list) -> bool:
+    # appends all (nested) elements of a constant numeric literal to values, returns False if node is not such a literal
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return all(_collect_constants(elt, values) for elt in node.elts)
+    if isinstance(node, ast.Constant):
+        value = node.value
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)) and isinstance(node.operand, ast.Constant):
+        value = -node.operand.value if isinstance(node.op, ast.USub) else node.operand.value
+    else:
+        return False
+    if not isinstance(value, (bool, int, float)):
+        return False
+    values.append(value)
+    return True
+
+def _get_dtype(values: list) -> str:
+    if all(isinstance(value, bool) for value in values):
+        return "bool"
+    if all(isinstance(value, int) for value in values):
+        return "int"
+    return "float"
+
+def summarise_constants(values: list) -> tuple[str, bool | int | float, bool | int | float]:
+    # dtype and value range of the elements, the bounds are elements of values (same as min and max)
+    if np is not None:
+        array = np.asarray(values)
+        if array.dtype.kind in "bif": # otherwise integers which do not fit into int64
+            dtype = {"b": "bool", "i": "int"}.get(array.dtype.kind, "float")
+            return dtype, values[int(array.argmin())], values[int(array.argmax())]
+    return _get_dtype(values), min(values), max(values)
+
+class ConstantDataCollapser(ast.NodeTransformer):
+    def visit_List(self, node: ast.List):
+        return self._collapse(node)
+
+    def visit_Tuple(self, node: ast.Tuple):
+        return self._collapse(node)
+
+    def _collapse(self, node: ast.List | ast.Tuple):
+        if isinstance(node.ctx, ast.Load):
+            values = []
+            if _collect_constants(node, values) and len(values) >= MIN_CONSTANT_ARRAY_SIZE:
+                dtype, low, high = summarise_constants(values)
+                return ast.copy_location(ConstantArray(len(node.elts), len(values), dtype, low, high), node)
+        # literals with non-constant elements may contain constant literals, e.g. [[1, 2, ...], x]
+        return self.generic_visit(node)
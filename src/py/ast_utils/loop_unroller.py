@@ -29,8 +29,9 @@ class LoopUnroller(ast.NodeTransformer):
                             iter_range = range(value)
                         case [ast.Constant(value=value1), ast.Constant(value=value2)]:
                             iter_range = range(value1, value2)
-                    for i in iter_range:
-                        unrolled_for_body = deepcopy(stmt.body)
+                    for k, i in enumerate(iter_range):
+                        # the last iteration reuses the loop body, all others are copies
+                        unrolled_for_body = stmt.body if k == len(iter_range) - 1 else deepcopy(stmt.body)
                         NameReplacer(stmt.target.id, ast.Constant(value=i)).visit(unrolled_for_body)
                         new_block_body.append(unrolled_for_body)
                 case _:
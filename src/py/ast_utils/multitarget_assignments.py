@@ -13,11 +13,12 @@ class MultitargetTransformer(ast.NodeVisitor):
                 position_args = {"lineno": stmt.lineno, "col_offset": stmt.col_offset, "end_lineno": stmt.end_lineno, "end_col_offset": stmt.end_col_offset}
                 match stmt:
                     case ast.Assign(targets=[_, _, *_]): # x = y = 1
-                        for name in stmt.targets:
-                            new_stmt = deepcopy(stmt)
-                            new_stmt.targets = [deepcopy(name)]
-                            # new_stmt = ast.Assign(targets=[name], value=deepcopy(stmt.value), **position_args)
+                        # only the value is copied, the last assignment reuses stmt
+                        for name in stmt.targets[:-1]:
+                            new_stmt = ast.Assign(targets=[name], value=deepcopy(stmt.value), **position_args)
                             new_body.append(new_stmt)
+                        stmt.targets = [stmt.targets[-1]]
+                        new_body.append(stmt)
                     case ast.Assign(targets=[ast.Tuple()], value=value): # x, y = 1
                         uuid4 = str(uuid.uuid4())[:5]
                         tmp_name_store = ast.Name(id=f'__TMP__{uuid4}', ctx=ast.Store())
@@ -1,10 +1,11 @@
 
 import ast
-import ast_scope
 from .utils import Block, IdPrinter
 from .multitarget_assignments import MultitargetTransformer
 from .call_uniquifier import CallUniquifier
+from .symbol_table import SymbolTable, resolve_symbols
 from .loop_unroller import LoopUnroller
+from .constant_data import ConstantDataCollapser
 
 # returns the indices of source text of node in utf8 source code
 def get_first_last_byte(node: ast.AST, line_offsets: list[int]):
@@ -129,18 +130,28 @@ class PositionParentAdder(ast.NodeVisitor):
 
 
 # Confusion (1)
-# if we want to deepcopy a syntaxnode we have to make sure that two syntaxtree instances
-# do not share any object. ast.Store and ast.Load are singletons however
-# I am still not too sure about this
-# There are also other singleton classes (like ast.Add)
-# I do not understand when deepcopying works properly
-# class Unsingletonifier(ast.NodeTransformer):
-#     def visit_Store(self, node: ast.Store):
-#         return ast.Store()
-#     def visit_Load(self, node: ast.Load):
-#         return ast.Load()
-#     def visit_Del(self, node: ast.Del):
-#         return ast.Del()
+# ast.parse shares singleton instances of expression contexts (ast.Load, ast.Store, ast.Del)
+# and operators (ast.Add, ast.And, ast.Eq, ...) between all nodes of all trees.
+# PositionParentAdder annotates them with a parent, which would leak from one syntax tree into the next.
+# We used to deepcopy the whole syntax tree, which copies each singleton once (one memo for the whole tree).
+# Now we only replace the singletons by instances owned by this tree and preprocess the tree in place.
+# Transformers copy only the subtrees they duplicate (e.g. LoopUnroller).
+SINGLETON_AST_TYPES = (ast.expr_context, ast.boolop, ast.operator, ast.unaryop, ast.cmpop)
+
+def own_singletons(syntax_tree: ast.AST):
+    owned: dict[type, ast.AST] = {}
+    def own(value):
+        t = type(value)
+        if t not in owned:
+            owned[t] = t()
+        return owned[t]
+    for node in ast.walk(syntax_tree):
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, SINGLETON_AST_TYPES):
+                setattr(node, field, own(value))
+            elif isinstance(value, list) and len(value) > 0 and isinstance(value[0], SINGLETON_AST_TYPES):
+                # ast.Compare ops
+                setattr(node, field, [own(op) for op in value])
 
 class NodeIdAssigner(ast.NodeVisitor):
     def __init__(self) -> None:
@@ -155,8 +166,9 @@ class NodeIdAssigner(ast.NodeVisitor):
         self.generic_visit(node)
 
 class SyntaxTree:
-    def __init__(self, root_node: ast.AST) -> None:
+    def __init__(self, root_node: ast.AST, symbol_table: SymbolTable) -> None:
         self.root_node = root_node
+        self.symbol_table = symbol_table
 
         node_id_assigner = NodeIdAssigner()
         node_id_assigner.visit(self.root_node)
@@ -168,15 +180,18 @@ class SyntaxTree:
         self.node_to_id[node] = i
         self.id_to_node[i] = node
 
-from copy import deepcopy
+# Preprocesses syntax_tree in place, the returned SyntaxTree owns it (root_node is syntax_tree).
+# Callers have to pass a freshly parsed tree and must not use syntax_tree afterwards.
 def preprocess_syntaxtree(syntax_tree: ast.AST, file_content: str, line_offsets: list[int],
-                          n_unroll_loops: int, uniquify_calls: bool = True) -> SyntaxTree:
+                          n_unroll_loops: int, uniquify_calls: bool = False) -> SyntaxTree:
     
-    syntax_tree = deepcopy(syntax_tree) # this is a hack to deal with (1), unsingletonifies everything
+    syntax_tree = ConstantDataCollapser().visit(syntax_tree)
+    own_singletons(syntax_tree) # see (1)
     MultitargetTransformer().visit(syntax_tree)
+    # only symbol resolution pass, transformations below keep symbol ids up to date
+    symbol_table = resolve_symbols(syntax_tree)
     if uniquify_calls:
-        prelim_scope_info = ast_scope.annotate(syntax_tree)
-        CallUniquifier(syntax_tree, prelim_scope_info).visit(syntax_tree)
+        CallUniquifier(syntax_tree, symbol_table).visit(syntax_tree)
     BlockNodeTransformer().visit(syntax_tree)
     if n_unroll_loops > 0:
         print("Unroll Loops")
@@ -184,4 +199,4 @@ def preprocess_syntaxtree(syntax_tree: ast.AST, file_content: str, line_offsets:
     syntax_tree.parent = None
     PositionParentAdder(file_content, line_offsets).visit(syntax_tree)
     # print(ast.unparse(syntax_tree))
-    return SyntaxTree(syntax_tree)
+    return SyntaxTree(syntax_tree, symbol_table)
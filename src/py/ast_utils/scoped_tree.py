@@ -1,6 +1,7 @@
 import ast
-from typing import Any, Union
-import ast_scope
+from typing import Any, Union, Optional
+from ast_utils.symbol_table import get_symbol_id
+from ast_utils.call_context import CallContexts, K_CFA
 from ast_utils.node_finder import NodeFinder
 from ast_utils.node_finders import get_user_defined_functions
 from ast_utils.preprocess import SyntaxTree
@@ -36,66 +37,131 @@ class FunctionDefinition:
         self.node = node
         self.name = node.name
 
-def _get_id_str(identifier: ast.AST):
-        assert isinstance(identifier, (ast.Name, ast.arg, ast.FunctionDef)), f"Identifier has wrong type {ast.dump(identifier)}"
-        if isinstance(identifier, ast.Name):
-            return identifier.id
-        # if isinstance(identifier, ast.Attribute):
-        #     return identifier.attr
-        if isinstance(identifier, ast.arg):
-            return identifier.arg
-        if isinstance(identifier, ast.FunctionDef):
-            return identifier.name
-        
-def _identifieres_are_the_same(scope_info, identifier1: ast.AST, identifier2: ast.AST):
+def _identifieres_are_the_same(identifier1: ast.AST, identifier2: ast.AST):
     if isinstance(identifier1, ast.Attribute) or isinstance(identifier2, ast.Attribute):
         # module function calls have call.func attribute which has no scope (is not user-defined symbol)
         # e.g. np.array
         return False
     
-    id1 = _get_id_str(identifier1)
-    id2 = _get_id_str(identifier2)
-    scope1 = scope_info[identifier1]
-    scope2 = scope_info[identifier2]
-    # Function args have scope of corresponding function
-    # FunctionDefs have scope in which the function is defined
-    # e.g. if function is defined in global scope a corresponding function call has call.func name with global scope
-
-    return id1 == id2 and scope1 == scope2
+    assert isinstance(identifier1, (ast.Name, ast.arg, ast.FunctionDef)), f"Identifier has wrong type {ast.dump(identifier1)}"
+    assert isinstance(identifier2, (ast.Name, ast.arg, ast.FunctionDef)), f"Identifier has wrong type {ast.dump(identifier2)}"
+    # Function args have symbol of corresponding function scope
+    # FunctionDefs have symbol of scope in which the function is defined
+    # e.g. if function is defined in global scope a corresponding function call has call.func name with same symbol
+    symbol_id1 = get_symbol_id(identifier1)
+    return symbol_id1 is not None and symbol_id1 == get_symbol_id(identifier2)
 
 class ScopedTree:
-    def __init__(self, syntax_tree: SyntaxTree, scope_info, all_definitions, all_functions, all_user_symbols, cfgs, is_container_variable):
+    def __init__(self, syntax_tree: SyntaxTree, all_definitions, all_functions, all_user_symbols, cfgbuilder: CFGBuilder, verify_cfgs=False, k_cfa=K_CFA, entry_functions=[]):
         self.syntax_tree = syntax_tree
         self.root_node = syntax_tree.root_node
-        self.scope_info = scope_info
+        self.symbol_table = syntax_tree.symbol_table
+        self.scope_info = syntax_tree.symbol_table.scope_info # scopes before transformations, only for reference
         self.all_definitions = all_definitions
         self.all_functions = all_functions
+        self.symbol_to_function = {get_symbol_id(f.node): f for f in all_functions} # symbol_id -> FunctionDefinition
+        self._call_sites = None # symbol_id -> list[ast.Call], built on first use
+        self.k_cfa = k_cfa # length of call strings for context-sensitive analysis
+        self.entry_functions = entry_functions # functions that are analysed without call context
+        self._call_contexts = None # built on first use
         # print("all_functions:", [f.name for f in self.all_functions])
         self.all_user_symbols = all_user_symbols
-        self.cfgs = cfgs
-        self.is_container_variable = is_container_variable
+        # CFGs are built lazily on first query, such that we only pay for functions that are reached by an analysis
+        self.cfgbuilder = cfgbuilder
+        self.cfgs = dict() # toplevel -> CFG, functiondef -> CFG
+        self.syntaxnode_to_cfgnode = dict() # syntaxnode -> (CFG, CFGNode), filled when CFG is built
+        self.verify_cfgs = verify_cfgs # debug option
+        # lookups of the caches above, reported by the get_stats RPC: cache -> [hits, misses]
+        self.cache_lookups: dict[str,list[int]] = {"cfg": [0, 0], "call_sites": [0, 0], "call_contexts": [0, 0]}
 
     def get_node_for_id(self, id: str) -> ast.AST:
-        return self.syntax_tree.id_to_node[id]
+        # ignores call context of qualified node ids node_id@call_node_id@...
+        return self.syntax_tree.id_to_node[id.split("@")[0]]
     
     def get_id_for_node(self, node: ast.AST) -> str:
         return self.syntax_tree.node_to_id[node]
     
         
     def identifieres_are_the_same(self, identifier1: ast.AST, identifier2: ast.AST):
-        return _identifieres_are_the_same(self.scope_info, identifier1, identifier2)
+        return _identifieres_are_the_same(identifier1, identifier2)
+
+    def is_container_variable(self, identifier: ast.AST) -> bool:
+        symbol_id = get_symbol_id(identifier)
+        return symbol_id is not None and self.symbol_table[symbol_id].is_container
+
+    def get_user_function(self, identifier: ast.AST) -> Optional[FunctionDefinition]:
+        symbol_id = get_symbol_id(identifier)
+        if symbol_id is None or isinstance(identifier, ast.Attribute):
+            return None
+        return self.symbol_to_function.get(symbol_id)
+
+    def _record_lookup(self, cache: str, hit: bool):
+        self.cache_lookups[cache][0 if hit else 1] += 1
+
+    def get_cache_stats(self) -> dict[str,dict[str,float]]:
+        return {cache: {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses) if hits + misses > 0 else 0.}
+                for cache, (hits, misses) in self.cache_lookups.items()}
+
+    def get_call_sites(self, func_syntaxnode: ast.FunctionDef) -> list[ast.Call]:
+        self._record_lookup("call_sites", self._call_sites is not None)
+        if self._call_sites is None:
+            self._call_sites = dict()
+            for node in ast.walk(self.root_node):
+                if isinstance(node, ast.Call) and not isinstance(node.func, ast.Attribute):
+                    symbol_id = get_symbol_id(node.func)
+                    if symbol_id is not None:
+                        self._call_sites.setdefault(symbol_id, []).append(node)
+        return self._call_sites.get(get_symbol_id(func_syntaxnode), [])
         
+    def get_call_contexts(self) -> CallContexts:
+        self._record_lookup("call_contexts", self._call_contexts is not None)
+        if self._call_contexts is None:
+            self._call_contexts = CallContexts(self, self.k_cfa, self.entry_functions)
+        return self._call_contexts
+
+    def get_cfg(self, node: Union[ast.Module, ast.FunctionDef]) -> CFG:
+        self._record_lookup("cfg", node in self.cfgs)
+        if node not in self.cfgs:
+            if isinstance(node, ast.FunctionDef):
+                cfg = self.cfgbuilder.get_function_cfg(node)
+            else:
+                assert isinstance(node, ast.Module), f"Cannot build CFG for {node}"
+                cfg = self.cfgbuilder.get_cfg(node, None, None)
+            if self.verify_cfgs:
+                verify_cfg(cfg)
+            self.cfgs[node] = cfg
+            self._index_cfg(cfg)
+        return self.cfgs[node]
+
+    def _index_cfg(self, cfg: CFG):
+        for cfgnode in cfg.nodes:
+            if not isinstance(cfgnode, (AssignNode, BranchNode, ReturnNode, ExprNode, LoopIterNode)):
+                continue
+            if cfgnode.syntaxnode is EMPTY_RETURN_NODE:
+                continue
+            if isinstance(cfgnode, ExprNode) and cfgnode.syntaxnode in self.syntaxnode_to_cfgnode:
+                continue # ExprNode which was transformed to ReturnNode shares its syntaxnode, prefer ReturnNode
+            self.syntaxnode_to_cfgnode[cfgnode.syntaxnode] = (cfg, cfgnode)
+
     def get_cfgnode_for_syntaxnode(self, node: ast.AST):
-        for _, cfg in self.cfgs.items():
-            for cfgnode in cfg.nodes:
-                if isinstance(cfgnode, (AssignNode, BranchNode, ReturnNode, ExprNode, LoopIterNode)) and is_descendant(cfgnode.syntaxnode, node):
-                    return cfg, cfgnode
+        # only the CFG of the innermost function (or module) containing node can contain its cfgnode,
+        # which is the one of the nearest indexed ancestor of node
+        ancestors = [node]
+        scope_node = node.parent
+        while scope_node is not None and not isinstance(scope_node, (ast.FunctionDef, ast.Module)):
+            ancestors.append(scope_node)
+            scope_node = scope_node.parent
+        if scope_node is not None:
+            self.get_cfg(scope_node)
+            for ancestor in ancestors:
+                if ancestor in self.syntaxnode_to_cfgnode:
+                    return self.syntaxnode_to_cfgnode[ancestor]
         raise Exception(f"No CFGNode found for syntaxnode {ast.dump(node)}")
     
     def get_cfg_for_function_syntaxnode(self, node: ast.FunctionDef):
-        if node not in self.cfgs:
+        if not isinstance(node, ast.FunctionDef):
             raise Exception(f"No CFGNode found for function {node}")
-        return self.cfgs[node]
+        return self.get_cfg(node)
 
 
 def NameFinder():
@@ -106,9 +172,8 @@ def NameFinder():
 def is_referenced_identifier(identifier: ast.Name):
     return isinstance(identifier, ast.Name) and isinstance(identifier.parent, ast.Subscript)
 
-def get_scoped_tree(syntax_tree: SyntaxTree):
+def get_scoped_tree(syntax_tree: SyntaxTree, verify_cfgs=False, k_cfa=K_CFA, entry_functions=[]):
     node = syntax_tree.root_node
-    scope_info = ast_scope.annotate(node) # ast.Name + ast.FunctionDef -> Scope
     visitor = AssignmentCollector()
     visitor.visit(node)
     all_definitions = visitor.assignments
@@ -120,18 +185,13 @@ def get_scoped_tree(syntax_tree: SyntaxTree):
             all_user_symbols.add(arg.arg) # add parameter name of function
 
     
-    cfgs = get_cfg_representation(node, syntax_tree.node_to_id)
-
-    all_identifiers = NameFinder().visit(node)
-    referenced_identifiers = set(identifier for identifier in all_identifiers if is_referenced_identifier(identifier))
-    is_container_variable = dict()
-    for identifier in all_identifiers:
-        # check if identifier x is somewhere used as x[...]
-        is_container_variable[identifier] = any(
-            _identifieres_are_the_same(scope_info, identifier, ref_identifier)
-            for ref_identifier in referenced_identifiers
-        )
-    # print(sorted(list({(name.id, b) for name,b in is_container_variable.items()})))
+    cfgbuilder = CFGBuilder(syntax_tree.node_to_id)
 
+    # mark symbols of identifiers x that are somewhere used as x[...]
+    for identifier in NameFinder().visit(node):
+        if is_referenced_identifier(identifier):
+            symbol_id = get_symbol_id(identifier)
+            if symbol_id is not None:
+                syntax_tree.symbol_table[symbol_id].is_container = True
 
-    return ScopedTree(syntax_tree, scope_info, all_definitions, all_functions, all_user_symbols, cfgs, is_container_variable)
+    return ScopedTree(syntax_tree, all_definitions, all_functions, all_user_symbols, cfgbuilder, verify_cfgs, k_cfa, entry_functions)
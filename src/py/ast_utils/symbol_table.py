@@ -0,0 +1,107 @@
+import ast
+import ast_scope
+from ast_scope.scope import GlobalScope, FunctionScope, ClassScope
+from copy import deepcopy
+from typing import Optional
+
+# Every binding (variable, parameter, function name) gets an integer symbol id.
+# Symbol resolution with ast_scope is done once before any tree transformation,
+# the ids are stored in node.symbol_id for ast.Name, ast.arg and ast.FunctionDef nodes.
+# Transformations which create new bindings (e.g. CallUniquifier) have to allocate new symbols
+# with SymbolTable.new_symbol, transformations which copy nodes keep the symbol ids.
+# Identifiers refer to the same variable iff they have the same symbol id.
+
+class Symbol:
+    def __init__(self, id: int, name: str, scope_node: Optional[ast.AST]) -> None:
+        self.id = id
+        self.name = name
+        # ast.Module, ast.FunctionDef, ast.Lambda, ast.ClassDef, ... which defines scope of symbol
+        self.scope_node = scope_node
+        self.is_container = False # symbol is somewhere used as x[...]
+
+    def __repr__(self) -> str:
+        return f"Symbol({self.id}, {self.name})"
+
+def _get_scope_node(root_node: ast.AST, scope):
+    if isinstance(scope, GlobalScope):
+        return root_node
+    if isinstance(scope, FunctionScope):
+        return scope.function_node
+    if isinstance(scope, ClassScope):
+        return scope.class_node
+    return None
+
+def get_symbol_id(node: ast.AST) -> Optional[int]:
+    return getattr(node, "symbol_id", None)
+
+class SymbolTable:
+    def __init__(self, scope_info) -> None:
+        self.scope_info = scope_info
+        self.symbols: list[Symbol] = []
+        self._scope_to_symbols = dict() # (name, scope) -> id
+
+    def __getitem__(self, symbol_id: int) -> Symbol:
+        return self.symbols[symbol_id]
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def new_symbol(self, name: str, scope_node: Optional[ast.AST]) -> int:
+        symbol = Symbol(len(self.symbols), name, scope_node)
+        self.symbols.append(symbol)
+        return symbol.id
+
+    def _intern(self, root_node: ast.AST, name: str, scope) -> int:
+        key = (name, scope)
+        if key not in self._scope_to_symbols:
+            self._scope_to_symbols[key] = self.new_symbol(name, _get_scope_node(root_node, scope))
+        return self._scope_to_symbols[key]
+
+    # deepcopies function and allocates fresh symbols for all bindings local to the copy
+    # (parameters, local variables, nested functions and their locals).
+    # references to symbols outside of the function keep their ids.
+    def copy_function(self, func: ast.FunctionDef) -> ast.FunctionDef:
+        memo = dict()
+        new_func = deepcopy(func, memo)
+
+        old_scope_nodes = {id(node) for node in ast.walk(func)}
+        renaming = dict()
+        for node in ast.walk(func):
+            if id(node) not in memo:
+                continue
+            new_node = memo[id(node)]
+            symbol_id = get_symbol_id(node)
+            if symbol_id is None:
+                continue
+            symbol = self.symbols[symbol_id]
+            if id(symbol.scope_node) not in old_scope_nodes:
+                continue # not local to function
+            if symbol_id not in renaming:
+                new_scope_node = memo.get(id(symbol.scope_node), symbol.scope_node)
+                renaming[symbol_id] = self.new_symbol(symbol.name, new_scope_node)
+            new_node.symbol_id = renaming[symbol_id]
+
+        return new_func
+
+def resolve_symbols(root_node: ast.AST) -> SymbolTable:
+    scope_info = ast_scope.annotate(root_node) # ast.Name + ast.FunctionDef -> Scope
+    symbol_table = SymbolTable(scope_info)
+    for node in ast.walk(root_node):
+        if isinstance(node, ast.Name):
+            name = node.id
+        elif isinstance(node, ast.arg):
+            name = node.arg
+        elif isinstance(node, ast.FunctionDef):
+            name = node.name
+        else:
+            continue
+        if node in scope_info:
+            node.symbol_id = symbol_table._intern(root_node, name, scope_info[node])
+    return symbol_table
+
+# symbol for a new binding created in a transformation at location of node (node must have parent attribute)
+def new_symbol_at(symbol_table: SymbolTable, name: str, node: ast.AST) -> int:
+    scope_node = node
+    while scope_node is not None and not isinstance(scope_node, (ast.FunctionDef, ast.Module)):
+        scope_node = scope_node.parent
+    return symbol_table.new_symbol(name, scope_node)
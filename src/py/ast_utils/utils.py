@@ -102,11 +102,32 @@ class Block(ast.AST):
         new_body = [deepcopy(stmt, memo) for stmt in self]
         return Block(new_body)
 
+# Summary of a constant numeric list / tuple literal (data), see constant_data.py.
+# The elements are not part of the syntax tree, only their number, dtype and value range.
+class ConstantArray(ast.expr):
+    _fields = ()
+    _attributes = ("lineno", "col_offset", "end_lineno", "end_col_offset")
+
+    def __init__(self, length: int = 0, size: int = 0, dtype: str = "float", low: float = -float("inf"), high: float = float("inf"), **position_args):
+        super().__init__(**position_args)
+        self.length = length # number of elements of outermost list
+        self.size = size # number of all (nested) elements
+        self.dtype = dtype # "bool", "int" or "float"
+        self.low = low
+        self.high = high
+
 def _unparse_Block(self: ast._Unparser, node: Block):
     for item in node:
         self.traverse(item)
 ast._Unparser.visit_Block = _unparse_Block
 
+def _unparse_ConstantArray(self: ast._Unparser, node: ConstantArray):
+    if hasattr(node, "source"):
+        self.write(source_text(node))
+    else:
+        self.write(f"[...{node.length} {node.dtype} elements...]")
+ast._Unparser.visit_ConstantArray = _unparse_ConstantArray
+
 def _unparse_If(self: ast._Unparser, node: ast.If):
     self.fill("if ")
     self.traverse(node.test)
@@ -40,7 +40,8 @@ def jsonrpc_serialize( data):
 JSONRPC20Response.serialize = staticmethod(jsonrpc_serialize)
 JSONRPC20Request.serialize = staticmethod(jsonrpc_serialize)
 
-def handle_client(reader, writer, dispatcher): 
+def handle_client(reader, writer, dispatcher, stats=None): 
+    # stats: ServerStats of the instrumented dispatcher (see server_stats.py), records payload sizes
     while True:
         message_str = read_transport_layer(reader)
         if message_str is None:
@@ -48,4 +49,7 @@ def handle_client(reader, writer, dispatcher):
         # print('request: ', message_str)
         response = JSONRPCResponseManager.handle(message_str, dispatcher)
         # print('response:', response.json)
-        write_transport_layer(writer, response.json)
+        response_str = response.json
+        if stats is not None:
+            stats.record_payload(len(message_str), len(response_str))
+        write_transport_layer(writer, response_str)
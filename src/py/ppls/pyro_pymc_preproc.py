@@ -2,6 +2,7 @@ from typing import Callable
 import ast
 from ast_utils.preprocess import SyntaxTree
 from ast_utils.utils import Block
+from ast_utils.symbol_table import new_symbol_at
 
 def get_pos_args(stmt):
     return {
@@ -35,6 +36,7 @@ class PyroPyMCPreprocessor(ast.NodeTransformer):
                             block = node.parent.parent
                             name = ast.Name(id=f"__TMP__{self.syntax_tree.node_to_id[node]}", ctx=ast.Store())
                             assign = ast.Assign(targets=[name], value=node, **get_pos_args(node))
+                            name.symbol_id = new_symbol_at(self.syntax_tree.symbol_table, name.id, block)
                             self.syntax_tree.add_node(name)
                             self.syntax_tree.add_node(assign)
                             node.parent = assign
@@ -53,6 +55,8 @@ class PyroPyMCPreprocessor(ast.NodeTransformer):
                         name = ast.Name(id=f"__TMP__{self.syntax_tree.node_to_id[node]}", ctx=ast.Store())
                         assign = ast.Assign(targets=[name], value=node, **get_pos_args(node))
                         name_load = ast.Name(id=name.id, ctx=ast.Load(), **get_pos_args(node))
+                        name.symbol_id = new_symbol_at(self.syntax_tree.symbol_table, name.id, block)
+                        name_load.symbol_id = name.symbol_id
                         self.syntax_tree.add_node(name)
                         self.syntax_tree.add_node(assign)
                         self.syntax_tree.add_node(name_load)
@@ -1,5 +1,5 @@
 
-from typing import Dict, Tuple, Any
+from typing import Dict, Tuple, Any, Optional
 from ast_utils.scoped_tree import ScopedTree
 
 import ast
@@ -8,20 +8,25 @@ from ast_utils.preprocess import preprocess_syntaxtree, SyntaxTree
 from ast_utils.node_finders import VariableDefinitionCollector, find_model, find_guide
 from ast_utils.utils import *
 
-from analysis.call_graph import compute_call_graph
-from analysis.data_control_flow import data_deps_for_node, control_parents_for_node
+from analysis.call_graph import CallGraph
+from analysis.data_control_flow import data_deps_for_node_in_context, control_parents_for_node_in_context
+from ast_utils.call_context import K_CFA, EMPTY_CONTEXT, get_enclosing_function
 import analysis.interval_arithmetic as interval_arithmetic
 import analysis.symbolic as symbolic
 
 from ppls import *
 import server_interface
+from server_stats import SERVER_STATS, logger
 import uuid
+import heapq
 
 _SESSION: Dict[str, Tuple[Any,ScopedTree]] = dict()
+_CALL_GRAPHS: Dict[str, CallGraph] = dict() # tree_id -> call graph, built on first get_call_graph request
 
-def get_syntax_tree(file_content: str, line_offsets: list[int], n_unroll_loops: int, uniquify_calls: bool) -> SyntaxTree:
+def get_syntax_tree(file_content: str, line_offsets: list[int], n_unroll_loops: int) -> SyntaxTree:
     syntax_tree = ast.parse(file_content)
-    syntax_tree = preprocess_syntaxtree(syntax_tree, file_content, line_offsets, n_unroll_loops, uniquify_calls)
+    # preprocessed in place, the parsed tree is not used anywhere else
+    syntax_tree = preprocess_syntaxtree(syntax_tree, file_content, line_offsets, n_unroll_loops)
     return syntax_tree
 
 def get_variables(syntax_tree: SyntaxTree, ppl: PPL) -> list[VariableDefinition]:
@@ -29,28 +34,49 @@ def get_variables(syntax_tree: SyntaxTree, ppl: PPL) -> list[VariableDefinition]
     variable_collector.visit(syntax_tree.root_node)
     return variable_collector.result
 
-def to_syntax_node(syntax_tree: SyntaxTree, node: ast.AST) -> server_interface.SyntaxNode:
+# nodes in functions are qualified by their call context: node_id@call_node_id@...
+def get_node_id(syntax_tree: SyntaxTree, node: ast.AST, ctx=EMPTY_CONTEXT) -> str:
+    return "@".join([syntax_tree.node_to_id[node]] + [syntax_tree.node_to_id[call] for call in ctx])
+
+def get_node_and_context_for_id(syntax_tree: SyntaxTree, node_id: str):
+    node_id, *ctx = node_id.split("@")
+    return syntax_tree.id_to_node[node_id], tuple(syntax_tree.id_to_node[call_id] for call_id in ctx)
+
+def to_syntax_node(syntax_tree: SyntaxTree, node: ast.AST, ctx=EMPTY_CONTEXT) -> server_interface.SyntaxNode:
     start, end = node.position, node.end_position
-    node = server_interface.SyntaxNode(syntax_tree.node_to_id[node], start, end, source_text(node))
+    node = server_interface.SyntaxNode(get_node_id(syntax_tree, node, ctx), start, end, source_text(node))
     return node
 
-def to_random_variable(syntax_tree: SyntaxTree, variable: VariableDefinition, ppl: PPL, is_observed: bool) -> server_interface.RandomVariable:
+def to_random_variable(syntax_tree: SyntaxTree, variable: VariableDefinition, ppl: PPL, is_observed: bool, ctx=EMPTY_CONTEXT) -> server_interface.RandomVariable:
     name = ppl.get_random_variable_name(variable)
-    address_node = to_syntax_node(syntax_tree, ppl.get_address_node(variable))
+    address_node = to_syntax_node(syntax_tree, ppl.get_address_node(variable), ctx)
 
-    node = to_syntax_node(syntax_tree, variable.node)
+    node = to_syntax_node(syntax_tree, variable.node, ctx)
 
     distribution_node = ppl.get_distribution_node(variable)
     dist_name, dist_params = ppl.get_distribution(distribution_node)
 
     distribution = server_interface.Distribution(
         dist_name,
-        to_syntax_node(syntax_tree, distribution_node),
-        [server_interface.DistributionParam(k, to_syntax_node(syntax_tree, v)) for k,v in dist_params.items()]
+        to_syntax_node(syntax_tree, distribution_node, ctx),
+        [server_interface.DistributionParam(k, to_syntax_node(syntax_tree, v, ctx)) for k,v in dist_params.items()]
         )
 
     return server_interface.RandomVariable(node, name, address_node, distribution, is_observed)
 
+def get_entry_functions(syntax_tree: SyntaxTree, ppl: PPL) -> list[ast.FunctionDef]:
+    # model and guide are called by the inference engine,
+    # calls in the program (e.g. in a training loop) should not give their random variables a call context
+    entry_functions = []
+    for find in (find_model, find_guide):
+        try:
+            model = find(syntax_tree.root_node, ppl)
+        except AssertionError:
+            continue
+        if isinstance(model.node, ast.FunctionDef):
+            entry_functions.append(model.node)
+    return entry_functions
+
 _PPL_DICT: dict[str, PPL] =  {
     "pyro": Pyro(),
     "pymc": PyMC(),
@@ -58,16 +84,16 @@ _PPL_DICT: dict[str, PPL] =  {
 }
 
 def build_ast(file_name: str, ppl: str, n_unroll_loops: int) -> str:
-    print("build_ast")
-    print("FILENAME:", file_name)
+    logger.debug("FILENAME: %s", file_name)
     line_offsets = get_line_offsets(file_name)
     file_content = get_file_content(file_name)
     ppl_obj = _PPL_DICT[ppl]
-    uniquify_calls = ppl != "beanmachine"
-    syntax_tree = get_syntax_tree(file_content, line_offsets, n_unroll_loops, uniquify_calls)
+    # beanmachine random variables are functions, which must not be told apart by call site
+    k_cfa = K_CFA if ppl != "beanmachine" else 0
+    syntax_tree = get_syntax_tree(file_content, line_offsets, n_unroll_loops)
     syntax_tree = ppl_obj.preprocess_syntax_tree(syntax_tree)
 
-    scoped_tree = get_scoped_tree(syntax_tree)
+    scoped_tree = get_scoped_tree(syntax_tree, k_cfa=k_cfa, entry_functions=get_entry_functions(syntax_tree, ppl_obj))
     uuid4 = str(uuid.uuid4())
     _SESSION[uuid4] = ppl_obj, scoped_tree
     return uuid4
@@ -75,21 +101,20 @@ def build_ast(file_name: str, ppl: str, n_unroll_loops: int) -> str:
 
 
 def build_ast_for_file_content(file_content: str, ppl: str, n_unroll_loops: int) -> str:
-    print("build_ast_for_file_content")
     line_offsets = get_line_offsets_for_file_content(file_content)
     ppl_obj = _PPL_DICT[ppl]
-    uniquify_calls = ppl != "beanmachine"
-    syntax_tree = get_syntax_tree(file_content, line_offsets, n_unroll_loops, uniquify_calls)
+    # beanmachine random variables are functions, which must not be told apart by call site
+    k_cfa = K_CFA if ppl != "beanmachine" else 0
+    syntax_tree = get_syntax_tree(file_content, line_offsets, n_unroll_loops)
     syntax_tree = ppl_obj.preprocess_syntax_tree(syntax_tree)
 
-    scoped_tree = get_scoped_tree(syntax_tree)
+    scoped_tree = get_scoped_tree(syntax_tree, k_cfa=k_cfa, entry_functions=get_entry_functions(syntax_tree, ppl_obj))
     uuid4 = str(uuid.uuid4())
     _SESSION[uuid4] = ppl_obj, scoped_tree
     return uuid4
 
 
 def get_model(tree_id: str) -> server_interface.Model:
-    print("get_model")
     ppl_obj, scoped_tree = _SESSION[tree_id]
 
     model = find_model(scoped_tree.root_node, ppl_obj)
@@ -98,7 +123,6 @@ def get_model(tree_id: str) -> server_interface.Model:
 
 
 def get_guide(tree_id: str) -> server_interface.Model:
-    print("get_guide")
     ppl_obj, scoped_tree = _SESSION[tree_id]
 
     model = find_guide(scoped_tree.root_node, ppl_obj)
@@ -107,65 +131,74 @@ def get_guide(tree_id: str) -> server_interface.Model:
 
 
 def get_random_variables(tree_id: str) -> list[server_interface.RandomVariable]:
-    print("get_random_variables")
 
     ppl_obj, scoped_tree = _SESSION[tree_id]
 
     variables = get_variables(scoped_tree.syntax_tree, ppl_obj)
 
+    call_contexts = scoped_tree.get_call_contexts()
     response = []
     for variable in variables:
-        v = to_random_variable(scoped_tree.syntax_tree, variable, ppl_obj, ppl_obj.is_observed(variable))
-        response.append(v)
+        # one random variable for each call context of the function in which it is defined
+        for ctx in call_contexts.get_contexts(get_enclosing_function(variable.node)):
+            v = to_random_variable(scoped_tree.syntax_tree, variable, ppl_obj, ppl_obj.is_observed(variable), ctx)
+            response.append(v)
 
     return response
 
 
 def get_data_dependencies(tree_id: str, node: dict) -> list[server_interface.SyntaxNode]:
-    print("get_data_dependencies")
 
     _, scoped_tree = _SESSION[tree_id]
 
-    node = scoped_tree.get_node_for_id(node["node_id"])
-    data_deps = data_deps_for_node(scoped_tree, node)
-    response = [to_syntax_node(scoped_tree.syntax_tree, dep) for dep in data_deps]
+    node, ctx = get_node_and_context_for_id(scoped_tree.syntax_tree, node["node_id"])
+    data_deps = data_deps_for_node_in_context(scoped_tree, node, ctx)
+    response = [to_syntax_node(scoped_tree.syntax_tree, dep, dep_ctx) for dep, dep_ctx in data_deps]
     return response
 
 def get_control_dependencies(tree_id: str, node: dict) -> list[server_interface.ControlDependency]:
-    print("get_control_dependencies")
 
     _, scoped_tree = _SESSION[tree_id]
 
-    node = scoped_tree.get_node_for_id(node["node_id"])
-    control_deps = control_parents_for_node(scoped_tree, node)
+    node, ctx = get_node_and_context_for_id(scoped_tree.syntax_tree, node["node_id"])
+    control_deps = control_parents_for_node_in_context(scoped_tree, node, ctx)
     response = []
-    for dep in control_deps:
+    for dep, dep_ctx in control_deps:
         if isinstance(dep, ast.If):
             kind = "if"
             control_node = dep.test
-            body = [to_syntax_node(scoped_tree.syntax_tree, dep.body)]
+            body = [to_syntax_node(scoped_tree.syntax_tree, dep.body, dep_ctx)]
             if hasattr(dep, "orelse"):
-                body.append(to_syntax_node(scoped_tree.syntax_tree, dep.orelse))
+                body.append(to_syntax_node(scoped_tree.syntax_tree, dep.orelse, dep_ctx))
         elif isinstance(dep, ast.While):
             kind = "while"
             control_node = dep.test
-            body = [to_syntax_node(scoped_tree.syntax_tree, dep.body)]
+            body = [to_syntax_node(scoped_tree.syntax_tree, dep.body, dep_ctx)]
         elif isinstance(dep, ast.For):
             kind = "for"
             control_node = dep.iter
-            body = [to_syntax_node(scoped_tree.syntax_tree, dep.body)]
+            body = [to_syntax_node(scoped_tree.syntax_tree, dep.body, dep_ctx)]
             
         response.append(server_interface.ControlDependency(
-            to_syntax_node(scoped_tree.syntax_tree, dep),
+            to_syntax_node(scoped_tree.syntax_tree, dep, dep_ctx),
             kind,
-            to_syntax_node(scoped_tree.syntax_tree, control_node),
+            to_syntax_node(scoped_tree.syntax_tree, control_node, dep_ctx),
             body
         ))
 
     return response
 
+def mask_node(valuation: dict[str,interval_arithmetic.Interval], node: ast.AST, interval: interval_arithmetic.Interval):
+    if isinstance(node, ast.Assign):
+        program_variable_symbol = get_assignment_name(node).id
+        valuation[program_variable_symbol] = interval
+    elif isinstance(node, ast.FunctionDef):
+        program_variable_symbol = node.name
+        valuation[program_variable_symbol] = interval
+    else:
+        logger.warning(f"Cannot mask node of type {type(node)} {source_text(node)}.")
+
 def estimate_value_range(tree_id: str, expr: dict, mask: list[tuple[dict, dict]]) -> server_interface.Interval:
-    print("estimate_value_range")
 
     _, scoped_tree = _SESSION[tree_id]
 
@@ -176,14 +209,7 @@ def estimate_value_range(tree_id: str, expr: dict, mask: list[tuple[dict, dict]]
         interval = server_interface.Interval.from_dict(interval)
         parsed_interval = interval_arithmetic.Interval(float(interval.low), float(interval.high))
         node = scoped_tree.get_node_for_id(_node.node_id)
-        if isinstance(node, ast.Assign):
-            program_variable_symbol = get_assignment_name(node).id
-            valuation[program_variable_symbol] = parsed_interval
-        elif isinstance(node, ast.FunctionDef):
-            program_variable_symbol = node.name
-            valuation[program_variable_symbol] = parsed_interval
-        else:
-            print(f"Cannot mask node of type {type(node)} {source_text(node)}.")
+        mask_node(valuation, node, parsed_interval)
 
     expr = server_interface.SyntaxNode.from_dict(expr)
     node_to_evaluate = scoped_tree.get_node_for_id(expr.node_id)
@@ -192,15 +218,98 @@ def estimate_value_range(tree_id: str, expr: dict, mask: list[tuple[dict, dict]]
 
     return server_interface.Interval(str(res.low), str(res.high))
 
+def get_random_variable_order(scoped_tree: ScopedTree, random_variables: list[server_interface.RandomVariable]) -> list[int]:
+    # indices of random_variables in topological order of their data dependencies (parents first, otherwise program order).
+    # The data dependencies of the distribution are followed until they reach a random variable (as in the model graph).
+    rv_index = {rv.node.node_id: i for i, rv in enumerate(random_variables)}
+    children: list[list[int]] = [[] for _ in random_variables]
+    n_parents = [0] * len(random_variables)
+    for i, rv in enumerate(random_variables):
+        parents = set()
+        marked = {rv.distribution.node.node_id}
+        queue = [get_node_and_context_for_id(scoped_tree.syntax_tree, rv.distribution.node.node_id)]
+        while len(queue) > 0:
+            node, ctx = queue.pop()
+            for dep, dep_ctx in data_deps_for_node_in_context(scoped_tree, node, ctx):
+                dep_id = get_node_id(scoped_tree.syntax_tree, dep, dep_ctx)
+                if dep_id in marked:
+                    continue
+                marked.add(dep_id)
+                if dep_id in rv_index:
+                    parents.add(rv_index[dep_id])
+                else:
+                    queue.append((dep, dep_ctx))
+        parents.discard(i)
+        for j in parents:
+            children[j].append(i)
+        n_parents[i] = len(parents)
+
+    order = []
+    ready = [i for i in range(len(random_variables)) if n_parents[i] == 0]
+    heapq.heapify(ready)
+    while len(ready) > 0:
+        i = heapq.heappop(ready)
+        order.append(i)
+        for j in children[i]:
+            n_parents[j] -= 1
+            if n_parents[j] == 0:
+                heapq.heappush(ready, j)
+    # random variables on a dependency cycle (e.g. in loops) are processed in program order
+    ordered = set(order)
+    order += [i for i in range(len(random_variables)) if i not in ordered]
+    return order
+
+def estimate_parameter_ranges(tree_id: str, random_variables: list[tuple[dict, Optional[dict]]]) -> list[list[server_interface.Interval]]:
+    # Value ranges of the distribution parameters of all random variables (e.g. for constraint verification).
+    # Random variables are masked by their support (None if the support is not an interval) in topological order,
+    # such that support bounds which are distribution parameters are estimated with the supports of all parent random variables.
+    # Returns the estimated ranges of the parameters of each random variable (in the order of distribution.params).
+
+    _, scoped_tree = _SESSION[tree_id]
+
+    rvs = [server_interface.RandomVariable.from_dict(rv) for rv, _ in random_variables]
+    supports = [server_interface.Support.from_dict(support) if support is not None else None for _, support in random_variables]
+
+    def estimate(node: server_interface.SyntaxNode, valuation) -> interval_arithmetic.Interval:
+        return interval_arithmetic.static_interval_eval(scoped_tree, scoped_tree.get_node_for_id(node.node_id), valuation)
+
+    def get_bound(rv: server_interface.RandomVariable, bound: str, is_param: bool, valuation, low: bool) -> Optional[float]:
+        if not is_param:
+            return float(bound)
+        param = next((param for param in rv.distribution.params if param.name == bound), None)
+        if param is None:
+            return None
+        estimated_range = estimate(param.node, valuation)
+        return float(estimated_range.low if low else estimated_range.high)
+
+    valuation = {}
+    for i in get_random_variable_order(scoped_tree, rvs):
+        rv, support = rvs[i], supports[i]
+        if support is None:
+            continue
+        low = get_bound(rv, support.low, support.low_is_param, valuation, True)
+        high = get_bound(rv, support.high, support.high_is_param, valuation, False)
+        if low is None or high is None:
+            logger.warning(f"Cannot mask support of {rv.node.source_text}.")
+            continue
+        mask_node(valuation, scoped_tree.get_node_for_id(rv.node.node_id), interval_arithmetic.Interval(low, high))
+
+    response = []
+    for rv in rvs:
+        ranges = [estimate(param.node, valuation) for param in rv.distribution.params]
+        response.append([server_interface.Interval(str(res.low), str(res.high)) for res in ranges])
+    return response
+
 
 def get_call_graph(tree_id: str, node: dict) -> list[server_interface.CallGraphNode]:
-    print("get_call_graph")
 
     _, scoped_tree = _SESSION[tree_id]
 
     node = scoped_tree.get_node_for_id(node["node_id"])
 
-    call_graph = compute_call_graph(scoped_tree.root_node, scoped_tree.scope_info, node)
+    if tree_id not in _CALL_GRAPHS:
+        _CALL_GRAPHS[tree_id] = CallGraph(scoped_tree.root_node)
+    call_graph = _CALL_GRAPHS[tree_id].get_subgraph(node)
 
     call_nodes = []
     for caller, called in call_graph.items():
@@ -213,7 +322,6 @@ def get_call_graph(tree_id: str, node: dict) -> list[server_interface.CallGraphN
 
 
 def get_path_conditions(tree_id: str, root: dict, nodes: list[dict], mask: list[tuple[dict, server_interface.SymbolicExpression]]) -> list[server_interface.SymbolicExpression]:
-    print("get_path_conditions")
     _, scoped_tree = _SESSION[tree_id]
 
     root = scoped_tree.get_node_for_id(root["node_id"])
@@ -224,8 +332,18 @@ def get_path_conditions(tree_id: str, root: dict, nodes: list[dict], mask: list[
     path_conditions = [server_interface.SymbolicExpression(symbolic.path_condition_to_str(result[node])) for node in nodes]
     return path_conditions
 
+def get_stats() -> dict:
+    # per-method statistics of the server and cache lookups of each session (see server_stats.py)
+    stats = SERVER_STATS.to_dict()
+    stats["sessions"] = {tree_id: scoped_tree.get_cache_stats() for tree_id, (_, scoped_tree) in list(_SESSION.items())}
+    for tree_id, call_graph in list(_CALL_GRAPHS.items()):
+        if tree_id in stats["sessions"]:
+            stats["sessions"][tree_id]["call_graph"] = call_graph.get_cache_stats()
+    return stats
+
 def ping() -> str:
     return "pong"
 
 def clear_session():
-    _SESSION.clear()
\ No newline at end of file
+    _SESSION.clear()
+    _CALL_GRAPHS.clear()
\ No newline at end of file
@@ -59,6 +59,15 @@ class Interval:
     low: str
     high: str
 
+@dataclass_json
+@dataclass
+class Support:
+    # bounds are numbers or, if low_is_param / high_is_param, the name of the distribution parameter that they are equal to
+    low: str
+    high: str
+    low_is_param: bool = False
+    high_is_param: bool = False
+
 @dataclass_json
 @dataclass
 class SymbolicExpression:
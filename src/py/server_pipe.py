@@ -4,6 +4,7 @@ from jsonrpc import dispatcher
 import os
 from pathlib import Path
 from jsonrpc_server import *
+from server_stats import SERVER_STATS, logger, parse_server_args
 
 
 def run_server(socket_name, dispatcher):
@@ -13,24 +14,25 @@ def run_server(socket_name, dispatcher):
         while True:
             server.listen(1)
             sock, addr = server.accept()
-            print("Hello", sock)
+            logger.info("Hello %s", sock)
             reader = sock.makefile(mode='rb') # binary
             writer = sock.makefile(mode='wb') # binary
-            handle_client(reader, writer, dispatcher)
+            handle_client(reader, writer, dispatcher, SERVER_STATS)
             reader.close()
             writer.close()
             sock.close()
             clear_session()
-            print("Bye", sock)
+            logger.info("Bye %s", sock)
     except KeyboardInterrupt:
-        print("Interrupt server.")
+        logger.info("Interrupt server.")
     finally:
-        print("Close server.")
+        logger.info("Close server.")
         server.close()
         os.remove(socket_name)
         
 
 if __name__ == '__main__':
+    args = parse_server_args()
     # socket_name = sys.argv[1]
     Path("./.pipe").mkdir(exist_ok=True)
     socket_name = "./.pipe/python_rpc_socket"
@@ -38,7 +40,7 @@ if __name__ == '__main__':
     if os.path.exists(socket_name):
         os.remove(socket_name)
 
-    print("Started Python Language Server", socket_name)
+    logger.info("Started Python Language Server %s", socket_name)
 
     dispatcher["build_ast"] = build_ast
     dispatcher["build_ast_for_file_content"] = build_ast_for_file_content
@@ -48,7 +50,13 @@ if __name__ == '__main__':
     dispatcher["get_data_dependencies"] = get_data_dependencies
     dispatcher["get_control_dependencies"] = get_control_dependencies
     dispatcher["estimate_value_range"] = estimate_value_range
+    dispatcher["estimate_parameter_ranges"] = estimate_parameter_ranges
     dispatcher["get_call_graph"] = get_call_graph
     dispatcher["get_path_conditions"] = get_path_conditions
+    dispatcher["get_stats"] = get_stats
+
+    SERVER_STATS.instrument(dispatcher)
+    if args.stats_interval > 0:
+        SERVER_STATS.start_periodic_dump(args.stats_interval, get_stats)
 
     run_server(socket_name, dispatcher)
\ No newline at end of file
@@ -0,0 +1,118 @@
+import time
+import json
+import bisect
+import logging
+import functools
+import threading
+import argparse
+import os
+from typing import Callable, Any, Optional
+
+# Instrumentation of the RPC methods of the server.
+# instrument(dispatcher) wraps every registered method, such that for each method we record
+# number of calls, errors, latency (total, max and histogram) and size of requests and responses (characters of the JSON messages).
+# The statistics are returned by the get_stats RPC (see server.py) and can be logged periodically (start_periodic_dump).
+#
+# Messages of the server go through the logger "lasapp.server", the method name of each request is logged at level DEBUG.
+
+logger = logging.getLogger("lasapp.server")
+
+# upper bounds of the latency histogram buckets in milliseconds, the last bucket counts all slower calls
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+LATENCY_BUCKET_LABELS = [f"<={bound}" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+
+class MethodStats:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.
+        self.max_time = 0.
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.request_size = 0
+        self.response_size = 0
+
+    def record_call(self, t: float, failed: bool):
+        self.calls += 1
+        self.errors += failed
+        self.total_time += t
+        self.max_time = max(self.max_time, t)
+        self.histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, t * 1000)] += 1
+
+    def to_dict(self) -> dict[str,Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_time": self.total_time,
+            "mean_time": self.total_time / self.calls if self.calls > 0 else 0.,
+            "max_time": self.max_time,
+            "latency_histogram_ms": {label: count for label, count in zip(LATENCY_BUCKET_LABELS, self.histogram) if count > 0},
+            "request_size": self.request_size,
+            "response_size": self.response_size,
+        }
+
+class ServerStats:
+    def __init__(self) -> None:
+        self.methods: dict[str,MethodStats] = dict()
+        self.started = time.time()
+        self.lock = threading.Lock() # for the periodic dump
+        self.current_method: Optional[str] = None # method of the request which is handled
+
+    def instrument(self, dispatcher):
+        for method, f in list(dispatcher.items()):
+            dispatcher[method] = self._wrap(method, f)
+
+    def _wrap(self, method: str, f: Callable) -> Callable:
+        @functools.wraps(f)
+        def instrumented(*args, **kwargs):
+            logger.debug(method)
+            self.current_method = method
+            failed = True
+            t0 = time.perf_counter()
+            try:
+                result = f(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                t = time.perf_counter() - t0
+                with self.lock:
+                    self.methods.setdefault(method, MethodStats()).record_call(t, failed)
+        return instrumented
+
+    def record_payload(self, request_size: int, response_size: int):
+        # called by the transport layer after the response of the current request is serialised
+        if self.current_method is None:
+            return # invalid request or unknown method
+        with self.lock:
+            stats = self.methods.setdefault(self.current_method, MethodStats())
+            stats.request_size += request_size
+            stats.response_size += response_size
+        self.current_method = None
+
+    def to_dict(self) -> dict[str,Any]:
+        with self.lock:
+            return {
+                "uptime": time.time() - self.started,
+                "methods": {method: stats.to_dict() for method, stats in sorted(self.methods.items())}
+            }
+
+    def start_periodic_dump(self, interval: float, get_stats: Callable[[], dict]) -> threading.Thread:
+        # logs get_stats() every interval seconds at level INFO
+        def dump():
+            while True:
+                time.sleep(interval)
+                logger.info("Stats: %s", json.dumps(get_stats()))
+        thread = threading.Thread(target=dump, daemon=True)
+        thread.start()
+        return thread
+
+SERVER_STATS = ServerStats()
+
+def parse_server_args():
+    # command line options of server_pipe.py and server_stdio.py, configures the logger
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--log_level", default=os.environ.get("LASAPP_LOG_LEVEL", "INFO"), help="DEBUG logs every request")
+    parser.add_argument("--stats_interval", type=float, default=0, help="log statistics every stats_interval seconds (0 disables)")
+    args = parser.parse_args()
+    # stderr, stdout may be the transport layer
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(message)s")
+    return args
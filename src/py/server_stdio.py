@@ -4,19 +4,21 @@ from jsonrpc import dispatcher
 import os
 from pathlib import Path
 from jsonrpc_server import *
+from server_stats import SERVER_STATS, logger, parse_server_args
 
 
 def run_server(dispatcher):
     reader = sys.stdin.buffer
     writer = sys.stdout.buffer
-    handle_client(reader, writer, dispatcher)
+    handle_client(reader, writer, dispatcher, SERVER_STATS)
     reader.close()
     writer.close()
         
 
 if __name__ == '__main__':
+    args = parse_server_args()
 
-    print("Started Python Language Server stdio")
+    logger.info("Started Python Language Server stdio")
 
     dispatcher["build_ast"] = build_ast
     dispatcher["build_ast_for_file_content"] = build_ast_for_file_content
@@ -26,9 +28,15 @@ if __name__ == '__main__':
     dispatcher["get_data_dependencies"] = get_data_dependencies
     dispatcher["get_control_dependencies"] = get_control_dependencies
     dispatcher["estimate_value_range"] = estimate_value_range
+    dispatcher["estimate_parameter_ranges"] = estimate_parameter_ranges
     dispatcher["get_call_graph"] = get_call_graph
     dispatcher["get_path_conditions"] = get_path_conditions
     
+    dispatcher["get_stats"] = get_stats
     dispatcher["ping"] = ping
 
+    SERVER_STATS.instrument(dispatcher)
+    if args.stats_interval > 0:
+        SERVER_STATS.start_periodic_dump(args.stats_interval, get_stats)
+
     run_server(dispatcher)
\ No newline at end of file
@@ -87,3 +87,40 @@ def C():
         self.assertTrue(call_graph[C] == [E])
         self.assertTrue(B in call_graph[D] and C in call_graph[D])
         self.assertTrue(call_graph[E] == [D])
+
+    def test_3(self):
+        # functions with the same name in different scopes are different nodes of the call graph
+        source_code = """
+def A():
+    return 1
+
+def B():
+    def A():
+        return 2
+    return A()
+
+def C():
+    return A() + B()
+"""
+
+        parsed_ast = ast.parse(source_code)
+        line_offsets = get_line_offsets_for_str(source_code)
+        syntax_tree = preprocess_syntaxtree(parsed_ast, source_code, line_offsets, 0, uniquify_calls=False)
+        scoped_tree = get_scoped_tree(syntax_tree)
+
+        A = scoped_tree.root_node.body[0]
+        B = scoped_tree.root_node.body[1]
+        C = scoped_tree.root_node.body[2]
+        BA = B.body[0]
+
+        call_graph = CallGraph(scoped_tree.root_node)
+        subgraph = call_graph.get_subgraph(C)
+        self.assertTrue(subgraph[C] == [A,B])
+        self.assertTrue(subgraph[B] == [BA])
+        self.assertTrue(subgraph[A] == [] and subgraph[BA] == [])
+        self.assertTrue(subgraph == compute_call_graph(scoped_tree.root_node, scoped_tree.scope_info, C))
+
+        # second query is a cache lookup
+        self.assertTrue(call_graph.get_subgraph(C) == subgraph)
+        self.assertTrue(call_graph.get_cache_stats()["hits"] == 1)
+        self.assertTrue(call_graph.get_subgraph(None).keys() == {A, B, BA, C})
@@ -329,3 +329,83 @@ test(arg_a, b=arg_b2)
 
         data_deps = data_deps_for_node(scoped_tree, b)
         self.assertTrue({ast.unparse(n) for n in data_deps} == set(['arg_b = 1', 'arg_b2 = 2']))
+
+    def test_13(self):
+        source_code = """
+def g(y):
+    return y
+
+def f(x):
+    z = g(x)
+    return z
+
+a = 1
+b = 2
+c = f(a)
+d = f(b)
+        """
+        parsed_ast = ast.parse(source_code)
+        line_offsets = get_line_offsets_for_str(source_code)
+        syntax_tree = preprocess_syntaxtree(parsed_ast, source_code, line_offsets, 0)
+        scoped_tree = get_scoped_tree(syntax_tree)
+
+        g_def, f_def = scoped_tree.root_node.body[0], scoped_tree.root_node.body[1]
+        a_ass, b_ass = scoped_tree.root_node.body[2], scoped_tree.root_node.body[3]
+        c_call, d_call = scoped_tree.root_node.body[4].value, scoped_tree.root_node.body[5].value
+        g_call = f_def.body[0].value
+        y = g_def.args.args[0]
+
+        call_contexts = scoped_tree.get_call_contexts()
+        self.assertEqual(call_contexts.get_contexts(f_def), [(c_call,), (d_call,)])
+        self.assertEqual(call_contexts.get_contexts(g_def), [(c_call, g_call), (d_call, g_call)])
+
+        # context-insensitive: union over all call sites
+        data_deps = data_deps_for_node(scoped_tree, y)
+        self.assertEqual({ast.unparse(n) for n in data_deps}, {'x'})
+        self.assertEqual(data_deps_for_node(scoped_tree, f_def.args.args[0]), {a_ass, b_ass})
+
+        # context-sensitive: follow the call string back to the call site
+        data_deps = data_deps_for_node_in_context(scoped_tree, y, (d_call, g_call))
+        self.assertEqual(data_deps, {(f_def.args.args[0], (d_call,))})
+        data_deps = data_deps_for_node_in_context(scoped_tree, f_def.args.args[0], (d_call,))
+        self.assertEqual(data_deps, {(b_ass, ())})
+
+        # function in context of call
+        data_deps = data_deps_for_node_in_context(scoped_tree, scoped_tree.root_node.body[4], ())
+        self.assertEqual(data_deps, {(f_def, (c_call,)), (a_ass, ())})
+        data_deps = data_deps_for_node_in_context(scoped_tree, f_def, (c_call,))
+        self.assertEqual(data_deps, {(f_def.body[0], (c_call,))})
+
+    def test_14(self):
+        # reachability queries do not modify the CFG, so control parents can be computed concurrently
+        source_code = """
+def f(x, y):
+    z = 0
+    while x > 0:
+        if y > 0:
+            return z
+        z = z + x
+    for i in range(y):
+        if i > x:
+            z = z - i
+    return z
+        """
+        parsed_ast = ast.parse(source_code)
+        line_offsets = get_line_offsets_for_str(source_code)
+        syntax_tree = preprocess_syntaxtree(parsed_ast, source_code, line_offsets, 0)
+        scoped_tree = get_scoped_tree(syntax_tree)
+
+        nodes = [node for node in ast.walk(scoped_tree.root_node.body[0]) if isinstance(node, (ast.Assign, ast.Return))]
+        expected = [control_parents_for_node(scoped_tree, node) for node in nodes]
+
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            for _ in range(5):
+                result = list(executor.map(lambda node: control_parents_for_node(scoped_tree, node), nodes))
+                self.assertEqual(result, expected)
+
+        # early return in while loop
+        while_node = scoped_tree.root_node.body[0].body[1]
+        if_node = while_node.body[0]
+        z_assign = while_node.body[1]
+        self.assertEqual(control_parents_for_node(scoped_tree, z_assign), {while_node, if_node})
@@ -81,4 +81,30 @@ exp(b)
         y = Interval(2,3)
         z = Interval(2)
         result = static_interval_eval(scoped_tree, node_to_evaluate, {"x": x, "y": y, "z": z})
-        self.assertEqual(result, exp(mul(union(add(x, y), sub(x, y)), z)))
\ No newline at end of file
+        self.assertEqual(result, exp(mul(union(add(x, y), sub(x, y)), z)))
+
+    def test_5(self):
+        # constant data literals are collapsed in preprocessing
+        data = ", ".join(str(i % 7 - 3) for i in range(100))
+        source_code = f"""
+x = np.array([{data}, 2.5])
+y = [[{data}], [{data}]]
+x * 2
+y
+        """
+        parsed_ast = ast.parse(source_code)
+        line_offsets = get_line_offsets_for_str(source_code)
+        syntax_tree = preprocess_syntaxtree(parsed_ast, source_code, line_offsets, 0)
+        scoped_tree = get_scoped_tree(syntax_tree)
+
+        x_literal = scoped_tree.root_node.body[0].value.args[0]
+        self.assertTrue(isinstance(x_literal, ConstantArray))
+        self.assertEqual((x_literal.length, x_literal.dtype), (101, "float"))
+        self.assertEqual(source_text(x_literal), f"[{data}, 2.5]")
+        y_literal = scoped_tree.root_node.body[1].value
+        self.assertEqual((y_literal.length, y_literal.size, y_literal.dtype), (2, 200, "int"))
+
+        result = static_interval_eval(scoped_tree, scoped_tree.root_node.body[2].value, {})
+        self.assertEqual(result, Interval(-6, 6))
+        result = static_interval_eval(scoped_tree, scoped_tree.root_node.body[3].value, {})
+        self.assertEqual(result, Interval(-3, 3))
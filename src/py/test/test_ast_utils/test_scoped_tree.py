@@ -53,3 +53,149 @@ a,b,c = 2,3,4
         self.assertEqual(len(scoped_tree.all_definitions), 5)
         self.assertTrue(scoped_tree.all_definitions[1].name.startswith('__TMP__'))
         self.assertEqual([ass.name for ass in scoped_tree.all_definitions], ['x', scoped_tree.all_definitions[1].name, 'a', 'b', 'c'])
+
+    def test_3(self):
+        source_code = """
+def f(x):
+    y = x + 1
+    return y
+def g(z):
+    return 2 * z
+a = f(1)
+        """
+        parsed_ast = ast.parse(source_code)
+        line_offsets = get_line_offsets_for_str(source_code)
+        syntax_tree = preprocess_syntaxtree(parsed_ast, source_code, line_offsets, 0)
+        scoped_tree = get_scoped_tree(syntax_tree, verify_cfgs=True)
+        self.assertEqual(len(scoped_tree.cfgs), 0)
+
+        node = scoped_tree.root_node
+        f_def = node.body[0]
+        g_def = node.body[1]
+        y_assign = f_def.body[0]
+
+        cfg, cfgnode = scoped_tree.get_cfgnode_for_syntaxnode(y_assign.value)
+        self.assertIsInstance(cfgnode, AssignNode)
+        self.assertEqual(cfgnode.syntaxnode, y_assign)
+        self.assertIs(scoped_tree.get_cfg_for_function_syntaxnode(f_def), cfg)
+        self.assertTrue(f_def in scoped_tree.cfgs)
+        self.assertFalse(g_def in scoped_tree.cfgs)
+        self.assertFalse(node in scoped_tree.cfgs)
+
+    def test_4(self):
+        source_code = """
+def f(x):
+    def g(y):
+        return y
+    return g(x)
+a = f(1)
+b = f(2)
+        """
+        parsed_ast = ast.parse(source_code)
+        line_offsets = get_line_offsets_for_str(source_code)
+        syntax_tree = preprocess_syntaxtree(parsed_ast, source_code, line_offsets, 0, uniquify_calls=True)
+        scoped_tree = get_scoped_tree(syntax_tree)
+
+        node = scoped_tree.root_node
+        f_def, f0_def, f1_def = node.body[0], node.body[1], node.body[2]
+        self.assertEqual([f0_def.name, f1_def.name], ['f_0', 'f_1'])
+        a_call, b_call = node.body[3].value, node.body[4].value
+        self.assertTrue(scoped_tree.identifieres_are_the_same(a_call.func, f0_def))
+        self.assertTrue(scoped_tree.identifieres_are_the_same(b_call.func, f1_def))
+        self.assertFalse(scoped_tree.identifieres_are_the_same(a_call.func, f_def))
+
+        # copies have their own parameters and nested functions
+        x0, x1 = f0_def.args.args[0], f1_def.args.args[0]
+        self.assertFalse(scoped_tree.identifieres_are_the_same(x0, x1))
+        g0_def = f0_def.body[0]
+        g0_call = f0_def.body[1].value
+        self.assertTrue(scoped_tree.identifieres_are_the_same(g0_call.func, g0_def))
+        self.assertTrue(scoped_tree.identifieres_are_the_same(g0_call.args[0], x0))
+        self.assertFalse(scoped_tree.identifieres_are_the_same(g0_def, f1_def.body[0]))
+        self.assertEqual(scoped_tree.get_call_sites(g0_def), [g0_call])
+
+    def test_5(self):
+        source_code = """
+def f(x):
+    for i in range(x):
+        y = i + 1
+    x + y
+a = f(1)
+        """
+        parsed_ast = ast.parse(source_code)
+        line_offsets = get_line_offsets_for_str(source_code)
+        syntax_tree = preprocess_syntaxtree(parsed_ast, source_code, line_offsets, 0)
+        scoped_tree = get_scoped_tree(syntax_tree)
+
+        node = scoped_tree.root_node
+        f_def = node.body[0]
+        for_node = f_def.body[0]
+        y_assign = for_node.body[0]
+        expr_node = f_def.body[1]
+
+        _, cfgnode = scoped_tree.get_cfgnode_for_syntaxnode(y_assign.value.left)
+        self.assertIsInstance(cfgnode, AssignNode)
+        self.assertEqual(cfgnode.syntaxnode, y_assign)
+        _, cfgnode = scoped_tree.get_cfgnode_for_syntaxnode(for_node.target)
+        self.assertIsInstance(cfgnode, LoopIterNode)
+        _, cfgnode = scoped_tree.get_cfgnode_for_syntaxnode(for_node.iter.args[0])
+        self.assertIsInstance(cfgnode, BranchNode)
+        # last expression is transformed to return node
+        _, cfgnode = scoped_tree.get_cfgnode_for_syntaxnode(expr_node.value.left)
+        self.assertIsInstance(cfgnode, ReturnNode)
+        with self.assertRaises(Exception):
+            scoped_tree.get_cfgnode_for_syntaxnode(f_def)
+
+    def test_6(self):
+        source_code = """
+x = [1, 2]
+y = x[0]
+def f(x):
+    return x + y
+        """
+        parsed_ast = ast.parse(source_code)
+        line_offsets = get_line_offsets_for_str(source_code)
+        syntax_tree = preprocess_syntaxtree(parsed_ast, source_code, line_offsets, 0)
+        scoped_tree = get_scoped_tree(syntax_tree)
+
+        node = scoped_tree.root_node
+        x_global = node.body[0].targets[0]
+        y_global = node.body[1].targets[0]
+        x_param = node.body[2].args.args[0]
+        self.assertTrue(scoped_tree.is_container_variable(x_global))
+        self.assertFalse(scoped_tree.is_container_variable(y_global))
+        self.assertFalse(scoped_tree.is_container_variable(x_param))
+
+    def test_7(self):
+        source_code = """
+def f(x):
+    y = 0
+    for i in range(x):
+        if i > 1:
+            y = y + i
+    return y
+        """
+        parsed_ast = ast.parse(source_code)
+        line_offsets = get_line_offsets_for_str(source_code)
+        syntax_tree = preprocess_syntaxtree(parsed_ast, source_code, line_offsets, 0)
+        scoped_tree = get_scoped_tree(syntax_tree)
+
+        f_def = scoped_tree.root_node.body[0]
+        cfg = scoped_tree.get_cfg(f_def)
+        compact = cfg.get_compact()
+        self.assertEqual(len(compact), len(cfg.nodes) + 2)
+        self.assertEqual(compact.nodes[0], cfg.startnode)
+        self.assertEqual(compact.nodes[-1], cfg.endnode)
+        for node in compact.nodes:
+            i = compact.index[node]
+            self.assertEqual({compact.nodes[j] for j in compact.successors(i)}, node.children)
+            self.assertEqual({compact.nodes[j] for j in compact.predecessors(i)}, node.parents)
+            forward = compact.reach([i])
+            for other in compact.nodes:
+                self.assertEqual(bool(forward[compact.index[other]]), node == other or is_reachable(node, other))
+
+        # paths from start to end avoiding the loop branch node
+        branch_node = next(node for node in cfg.nodes if isinstance(node, BranchNode) and isinstance(node.syntaxnode, ast.Call))
+        reach = compact.reach([0], excluded=compact.mask([branch_node]))
+        self.assertTrue(reach[compact.index[branch_node]])
+        self.assertFalse(reach[compact.index[cfg.endnode]])
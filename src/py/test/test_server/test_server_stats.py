@@ -0,0 +1,101 @@
+import unittest
+import sys
+sys.path.insert(0, 'src/py') # hack for now
+
+import io
+import json
+from unittest import mock
+from jsonrpc import Dispatcher
+
+from server_stats import ServerStats, MethodStats, LATENCY_BUCKET_LABELS
+from jsonrpc_server import handle_client, write_transport_layer
+import server
+
+def get_requests(*requests) -> io.BytesIO:
+    stream = io.BytesIO()
+    for i, (method, params) in enumerate(requests):
+        write_transport_layer(stream, json.dumps({"jsonrpc": "2.0", "id": i, "method": method, "params": params}))
+    stream.seek(0)
+    return stream
+
+def get_responses(stream: io.BytesIO) -> list[str]:
+    responses = []
+    data = stream.getvalue()
+    while len(data) > 0:
+        header, _, data = data.partition(b"\r\n\r\n")
+        length = int(header.decode("utf8").split(":")[1])
+        responses.append(data[:length].decode("utf8"))
+        data = data[length:]
+    return responses
+
+def fail():
+    raise ValueError("fail")
+
+class TestServerStats(unittest.TestCase):
+    def test_1(self):
+        # latency histogram buckets, upper bounds in milliseconds are inclusive
+        stats = MethodStats()
+        for t in [0.0005, 0.001, 0.0015, 0.2, 0.2001, 20.]:
+            stats.record_call(t, False)
+        stats.record_call(0.003, True)
+        d = stats.to_dict()
+        self.assertEqual(d["calls"], 7)
+        self.assertEqual(d["errors"], 1)
+        self.assertEqual(d["latency_histogram_ms"], {"<=1": 2, "<=2": 1, "<=5": 1, "<=200": 1, "<=500": 1, ">10000": 1})
+        self.assertEqual(sum(stats.histogram), 7)
+        self.assertEqual(len(stats.histogram), len(LATENCY_BUCKET_LABELS))
+        self.assertAlmostEqual(d["max_time"], 20.)
+        self.assertAlmostEqual(d["mean_time"], d["total_time"] / 7)
+
+    def test_2(self):
+        # instrumented dispatcher counts calls and errors, payload sizes are attributed to the method of the request
+        dispatcher = Dispatcher()
+        dispatcher["echo"] = lambda text: text
+        dispatcher["fail"] = fail
+        stats = ServerStats()
+        stats.instrument(dispatcher)
+
+        reader = get_requests(("echo", ["hello"]), ("fail", []), ("echo", ["world!"]), ("unknown", []))
+        writer = io.BytesIO()
+        with self.assertLogs("jsonrpc.manager", level="ERROR"): # exception of fail
+            handle_client(reader, writer, dispatcher, stats)
+        responses = get_responses(writer)
+        self.assertEqual(len(responses), 4)
+        self.assertEqual(json.loads(responses[0])["result"], "hello")
+        self.assertIn("error", json.loads(responses[1]))
+
+        requests = get_responses(get_requests(("echo", ["hello"]), ("fail", []), ("echo", ["world!"])))
+        d = stats.to_dict()["methods"]
+        self.assertEqual(set(d.keys()), {"echo", "fail"}) # unknown method is not recorded
+        self.assertEqual((d["echo"]["calls"], d["echo"]["errors"]), (2, 0))
+        self.assertEqual((d["fail"]["calls"], d["fail"]["errors"]), (1, 1))
+        self.assertEqual(d["echo"]["request_size"], len(requests[0]) + len(requests[2]))
+        self.assertEqual(d["echo"]["response_size"], len(responses[0]) + len(responses[2]))
+        self.assertEqual(d["fail"]["request_size"], len(requests[1]))
+        self.assertEqual(d["fail"]["response_size"], len(responses[1]))
+        self.assertIsNone(stats.current_method)
+
+    def test_3(self):
+        # get_stats RPC returns the statistics of the instrumented methods, including itself
+        dispatcher = Dispatcher()
+        dispatcher["ping"] = server.ping
+        dispatcher["get_stats"] = server.get_stats
+        stats = ServerStats()
+        stats.instrument(dispatcher)
+
+        with mock.patch.object(server, "SERVER_STATS", stats):
+            reader = get_requests(("ping", []), ("ping", []), ("get_stats", []))
+            writer = io.BytesIO()
+            handle_client(reader, writer, dispatcher, stats)
+        responses = get_responses(writer)
+        result = json.loads(responses[2])["result"]
+        self.assertEqual(result["methods"]["ping"]["calls"], 2)
+        self.assertEqual(result["methods"]["ping"]["response_size"], len(responses[0]) + len(responses[1]))
+        # get_stats is recorded after it returns
+        self.assertNotIn("get_stats", result["methods"])
+        self.assertEqual(stats.to_dict()["methods"]["get_stats"]["calls"], 1)
+        self.assertIn("sessions", result)
+        self.assertGreaterEqual(result["uptime"], 0.)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -55,82 +55,58 @@ def get_param_with_name(distribution: lasapp.server_interface.Distribution, name
             return param
     return None
 
-def Interval(program: lasapp.ProbabilisticProgram,
-             mask: dict[lasapp.SyntaxNode, lasapp.Interval],
-             rv: lasapp.RandomVariable,
-             _support: dists.Constraint):
+def get_support(rv: lasapp.RandomVariable, _support: dists.Constraint):
+    # the support of a random variable as mask for the value range estimation, bounds may be parameters of the distribution
     support = dists.to_interval(_support)
-    if support is not None:
-        # if the support contains a symbol, we statically evaluate the support first
-        
-        if isinstance(support.low, dists.ParamDependentBound):
-            # parameter dependent support
-            param = get_param_with_name(rv.distribution, support.low.param)
-            if param is not None:
-                estimated_range = program.estimate_value_range(
-                    expr=param.node,
-                    mask=mask # mask up to now, rvs are sorted
-                )
-                support.low = float(estimated_range.low) # probably estimated_range.low == estimated_range.high
-            else:
+    if support is None:
+        return None
+
+    bounds = []
+    for bound in (support.low, support.high):
+        if isinstance(bound, dists.ParamDependentBound):
+            # parameter dependent support, the bound is estimated by the server
+            if get_param_with_name(rv.distribution, bound.param) is None:
                 return None
+            bounds.append((bound.param, True))
+        else:
+            bounds.append((str(bound), False))
 
-        if isinstance(support.high, dists.ParamDependentBound):
-            # parameter dependent support
-            param = get_param_with_name(rv.distribution, support.high.param)
-            if param is not None:
-                estimated_range = program.estimate_value_range(
-                    expr=param.node,
-                    mask=mask # mask up to now, rvs are sorted
-                )
-                support.high = float(estimated_range.high) # probably estimated_range.low == estimated_range.high
-            else:
-                return None
-            
-        return lasapp.Interval(low=str(support.low), high=str(support.high))
-    
-    return None
+    (low, low_is_param), (high, high_is_param) = bounds
+    return lasapp.Support(low=low, high=high, low_is_param=low_is_param, high_is_param=high_is_param)
 
 def validate_distribution_arg_constraints(program: lasapp.ProbabilisticProgram):
     model = program.get_model()
     random_variables = [rv for rv in program.get_random_variables() if is_descendant(model.node, rv.node)]
 
     # We abstract the value of a random variable by its support.
-    mask = {}
-    # TODO: this has to be done in correct order, because we have to know the support of all parent rvs.
-    for rv in random_variables:
-        properties = lasapp.infer_distribution_properties(rv)
+    # The server masks the random variables in topological order, such that parameter dependent supports
+    # are estimated with the supports of all parent random variables, and estimates all parameters in one request.
+    all_properties = [lasapp.infer_distribution_properties(rv) for rv in random_variables]
+    supports = []
+    for rv, properties in zip(random_variables, all_properties):
+        support = None
         if properties is not None:
-            interval = Interval(program, mask, rv, properties.support)
-            if interval is not None:
-                mask[rv.node] = interval
-            else:
+            support = get_support(rv, properties.support)
+            if support is None:
                 print(f"Could not mask support as interval for {rv.node.source_text}")
         else:
             print(f"Could not find properties for {rv.node.source_text}")
-    
-    # print("Mask:")
-    # for (rv, support) in mask.items():
-    #     print(rv.name, support)
-    # print()
+        supports.append(support)
+
+    parameter_ranges = program.estimate_parameter_ranges(random_variables, supports)
 
     # For each variable and each of its parameters,
     # we compare the parameter constraints with the static interval evaluation
     violations = []
-    for rv in random_variables:
-        properties = lasapp.infer_distribution_properties(rv)
+    for rv, properties, estimated_ranges in zip(random_variables, all_properties, parameter_ranges):
         if properties is not None:
-            for param in rv.distribution.params:
+            for param, estimated_range in zip(rv.distribution.params, estimated_ranges):
                 if param.name in properties.param_constraints:
                     constraint = dists.to_interval(properties.param_constraints[param.name])
                     if constraint is None: # we don't support strings like simplex yet
                         violations.append(VerficationFailedConstraint(rv, param, properties.param_constraints[param.name], properties))
                         continue
 
-                    estimated_range = program.estimate_value_range(
-                        expr=param.node,
-                        mask=mask
-                    )
                     estimated_range = dists.Interval(low=float(estimated_range.low),high=float(estimated_range.high))
 
                     # compare estimated value range with constraint
@@ -37,6 +37,71 @@ def get_random_control_dependencies(
 
     return rv_control_deps
 
+def get_strongly_connected_components(nodes: list, successors: dict) -> list[list]:
+    # Tarjan's algorithm (iterative), components are returned in reverse topological order (callees first)
+    index = dict()
+    lowlink = dict()
+    stack = []
+    on_stack = set()
+    sccs = []
+    for root in nodes:
+        if root in index:
+            continue
+        work = [(root, iter(successors[root]))]
+        index[root] = lowlink[root] = len(index)
+        stack.append(root); on_stack.add(root)
+        while len(work) > 0:
+            v, it = work[-1]
+            w = next(it, None)
+            if w is not None:
+                if w not in index:
+                    index[w] = lowlink[w] = len(index)
+                    stack.append(w); on_stack.add(w)
+                    work.append((w, iter(successors[w])))
+                elif w in on_stack:
+                    lowlink[v] = min(lowlink[v], index[w])
+            else:
+                work.pop()
+                if len(work) > 0:
+                    u = work[-1][0]
+                    lowlink[u] = min(lowlink[u], lowlink[v])
+                if lowlink[v] == index[v]:
+                    scc = []
+                    while True:
+                        w = stack.pop(); on_stack.discard(w)
+                        scc.append(w)
+                        if w == v:
+                            break
+                    sccs.append(scc)
+    return sccs
+
+def get_random_variables_per_function(
+        functions: set[lasapp.SyntaxNode],
+        random_variables: dict[str,lasapp.RandomVariable]
+    ) -> dict[lasapp.SyntaxNode,list[lasapp.RandomVariable]]:
+    # all random variables that appear in each function (also in nested functions)
+    # functions are nested or disjoint, so we sweep over the random variables in source order
+    # and keep the stack of functions which enclose the current position
+    sorted_functions = sorted(functions, key=lambda f: (f.first_byte, -f.last_byte))
+    enclosing: dict[str,list[lasapp.SyntaxNode]] = dict() # random variable node_id -> functions
+    stack: list[lasapp.SyntaxNode] = []
+    i = 0
+    for rv in sorted(random_variables.values(), key=lambda rv: rv.node.first_byte):
+        while i < len(sorted_functions) and sorted_functions[i].first_byte <= rv.node.first_byte:
+            while len(stack) > 0 and stack[-1].last_byte < sorted_functions[i].first_byte:
+                stack.pop()
+            stack.append(sorted_functions[i])
+            i += 1
+        while len(stack) > 0 and stack[-1].last_byte < rv.node.first_byte:
+            stack.pop()
+        enclosing[rv.node.node_id] = [f for f in stack if is_descendant(f, rv.node)]
+
+    result = {f: [] for f in functions}
+    for rv in random_variables.values(): # in order of random_variables
+        for f in enclosing[rv.node.node_id]:
+            result[f].append(rv)
+    return result
+
 class HMCAssumptionWarning:
     pass
 
@@ -214,34 +279,29 @@ def check_hmc_assumptions(program: lasapp.ProbabilisticProgram) -> list[HMCAssum
     call_graph_nodes = {n.caller for n in call_graph}
     
     # call_graph maps caller function to called function (parent to children)
+    call_graph_children = {n.caller: n.called for n in call_graph}
     # invert to map child to parents
     call_graph_parents = {n: [] for n in call_graph_nodes}
     for call_graph_node in call_graph:
         for called in call_graph_node.called:
             call_graph_parents[called].append(call_graph_node.caller)
-    
-    # get all random variables that appear in syntax node
-    def get_random_variable_children(node):
-        return [rv for _, rv in random_variables.items() if is_descendant(node, rv.node)]
-    
-    # recursively checks every call_path of node for cycles
-    def has_cyclic_call_path(node, call_path):
-        parents = call_graph_parents[node]
-        for parent in parents:
-            if parent in call_path:
-                # parents appears two times in call_path -> cycle
-                return True
-            else:
-                if has_cyclic_call_path(parent, call_path + [parent]):
-                    return True                
-        return False
 
+    # a function has a cyclic call path if it is called (transitively) by a recursive function or is recursive itself,
+    # i.e. by a function in a strongly connected component with a cycle.
+    # components are returned callees first, so we visit callers before callees
+    has_cyclic_call_path = set()
+    for scc in reversed(get_strongly_connected_components(list(call_graph_nodes), call_graph_children)):
+        is_recursive = len(scc) > 1 or scc[0] in call_graph_children[scc[0]]
+        if is_recursive or any(parent in has_cyclic_call_path for node in scc for parent in call_graph_parents[node]):
+            has_cyclic_call_path.update(scc)
+
+    random_variables_per_function = get_random_variables_per_function(call_graph_nodes, random_variables)
     for call_graph_node in call_graph_nodes:
         # get all random variable definitions that appear in node
-        child_rvs = get_random_variable_children(call_graph_node)
+        child_rvs = random_variables_per_function[call_graph_node]
         if len(child_rvs) > 0:
             # check if node has any call path that is cyclic
-            if has_cyclic_call_path(call_graph_node, []):
+            if call_graph_node in has_cyclic_call_path:
                 for child_rv in child_rvs:
                     warnings.append(SampleInRecursiveCallWarning(child_rv, call_graph_node))
 
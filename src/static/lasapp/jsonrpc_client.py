@@ -1,8 +1,13 @@
 def read_transport_layer(reader):
+    message_str, _ = read_message(reader)
+    return message_str
+
+def read_message(reader):
+    # returns message and its length in bytes
     header_dict = {}
     line = reader.readline().decode('utf8').rstrip()
     if line == '':
-        return None
+        return None, 0
     while len(line) > 0:
         key, _, val = line.partition(':')
         header_dict[key] = val
@@ -12,13 +17,15 @@ def read_transport_layer(reader):
     message_length = int(header_dict['Content-Length'])
     message_str = reader.read(message_length).decode('utf8')
 
-    return message_str    
+    return message_str, message_length
 
 def write_transport_layer(writer, response):
+    # returns length of the message in bytes
     response_utf8 = response.encode('utf8')
     writer.write(f'Content-Length: {len(response_utf8)}\r\n\r\n'.encode('utf8'))
     writer.write(response_utf8)
     writer.flush()
+    return len(response_utf8)
 
 from jsonrpc.jsonrpc2 import JSONRPC20Request, JSONRPC20Response
 import dataclasses
@@ -38,6 +45,35 @@ JSONRPC20Request.serialize = staticmethod(jsonrpc_serialize)
 
 import uuid
 import socket
+import time
+from dataclasses import dataclass
+
+# Each client accounts its requests per method (get_rpc_stats).
+# With RECORD_RPC_EVENTS, clients created afterwards also keep every request as RPCEvent, e.g. for a timeline of a profile (see main.py --profile).
+RECORD_RPC_EVENTS = False
+
+@dataclass
+class RPCMethodStats:
+    calls: int = 0
+    total_time: float = 0.
+    max_time: float = 0.
+    bytes_sent: int = 0
+    bytes_received: int = 0
+
+    def record(self, t: float, bytes_sent: int, bytes_received: int):
+        self.calls += 1
+        self.total_time += t
+        self.max_time = max(self.max_time, t)
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+
+@dataclass
+class RPCEvent:
+    method: str
+    start: float # time.perf_counter()
+    end: float
+    bytes_sent: int
+    bytes_received: int
 
 class _Method():
     def __init__(self, func, name):
@@ -61,6 +97,16 @@ class JSONRPC_Client:
         self.sock = sock
         self.reader = reader
         self.writer = writer
+        self.rpc_stats: dict[str,RPCMethodStats] = dict()
+        self.rpc_events: list[RPCEvent] | None = [] if RECORD_RPC_EVENTS else None
+
+    def get_rpc_stats(self) -> dict[str,RPCMethodStats]:
+        return self.rpc_stats
+
+    def reset_rpc_stats(self):
+        self.rpc_stats = dict()
+        if self.rpc_events is not None:
+            self.rpc_events = []
 
     def close(self):
         self.reader.close()
@@ -77,9 +123,19 @@ class JSONRPC_Client:
             is_notification=False
         )
 
-        write_transport_layer(self.writer, request.json)
+        t0 = time.perf_counter()
+        bytes_sent = write_transport_layer(self.writer, request.json)
+        response, bytes_received = read_message(self.reader)
+        t1 = time.perf_counter()
+
+        stats = self.rpc_stats.get(method)
+        if stats is None:
+            stats = RPCMethodStats()
+            self.rpc_stats[method] = stats
+        stats.record(t1 - t0, bytes_sent, bytes_received)
+        if self.rpc_events is not None:
+            self.rpc_events.append(RPCEvent(method, t0, t1, bytes_sent, bytes_received))
 
-        response = read_transport_layer(self.reader)
         response = JSONRPC20Response.deserialize(response)
         if "error" in response:
             raise Exception(response["error"]["message"] + ": " + str(response["error"]["data"]))
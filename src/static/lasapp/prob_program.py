@@ -1,8 +1,11 @@
 import os
+from typing import Any, Callable
 
 from .server_interface import *
 from .jsonrpc_client import get_jsonrpc_client
 
+JULIA_PPLS = ("turing", "gen") # analysed by the Julia server
+
 
 class ProbabilisticProgram:
     def __init__(self, file_name: str, file_content: str | None = None, n_unroll_loops: int = 0) -> None:
@@ -42,67 +45,124 @@ class ProbabilisticProgram:
         tree_id = response["result"]
         self.tree_id = tree_id
 
+        # Results of the queries on this tree, shared by all analyses on the program.
+        # The syntax tree does not change after build_ast, so results only have to be invalidated if the server forgets the tree.
+        # key: (method, node_id, mask) -> result, mask is a tuple of (node_id, value) for queries with mask
+        self.cache: dict[tuple,Any] = dict()
+        self.cache_lookups: dict[str,list[int]] = dict() # method -> [hits, misses]
+
     def close(self):
         self.client.close()
 
+    def invalidate_cache(self):
+        self.cache.clear()
+
+    def get_cache_stats(self) -> dict[str,dict[str,float]]:
+        return {method: {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses) if hits + misses > 0 else 0.}
+                for method, (hits, misses) in self.cache_lookups.items()}
+
+    def _lookup(self, key: tuple, query: Callable[[], Any]) -> Any:
+        lookups = self.cache_lookups.setdefault(key[0], [0, 0])
+        if key in self.cache:
+            lookups[0] += 1
+        else:
+            lookups[1] += 1
+            self.cache[key] = query()
+        result = self.cache[key]
+        return list(result) if isinstance(result, list) else result # callers may modify the result
+
     def get_model(self) -> Model:
-        return self.client.get_model(
+        return self._lookup(("get_model", None, ()), lambda: self.client.get_model(
             tree_id=self.tree_id, object_hook=Model.from_dict
-        )
+        ))
     
     def get_guide(self) -> Model:
-        return self.client.get_guide(
+        return self._lookup(("get_guide", None, ()), lambda: self.client.get_guide(
             tree_id=self.tree_id, object_hook=Model.from_dict
-        )
+        ))
 
     def get_random_variables(self) -> list[RandomVariable]:
-        return self.client.get_random_variables(
+        return self._lookup(("get_random_variables", None, ()), lambda: self.client.get_random_variables(
             tree_id=self.tree_id, object_hook=RandomVariable.from_dict
-        )
+        ))
         
     def get_data_dependencies(self, node: SyntaxNode) -> list[SyntaxNode]:
-        return self.client.get_data_dependencies(
+        return self._lookup(("get_data_dependencies", node.node_id, ()), lambda: self.client.get_data_dependencies(
             node=node, tree_id=self.tree_id, object_hook=SyntaxNode.from_dict
-        )
+        ))
 
     def get_control_dependencies(self, node: SyntaxNode) -> list[ControlDependency]:
-        return self.client.get_control_dependencies(
+        return self._lookup(("get_control_dependencies", node.node_id, ()), lambda: self.client.get_control_dependencies(
             node=node, tree_id=self.tree_id, object_hook=ControlDependency.from_dict
-        )
+        ))
     
     def estimate_value_range(self, expr: SyntaxNode, mask: dict[SyntaxNode,Interval]) -> Interval: 
+        key = ("estimate_value_range", expr.node_id, tuple(sorted((node.node_id, interval.low, interval.high) for node, interval in mask.items())))
         mask = list(mask.items())
-        return self.client.estimate_value_range(
+        return self._lookup(key, lambda: self.client.estimate_value_range(
             expr=expr,
             tree_id=self.tree_id,
             mask=mask,
             object_hook=Interval.from_dict
-        )
+        ))
     
+    # Value ranges of the distribution parameters of all random variables, where each random variable is masked by its support
+    # (None if the support is not an interval). The Python server masks the random variables in topological order of
+    # their data dependencies and answers with one response, for the Julia server we mask in program order.
+    def estimate_parameter_ranges(self, random_variables: list[RandomVariable], supports: list[Support | None]) -> list[list[Interval]]:
+        if self.ppl in JULIA_PPLS:
+            return self._estimate_parameter_ranges_sequentially(random_variables, supports)
+        key = ("estimate_parameter_ranges", None, tuple((rv.node.node_id, None if support is None else
+            (support.low, support.high, support.low_is_param, support.high_is_param)) for rv, support in zip(random_variables, supports)))
+        return self._lookup(key, lambda: self.client.estimate_parameter_ranges(
+            tree_id=self.tree_id,
+            random_variables=list(zip(random_variables, supports)),
+            object_hook=lambda ranges: [Interval.from_dict(interval) for interval in ranges]
+        ))
+
+    def _estimate_parameter_ranges_sequentially(self, random_variables: list[RandomVariable], supports: list[Support | None]) -> list[list[Interval]]:
+        mask = {}
+        for rv, support in zip(random_variables, supports):
+            if support is None:
+                continue
+            bounds = []
+            for bound, is_param, attr in ((support.low, support.low_is_param, "low"), (support.high, support.high_is_param, "high")):
+                if is_param:
+                    param = next((param for param in rv.distribution.params if param.name == bound), None)
+                    if param is None:
+                        break
+                    bound = getattr(self.estimate_value_range(expr=param.node, mask=mask), attr)
+                bounds.append(bound)
+            else:
+                mask[rv.node] = Interval(low=bounds[0], high=bounds[1])
+        return [[self.estimate_value_range(expr=param.node, mask=mask) for param in rv.distribution.params] for rv in random_variables]
+
     def get_call_graph(self, node: SyntaxNode) -> list[CallGraphNode]:
-        return self.client.get_call_graph(
+        return self._lookup(("get_call_graph", node.node_id, ()), lambda: self.client.get_call_graph(
             tree_id=self.tree_id,
             node=node,
             object_hook=CallGraphNode.from_dict
-        )
+        ))
     
     def get_path_condition(self, node: SyntaxNode, root: SyntaxNode, mask: dict[SyntaxNode, SymbolicExpression]) -> SymbolicExpression:
-        mask = list(mask.items())
-        return self.client.get_path_conditions(
-            tree_id=self.tree_id,
-            root=root,
-            nodes=[node],
-            mask=mask,
-            object_hook=SymbolicExpression.from_dict
-        )[0]
+        return self.get_path_conditions([node], root, mask)[0]
     
-    # batched version of get_path_condition
+    # batched version of get_path_condition, only nodes which are not cached are sent
     def get_path_conditions(self, nodes: list[SyntaxNode], root: SyntaxNode, mask: dict[SyntaxNode, SymbolicExpression]) -> list[SymbolicExpression]:
-        mask = list(mask.items())
-        return self.client.get_path_conditions(
-            tree_id=self.tree_id,
-            root=root,
-            nodes=nodes,
-            mask=mask,
-            object_hook=SymbolicExpression.from_dict
-        )
\ No newline at end of file
+        mask_key = (root.node_id,) + tuple(sorted((node.node_id, sexpr.expr) for node, sexpr in mask.items()))
+        keys = [("get_path_condition", node.node_id, mask_key) for node in nodes]
+        missing = list({key[1]: node for key, node in zip(keys, nodes) if key not in self.cache}.values())
+        lookups = self.cache_lookups.setdefault("get_path_condition", [0, 0])
+        lookups[0] += len(nodes) - len(missing)
+        lookups[1] += len(missing)
+        if len(missing) > 0:
+            path_conditions = self.client.get_path_conditions(
+                tree_id=self.tree_id,
+                root=root,
+                nodes=missing,
+                mask=list(mask.items()),
+                object_hook=SymbolicExpression.from_dict
+            )
+            for node, path_condition in zip(missing, path_conditions):
+                self.cache[("get_path_condition", node.node_id, mask_key)] = path_condition
+        return [self.cache[key] for key in keys]
@@ -6,11 +6,18 @@ from analysis.constraint_verification import *
 from analysis.hmc_assumptions_checker import *
 from analysis.guide_validation import *
 from analysis.utils import *
+from profiling import PhaseProfiler
+import argparse
 
-def main(file):
-    program = ProbabilisticProgram(file, n_unroll_loops=3)
+def main(file, profiler: PhaseProfiler | None = None):
+    # with profiler, each phase is profiled (see profiling.py)
+    run = profiler.run if profiler is not None else (lambda name, f: f())
 
-    model = program.get_model()
+    program = run("build_ast", lambda: ProbabilisticProgram(file, n_unroll_loops=3))
+    if profiler is not None:
+        profiler.add_client(program.client)
+
+    model = run("get_model", program.get_model)
     print("Model:", model.name)
 
     # response = program.client.get_random_variables(
@@ -21,11 +28,11 @@ def main(file):
     # exit()
 
     file_content = get_file_content(file)
-    variables = program.get_random_variables()
+    variables = run("get_random_variables", program.get_random_variables)
     highlights = [(rv.node.first_byte, rv.node.last_byte, "106m" if rv.is_observed else "102m") for rv in variables]
     print_source_highlighted(file_content, highlights)
 
-    model_graph = get_model_graph(program)
+    model_graph = run("model_graph", lambda: get_model_graph(program))
     # merge_nodes_by_name(model_graph)
     plot_model_graph(model_graph, filename="model")
 
@@ -36,7 +43,7 @@ def main(file):
     # violations = validate_distribution_arg_constraints(program)
     # print_source_highlight_violations(violations)
 
-    warnings = check_hmc_assumptions(program)
+    warnings = run("hmc", lambda: check_hmc_assumptions(program))
     if len(warnings) == 0:
         print("No HMC warnings.")
     for (i, warning) in enumerate(warnings):
@@ -95,4 +102,16 @@ if __name__ == '__main__':
     # file = "examples/gmm/gmm_turing.jl"
     # file = "examples/gmm/gmm_turing_2.jl"
     # file = "examples/gmm/gmm_turing_3.jl"
-    main(file)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("file", nargs="?", default=file)
+    parser.add_argument("--profile", action="store_true", help="print RPC requests and cProfile hot spots of each phase")
+    parser.add_argument("--profile_output", help="write profile to .prof (pstats) or .json (speedscope) file")
+    args = parser.parse_args()
+
+    profiler = PhaseProfiler() if args.profile or args.profile_output is not None else None
+    main(args.file, profiler)
+    if profiler is not None:
+        if args.profile:
+            profiler.print_report()
+        if args.profile_output is not None:
+            profiler.dump(args.profile_output)
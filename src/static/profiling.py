@@ -0,0 +1,110 @@
+import io
+import json
+import time
+import cProfile
+import pstats
+from lasapp import jsonrpc_client
+from lasapp.jsonrpc_client import JSONRPC_Client, RPCEvent
+
+# Profiling of the analysis phases of main.py (--profile).
+# Each phase runs under cProfile, the RPC requests of the clients (see lasapp/jsonrpc_client.py) are assigned
+# to the phase in which they were sent.
+# print_report prints the requests per method and the cProfile hot spots for each phase,
+# dump writes the profile of all phases as pstats file (.prof, e.g. for snakeviz)
+# or as speedscope timeline of phases and RPC requests (.json, https://www.speedscope.app).
+
+class Phase:
+    def __init__(self, name: str, start: float, end: float, profile: cProfile.Profile) -> None:
+        self.name = name
+        self.start = start
+        self.end = end
+        self.profile = profile
+
+class PhaseProfiler:
+    def __init__(self) -> None:
+        self.phases: list[Phase] = []
+        self.clients: list[JSONRPC_Client] = []
+        # clients have to be created after this
+        jsonrpc_client.RECORD_RPC_EVENTS = True
+
+    def add_client(self, client: JSONRPC_Client):
+        self.clients.append(client)
+
+    def run(self, name: str, f):
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            return f()
+        finally:
+            profile.disable()
+            self.phases.append(Phase(name, start, time.perf_counter(), profile))
+
+    def get_rpc_events(self, phase: Phase) -> list[RPCEvent]:
+        return [event for client in self.clients for event in client.rpc_events or [] if phase.start <= event.start and event.end <= phase.end]
+
+    def print_report(self, n_hotspots: int = 10):
+        for phase in self.phases:
+            events = self.get_rpc_events(phase)
+            rpc_time = sum(event.end - event.start for event in events)
+            print(f"\nPhase {phase.name}: {phase.end - phase.start:.4f}s, {len(events)} requests ({rpc_time:.4f}s)")
+            methods: dict[str,list[RPCEvent]] = dict()
+            for event in events:
+                methods.setdefault(event.method, []).append(event)
+            if len(methods) > 0:
+                print(f"    {'method':30s} {'calls':>6s} {'time':>9s} {'sent':>10s} {'received':>10s}")
+            for method, method_events in sorted(methods.items(), key=lambda item: -sum(e.end - e.start for e in item[1])):
+                print(f"    {method:30s} {len(method_events):6d} {sum(e.end - e.start for e in method_events):9.4f} "
+                      f"{sum(e.bytes_sent for e in method_events):10d} {sum(e.bytes_received for e in method_events):10d}")
+            stream = io.StringIO()
+            pstats.Stats(phase.profile, stream=stream).sort_stats(pstats.SortKey.TIME).print_stats(n_hotspots)
+            # skip the header of pstats
+            lines = stream.getvalue().splitlines()
+            start = next((i for i, line in enumerate(lines) if line.strip().startswith("ncalls")), 0)
+            print("\n".join("    " + line for line in lines[start:] if line.strip() != ""))
+
+    def dump(self, filename: str):
+        if filename.endswith(".json"):
+            with open(filename, "w") as f:
+                json.dump(self.to_speedscope(), f)
+        else:
+            stats = pstats.Stats(*[phase.profile for phase in self.phases])
+            stats.dump_stats(filename)
+
+    def to_speedscope(self) -> dict:
+        # evented profile, requests are nested in their phase
+        frames: list[dict] = []
+        frame_index: dict[str,int] = dict()
+        def get_frame(name: str) -> int:
+            if name not in frame_index:
+                frame_index[name] = len(frames)
+                frames.append({"name": name})
+            return frame_index[name]
+
+        events = []
+        for phase in self.phases:
+            frame = get_frame(f"phase {phase.name}")
+            events.append({"type": "O", "frame": frame, "at": phase.start})
+            for event in sorted(self.get_rpc_events(phase), key=lambda event: event.start):
+                rpc_frame = get_frame(f"rpc {event.method}")
+                events.append({"type": "O", "frame": rpc_frame, "at": event.start})
+                events.append({"type": "C", "frame": rpc_frame, "at": event.end})
+            events.append({"type": "C", "frame": frame, "at": phase.end})
+
+        start = self.phases[0].start if len(self.phases) > 0 else 0.
+        end = self.phases[-1].end if len(self.phases) > 0 else 0.
+        for event in events:
+            event["at"] -= start
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "evented",
+                "name": "lasapp",
+                "unit": "seconds",
+                "startValue": 0.,
+                "endValue": end - start,
+                "events": events
+            }],
+            "exporter": "lasapp"
+        }
@@ -170,6 +170,37 @@ def E():
         self._test_2(program_text, "python", variables)
     
 
+    def _test_3(self, program_text, language, variables):
+        # X is defined before A, but its support depends on A
+        violations = self._get_violations(program_text, language)
+        rvs = [v.random_variable.name for v in violations]
+
+        self.assertNotIn(variables["Y"], rvs)
+        self.assertIn(variables["Z"], rvs)
+
+    def test_3_bm(self):
+        program_text = """
+import beanmachine.ppl as bm
+
+@bm.random_variable
+def X():
+    return dist.Uniform(A(), A() + 1.)
+
+@bm.random_variable
+def A():
+    return dist.Uniform(0., 1.)
+
+@bm.random_variable
+def Y():
+    return dist.Exponential(X() + 1.)
+
+@bm.random_variable
+def Z():
+    return dist.Exponential(X() - 1.)
+"""
+        variables = {"X": "X()", "A": "A()", "Y": "Y()", "Z": "Z()"}
+        self._test_3(program_text, "python", variables)
+
 if __name__ == "__main__":
     unittest.main()
 
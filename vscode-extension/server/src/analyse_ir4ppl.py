@@ -3,6 +3,7 @@ sys.path.insert(0, 'lasapp/src/ir4ppl')
 
 import argparse
 from stan.stan_cfg import *
+from ir4ppl.parallel import set_workers
 from analysis.absolute_continuity_checker import check_ac, check_ac_guide
 from analysis.funnel_detection import get_funnel_relationships
 from analysis.constraint_verification import verify_constraints
@@ -34,7 +35,10 @@ if __name__ == '__main__':
     parser.add_argument("--guide", action="store_true")
     parser.add_argument("--hmc", action="store_true")
     parser.add_argument("--funnel", action="store_true")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="number of workers for per random variable queries of the constraint and funnel checkers")
+    parser.add_argument("--executor", choices=["thread", "process"], default=None, help="worker pool (default: thread)")
     args = parser.parse_args()
+    set_workers(args.workers, args.executor)
     
     file_content = sys.stdin.read()
     utf8_s = file_content.encode("utf8")
@@ -57,6 +61,8 @@ if __name__ == '__main__':
             os.remove(hppname)
         
     warnings = []
+    # all checkers share the analyses cached in ir.analyses (reaching definitions, branch parents, value ranges, ...),
+    # so each of them is only computed once
     
     if args.guide:
         pass # not supported for stan